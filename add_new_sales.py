@@ -28,4 +28,4 @@ for i in range(10):
 conn.commit()
 conn.close()
 print("✅ Added 10 new sales to database!")
-print("📊 Run 'python refresh_powerbi.py' to export updated data")
\ No newline at end of file
+print("📊 Run 'python refresh_powerbi.py --incremental' to export updated data")
\ No newline at end of file
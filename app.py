@@ -15,6 +15,7 @@ import os
 from datetime import datetime
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from data_cleaning import clean_frame
 
 import plotly.express as px
 import plotly.graph_objects as go
@@ -307,19 +308,6 @@ def safe_numeric(series: pd.Series) -> pd.Series:
     return pd.to_numeric(series, errors="coerce")
 
 
-def auto_clean(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    for col in df.select_dtypes(include="object").columns:
-        df[col] = df[col].astype(str).str.strip()
-        df[col] = df[col].replace({"nan": np.nan, "None": np.nan, "": np.nan})
-    for col in df.select_dtypes(include="object").columns:
-        converted = safe_numeric(df[col])
-        if converted.notna().sum() / max(len(df), 1) > 0.7:
-            df[col] = converted
-    df.dropna(axis=1, how="all", inplace=True)
-    return df
-
-
 def detect_anomalies(df: pd.DataFrame) -> list:
     alerts = []
     numeric_cols = df.select_dtypes(include=[np.number]).columns
@@ -496,14 +484,18 @@ def tab_setup():
                 else:
                     sheet = xl.sheet_names[0]
                 df = pd.read_excel(uploaded, sheet_name=sheet)
-            df = auto_clean(df)
+            # Single pass per column: strip/nulls, numeric/datetime, compact dtypes (see data_cleaning)
+            df, report = clean_frame(df)
             st.session_state.df = df
-            st.session_state.df_clean = df.copy()
+            st.session_state.df_clean = df
             st.session_state.filename = uploaded.name
             st.session_state.data_loaded = True
             st.session_state.data_cleaned = True
             st.session_state.analysed = False
             st.success(f"Loaded **{uploaded.name}** — {df.shape[0]:,} rows x {df.shape[1]} columns")
+            st.caption(f"Cleaned in {report['elapsed_ms'] / 1000:.1f}s — {len(report['conversions'])} columns converted, "
+                       f"memory {report['memory_before'] / 2**20:.1f} MB → {report['memory_after'] / 2**20:.1f} MB "
+                       f"(−{report['reduction_pct']:.0f}%)")
         except Exception as e:
             st.error(f"Error reading file: {e}")
 
@@ -512,7 +504,7 @@ def tab_setup():
     if st.button("Try with Sample Data", key="sample_btn"):
         df = get_sample_data()
         st.session_state.df = df
-        st.session_state.df_clean = df.copy()
+        st.session_state.df_clean = df
         st.session_state.filename = "sample_sales_data.csv"
         st.session_state.data_loaded = True
         st.session_state.data_cleaned = True
@@ -865,7 +857,7 @@ Use only columns that exist: {list(df.columns)}
     if st.button("Generate 5 Role-Based Dashboards", key="role_dash", use_container_width=True):
         with st.spinner("Generating all role dashboards..."):
             num_cols = list(df.select_dtypes(include=[np.number]).columns)
-            cat_cols = list(df.select_dtypes(include="object").columns)
+            cat_cols = list(df.select_dtypes(include=["object", "category", "string"]).columns)
             x  = cat_cols[0] if cat_cols else df.columns[0]
             y  = num_cols[0] if num_cols else df.columns[1]
             y2 = num_cols[1] if len(num_cols) > 1 else y
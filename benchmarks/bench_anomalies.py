@@ -0,0 +1,93 @@
+"""
+Accuracy and time of detect_anomalies' IQR fences
+
+Compares, for every numeric column of a frame, the outlier counts the
+dashboard reported before (quartiles and counts from a 10,000-row sample,
+first 8 columns) with the t-digest sketches over all rows
+(quantile_sketch.sketch_columns) and with exact pandas quantiles. The
+frame is generate_data.py's sales_export.csv, cleaned as after an upload,
+plus continuous columns (lognormal, normal with gaps, exponential).
+
+Run from the repo root:
+    python -m benchmarks.bench_anomalies --scale 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+OLD_SAMPLE_ROWS = 10_000
+OLD_MAX_COLUMNS = 8
+IQR_FACTOR = 2.5
+
+
+def _count(values, q1, q3):
+    iqr = q3 - q1
+    if not iqr > 0:
+        return 0
+    return int(((values < q1 - IQR_FACTOR * iqr) | (values > q3 + IQR_FACTOR * iqr)).sum())
+
+
+def build_frame(scale: float, workdir: str) -> pd.DataFrame:
+    from data_cleaning import clean_frame
+    from generate_data import generate
+
+    generate('business', scale, seed=42, formats=['csv'], output_dir=workdir)
+    df, _ = clean_frame(pd.read_csv(os.path.join(workdir, 'sales_export.csv')))
+    rng = np.random.default_rng(7)
+    n = len(df)
+    gaps = rng.normal(100, 15, n)
+    gaps[rng.random(n) < 0.1] = np.nan
+    return df.assign(latency_ms=rng.lognormal(3, 0.8, n), score=gaps, wait_s=rng.exponential(30, n))
+
+
+def run(df: pd.DataFrame) -> dict:
+    from quantile_sketch import sketch_columns
+
+    numeric = list(df.select_dtypes(include=[np.number]).columns)
+    results = {}
+
+    start = time.perf_counter()
+    sample = df.sample(n=OLD_SAMPLE_ROWS, random_state=42) if len(df) > OLD_SAMPLE_ROWS else df
+    old = {c: _count(sample[c], sample[c].quantile(.25), sample[c].quantile(.75)) / len(sample)
+           for c in numeric[:OLD_MAX_COLUMNS]}
+    results['sample'] = (time.perf_counter() - start, {c: round(share * len(df)) for c, share in old.items()})
+
+    start = time.perf_counter()
+    sketches = sketch_columns(df, numeric)
+    results['sketch'] = (time.perf_counter() - start,
+                         {c: _count(df[c], *sketches[c].quantile([.25, .75])) for c in numeric})
+
+    start = time.perf_counter()
+    exact = {c: _count(df[c], df[c].quantile(.25), df[c].quantile(.75)) for c in numeric}
+    results['exact'] = (time.perf_counter() - start, exact)
+    return results
+
+
+def main(scale: float):
+    with tempfile.TemporaryDirectory(prefix='anomaly-bench-') as workdir:
+        df = build_frame(scale, workdir)
+    print(f"📈 IQR outliers on {len(df):,} rows x {len(df.select_dtypes(include=[np.number]).columns)} numeric columns")
+
+    results = run(df)
+    modes = list(results)
+    print(f"\n{'column':<14}" + ''.join(f"{mode:>12}" for mode in modes))
+    for column in results['exact'][1]:
+        cells = []
+        for mode in modes:
+            count = results[mode][1].get(column)
+            cells.append(f"{'-' if count is None else f'{count:,}':>12}")
+        print(f"{column:<14}" + ''.join(cells))
+    print(f"{'seconds':<14}" + ''.join(f"{results[m][0]:>12.3f}" for m in modes))
+    print("\nsample counts are scaled from the 10,000-row sample to all rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=5000,
+                        help="generate_data.py scale factor (5000 = 1M sales rows)")
+    args = parser.parse_args()
+    main(args.scale)
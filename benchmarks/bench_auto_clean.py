@@ -0,0 +1,126 @@
+"""
+Time and memory of auto_clean on a large upload
+
+Cleans generate_data.py's sales_export.csv as the dashboards do after an
+upload. "legacy" is the previous auto_clean (astype(str).str.strip() and
+replace over every text column, then pd.to_numeric over every text column
+again, 64-bit numerics and object strings kept); "compact" is
+data_cleaning.clean_frame as the dashboards call it (categoricals, Arrow
+strings, downcast numbers) and "original_dtypes" the same with
+compact=False. Each
+mode runs in its own process so peak RSS is comparable. The CSV is read with object strings, as pandas 2 does.
+
+Run from the repo root:
+    python -m benchmarks.bench_auto_clean --scale 5000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_tools import REPO_ROOT, current_rss
+
+MODES = ("legacy", "original_dtypes", "compact")
+
+
+def _mb(value):
+    return round(value / 2**20, 1) if value else None
+
+
+def _peak_rss():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def legacy_auto_clean(df):
+    import numpy as np
+    import pandas as pd
+
+    df = df.copy()
+    for c in df.select_dtypes(include="object").columns:
+        df[c] = df[c].astype(str).str.strip().replace({"nan": np.nan, "None": np.nan, "": np.nan})
+    for c in df.select_dtypes(include="object").columns:
+        cv = pd.to_numeric(df[c], errors="coerce")
+        if cv.notna().sum() / max(len(df), 1) > 0.7:
+            df[c] = cv
+    df.dropna(axis=1, how="all", inplace=True)
+    return df
+
+
+def run_mode(mode: str, path: str) -> dict:
+    """Read the CSV and clean it in this process"""
+    import pandas as pd
+    from data_cleaning import clean_frame, frame_bytes
+
+    if int(pd.__version__.split('.')[0]) >= 3:
+        pd.set_option('future.infer_string', False)
+    raw = pd.read_csv(path)
+    raw_bytes = frame_bytes(raw)
+    rss_before = current_rss()
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        df = legacy_auto_clean(raw)
+    else:
+        df, _ = clean_frame(raw, compact=mode == "compact")
+    elapsed = time.perf_counter() - start
+    del raw
+
+    return {
+        'mode': mode,
+        'rows': len(df),
+        'clean_s': round(elapsed, 2),
+        'input_mb': _mb(raw_bytes),
+        'frame_mb': _mb(frame_bytes(df)),
+        'rss_before_mb': _mb(rss_before),
+        'rss_after_mb': _mb(current_rss()),
+        'peak_rss_mb': _mb(_peak_rss()),
+        'dtypes': {str(c): str(t) for c, t in df.dtypes.items()},
+    }
+
+
+def main(scale: float):
+    from generate_data import generate
+
+    with tempfile.TemporaryDirectory(prefix='clean-bench-') as workdir:
+        generate('business', scale, seed=42, formats=['csv'], output_dir=workdir)
+        path = os.path.join(workdir, 'sales_export.csv')
+        print(f"🧹 auto_clean on {os.path.getsize(path) / 2**20:.1f} MB sales_export.csv (scale {scale:g})")
+
+        results = {}
+        for mode in MODES:
+            completed = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_auto_clean', '--child', mode, '--path', path],
+                cwd=REPO_ROOT, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"❌ {mode}: {completed.stderr.strip().splitlines()[-1:]}")
+                return
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'':<18}" + ''.join(f"{mode:>16}" for mode in MODES))
+    for key, label in (('rows', 'rows'), ('clean_s', 'clean s'), ('input_mb', 'input MB'),
+                       ('frame_mb', 'cleaned MB'), ('peak_rss_mb', 'peak RSS MB')):
+        print(f"{label:<18}" + ''.join(f"{results[m][key]:>16}" for m in MODES))
+
+    print("\ncolumn dtypes:")
+    for column in results[MODES[0]]['dtypes']:
+        print(f"  {column:<16}" + ''.join(f"{results[m]['dtypes'].get(column, '-'):>16}" for m in MODES))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=5000,
+                        help="generate_data.py scale factor (5000 = 1M sales rows)")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.path)))
+    else:
+        main(args.scale)
@@ -0,0 +1,118 @@
+"""
+Plotly payload and build time of the dashboard's charts
+
+Builds each chart type from generate_data.py's sales_export.csv (cleaned
+as after an upload) two ways: "sampled" is the previous build_chart (a
+10,000-row random sample of large frames handed to Plotly as rows, a
+groupby only for bar/pie-style charts); "aggregated" is the current
+build_chart, which plans the reduced series with chart_aggregation on all
+rows. Payload is the size of the figure JSON sent to the browser.
+
+The dashboard module is imported in Streamlit's bare mode; the Anthropic
+client is never called.
+
+Run from the repo root:
+    python -m benchmarks.bench_charts --scale 5000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+# (chart type, x, y, color)
+CHARTS = [
+    ("bar", "product", "revenue", None),
+    ("line", "sale_date", "revenue", None),
+    ("line", "sale_date", "revenue", "product"),
+    ("area", "quantity", "revenue", None),
+    ("scatter", "quantity", "revenue", None),
+    ("bubble", "unit_price", "revenue", None),
+    ("histogram", "revenue", None, None),
+    ("box", "product", "revenue", None),
+    ("violin", "sales_rep", "revenue", None),
+    ("pie", "product", "revenue", None),
+]
+
+SAMPLE_ROWS = 10_000
+LARGE_ROWS = 50_000
+
+
+def legacy_build_chart(df, ctype, x, y, color=None, title=""):
+    """build_chart's data handling before aggregation pushdown (styling left out)"""
+    import pandas as pd
+    import plotly.express as px
+
+    dp = df.sample(n=SAMPLE_ROWS, random_state=42) if len(df) > LARGE_ROWS else df
+    if y and y in dp.columns:
+        dp[y] = pd.to_numeric(dp[y], errors="coerce")
+        dp = dp.dropna(subset=[y])
+    if x and x in dp.columns:
+        dp = dp.dropna(subset=[x])
+    vc = color if color and color in dp.columns else None
+    kw = dict(x=x, y=y, title=title, color=vc)
+    if ctype == "bar":
+        if len(dp) > 500:
+            return px.bar(dp.groupby(x, as_index=False, observed=True)[y].mean(), x=x, y=y, title=title)
+        return px.bar(dp, **kw)
+    if ctype == "line":
+        return px.line(dp, **kw)
+    if ctype == "area":
+        return px.area(dp, **kw)
+    if ctype == "scatter":
+        return px.scatter(dp, **kw)
+    if ctype == "bubble":
+        sc = dp[y].copy()
+        sc = sc - sc.min() + 1 if sc.min() <= 0 else sc
+        return px.scatter(dp, x=x, y=y, size=sc, title=title)
+    if ctype == "histogram":
+        return px.histogram(dp, x=x, title=title)
+    if ctype == "box":
+        return px.box(dp, x=x, y=y, title=title)
+    if ctype == "violin":
+        return px.violin(dp, x=x, y=y, title=title)
+    if ctype == "pie":
+        da = dp.groupby(x, as_index=False, observed=True)[y].sum().nlargest(15, y)
+        return px.pie(da, names=x, values=y, title=title)
+    raise ValueError(ctype)
+
+
+def _kb(fig):
+    return round(len(fig.to_json()) / 1024, 1) if fig is not None else None
+
+
+def main(scale: float):
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+    logging.disable(logging.WARNING)
+    import pandas as pd
+    import dashboard_ai_enhanced as dash
+    from generate_data import generate
+
+    with tempfile.TemporaryDirectory(prefix='chart-bench-') as workdir:
+        generate('business', scale, seed=42, formats=['csv'], output_dir=workdir)
+        df = dash.auto_clean(pd.read_csv(os.path.join(workdir, 'sales_export.csv')))
+    print(f"📊 Charts from {len(df):,} rows")
+
+    print(f"\n{'chart':<34}{'sampled KB':>12}{'s':>8}{'aggregated KB':>15}{'s':>8}")
+    totals = [0.0, 0.0]
+    for ctype, x, y, color in CHARTS:
+        start = time.perf_counter()
+        old = legacy_build_chart(df, ctype, x, y, color, title=ctype)
+        old_s = time.perf_counter() - start
+        start = time.perf_counter()
+        new = dash.build_chart(df, ctype, x, y, color=color, title=ctype)
+        new_s = time.perf_counter() - start
+        old_kb, new_kb = _kb(old), _kb(new)
+        totals[0] += old_kb or 0
+        totals[1] += new_kb or 0
+        label = f"{ctype} {x} / {y}" + (f" by {color}" if color else "")
+        print(f"{label:<34}{old_kb:>12}{old_s:>8.2f}{new_kb:>15}{new_s:>8.2f}")
+    print(f"{'total':<34}{totals[0]:>12.1f}{'':>8}{totals[1]:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=5000,
+                        help="generate_data.py scale factor (5000 = 1M sales rows)")
+    args = parser.parse_args()
+    main(args.scale)
@@ -0,0 +1,135 @@
+"""
+Peak RSS of the dashboard's upload -> analyse -> dashboard flow
+
+Simulates several Streamlit sessions uploading the same CSV to
+dashboard_ai_enhanced.py, each then running the Analyse step (df_summary,
+detect_anomalies) and building Dashboard charts. "copies" is the previous
+behaviour (each session parses the upload and keeps df plus a df_clean
+copy); "store" goes through dataset_store, where identical uploads are
+parsed once and every session holds copy-on-write views. Each mode runs
+in its own process so peak RSS is comparable.
+
+The dashboard module is imported in Streamlit's bare mode; the Anthropic
+client is never called.
+
+Run from the repo root:
+    python -m benchmarks.bench_dashboard_memory --scale 2000 --sessions 3
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_tools import REPO_ROOT, current_rss
+
+MODES = ("copies", "store")
+
+# (chart type, x, y) built on the Dashboard step
+CHARTS = [
+    ("bar", "product", "revenue"),
+    ("line", "sale_date", "revenue"),
+    ("donut", "sales_rep", "revenue"),
+    ("histogram", "quantity", None),
+    ("scatter", "quantity", "revenue"),
+]
+
+
+def _mb(value):
+    return round(value / 2**20, 1) if value else None
+
+
+def _peak_rss():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_flow(mode: str, path: str, sessions: int) -> dict:
+    """Run the flow in this process and return RSS after each step"""
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+    logging.disable(logging.WARNING)
+    import pandas as pd
+    import dashboard_ai_enhanced as dash
+    from dataset_store import content_key, get_dataset_store
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    store = get_dataset_store()
+    steps = [{'step': 'start', 'rss_mb': _mb(current_rss())}]
+    held = []
+
+    for session in range(sessions):
+        # Each session's uploader keeps its own copy of the uploaded bytes
+        upload = io.BytesIO(bytes(data))
+        if mode == "copies":
+            df = dash.auto_clean(pd.read_csv(upload))
+            df_clean = df.copy()
+        else:
+            df, _ = store.get_or_load(content_key(upload.getbuffer(), None),
+                                      lambda: dash.auto_clean(pd.read_csv(upload)))
+            df_clean = df
+        held.append((upload, df, df_clean))
+        steps.append({'step': f'session {session + 1} upload', 'rss_mb': _mb(current_rss())})
+
+        dash.df_summary(df_clean)
+        dash.detect_anomalies(df_clean)
+        steps.append({'step': f'session {session + 1} analyse', 'rss_mb': _mb(current_rss())})
+
+        for chart_type, x, y in CHARTS:
+            dash.build_chart(df_clean, chart_type, x, y, title=chart_type)
+        steps.append({'step': f'session {session + 1} dashboard', 'rss_mb': _mb(current_rss())})
+
+    return {
+        'mode': mode,
+        'rows': len(held[0][1]),
+        'frame_mb': _mb(int(held[0][1].memory_usage(deep=True).sum())),
+        'steps': steps,
+        'peak_rss_mb': _mb(_peak_rss()),
+    }
+
+
+def main(scale: float, sessions: int):
+    from generate_data import generate
+
+    with tempfile.TemporaryDirectory(prefix='dash-bench-') as workdir:
+        generate('business', scale, seed=42, formats=['csv'], output_dir=workdir)
+        path = os.path.join(workdir, 'sales_export.csv')
+        print(f"🧠 Dashboard memory: {sessions} sessions uploading "
+              f"{os.path.getsize(path) / 2**20:.1f} MB sales_export.csv (scale {scale:g})")
+
+        results = {}
+        for mode in MODES:
+            completed = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_dashboard_memory', '--child', mode,
+                 '--path', path, '--sessions', str(sessions)],
+                cwd=REPO_ROOT, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"❌ {mode}: {completed.stderr.strip().splitlines()[-1:]}")
+                return
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'step':<24}" + ''.join(f"{mode + ' MB':>14}" for mode in MODES))
+    for i, step in enumerate(results[MODES[0]]['steps']):
+        print(f"{step['step']:<24}" + ''.join(f"{results[m]['steps'][i]['rss_mb'] or 0:>14.1f}" for m in MODES))
+    print(f"{'peak RSS':<24}" + ''.join(f"{results[m]['peak_rss_mb']:>14.1f}" for m in MODES))
+    print(f"{'frame size':<24}" + ''.join(f"{results[m]['frame_mb']:>14.1f}" for m in MODES))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=2000,
+                        help="generate_data.py scale factor (2000 = 400k sales rows)")
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_flow(args.child, args.path, args.sessions)))
+    else:
+        main(args.scale, args.sessions)
@@ -0,0 +1,117 @@
+"""
+Rows/sec and peak memory of the Excel export paths
+
+legacy:    fetchall -> list of dicts -> DataFrame -> openpyxl, widths from
+           df[col].astype(str).apply(len) (the pre-streaming implementation)
+streaming: DatabaseManager.iter_batches -> xlsxwriter constant_memory
+
+Each mode runs in a fresh process so peak RSS is measured in isolation.
+A synthetic sales-shaped table is generated in a temporary SQLite file.
+
+    python -m benchmarks.bench_excel_export --rows 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+
+PRODUCTS = ['Product A', 'Product B', 'Product C', 'Product D']
+REPS = ['Alice Johnson', 'Bob Smith', 'Carol Davis', 'David Lee', 'Emma Wilson']
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE sales (sale_id TEXT, customer_id TEXT, product TEXT, sale_date TEXT,
+                            quantity INTEGER, unit_price INTEGER, revenue INTEGER, sales_rep TEXT)
+    """)
+    rng = random.Random(42)
+
+    def generate():
+        for i in range(rows):
+            quantity = rng.randint(1, 20)
+            unit_price = rng.choice([99, 199, 299, 499, 999])
+            yield (f'S{i:08d}', f'C{rng.randint(1, 5000):05d}', rng.choice(PRODUCTS),
+                   f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                   quantity, unit_price, quantity * unit_price, rng.choice(REPS))
+
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    conn.close()
+
+
+def run_legacy(db_path, out_dir):
+    import pandas as pd
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.connect() as conn:
+        result = conn.execute(text("SELECT * FROM sales"))
+        columns = list(result.keys())
+        data = [dict(zip(columns, row)) for row in result.fetchall()]
+
+    df = pd.DataFrame(data)
+    filepath = os.path.join(out_dir, 'legacy.xlsx')
+    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Data', index=False)
+        worksheet = writer.sheets['Data']
+        for idx, col in enumerate(df.columns):
+            max_length = max(df[col].astype(str).apply(len).max(), len(col)) + 2
+            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+    return len(df)
+
+
+def run_streaming(db_path, out_dir):
+    from database import DatabaseManager
+    from powerbi_export import PowerBIExporter
+
+    exporter = PowerBIExporter(DatabaseManager(f'sqlite:///{db_path}'))
+    exporter.export_dir = out_dir
+    result = exporter.export_query_to_excel("SELECT * FROM sales", 'streaming.xlsx')
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return result['rows_exported']
+
+
+def _worker(mode, db_path, out_dir, queue):
+    start = time.perf_counter()
+    rows = {'legacy': run_legacy, 'streaming': run_streaming}[mode](db_path, out_dir)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put({'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak_mb})
+
+
+def measure(mode, db_path, out_dir):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_worker, args=(mode, db_path, out_dir, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main(rows, modes):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"🏗️  Generating {rows:,} sales rows...")
+        build_database(db_path, rows)
+
+        print(f"\n{'mode':<12}{'rows':>12}{'seconds':>10}{'rows/sec':>12}{'peak RSS MB':>14}")
+        for mode in modes:
+            stats = measure(mode, db_path, tmp)
+            print(f"{mode:<12}{stats['rows']:>12,}{stats['seconds']:>10.2f}"
+                  f"{stats['rows'] / stats['seconds']:>12,.0f}{stats['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "streaming"],
+                        choices=["legacy", "streaming"])
+    args = parser.parse_args()
+    main(args.rows, args.modes)
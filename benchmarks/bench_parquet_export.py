@@ -0,0 +1,59 @@
+"""
+Write time, file size and read-back time: xlsx vs Parquet exports
+
+Both paths stream the same synthetic sales table through PowerBIExporter;
+read-back uses pandas.read_excel and pyarrow.parquet.read_table, the
+closest local stand-ins for a Power BI refresh.
+
+    python -m benchmarks.bench_parquet_export --rows 500000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_excel_export import build_database
+from database import DatabaseManager
+from powerbi_export import PowerBIExporter
+
+
+def read_back(path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).num_rows
+    import pandas as pd
+    return len(pd.read_excel(path, sheet_name=None)['Data'])
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"🏗️  Generating {rows:,} sales rows...")
+        build_database(db_path, rows)
+
+        exporter = PowerBIExporter(DatabaseManager(f'sqlite:///{db_path}'))
+        exporter.export_dir = tmp
+
+        print(f"\n{'format':<10}{'write s':>10}{'rows/sec':>12}{'size MB':>10}{'read s':>10}")
+        for export_format in ('xlsx', 'parquet'):
+            start = time.perf_counter()
+            result = exporter.export_query("SELECT * FROM sales", 'bench_export', export_format)
+            write_s = time.perf_counter() - start
+            if not result['success']:
+                print(f"{export_format:<10} ❌ {result['error']}")
+                continue
+
+            size_mb = os.path.getsize(result['filepath']) / 1024 / 1024
+            start = time.perf_counter()
+            read_back(result['filepath'])
+            read_s = time.perf_counter() - start
+
+            print(f"{export_format:<10}{write_s:>10.2f}{result['rows_exported'] / write_s:>12,.0f}"
+                  f"{size_mb:>10.2f}{read_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,87 @@
+"""
+Payload size, serialization time and token count per response format
+
+Encodes full-table query results from the sales table (data/business.db)
+and the monthly_usage table (data/verizon_mobile.db) in every format
+supported by response_format.encode_result.
+
+Token counts use tiktoken's cl100k_base when it is installed, otherwise
+a word/punctuation split that tracks BPE counts closely enough to rank
+formats.
+
+Run from the repo root after create_sample_data.py and create_verizon_data.py:
+    python -m benchmarks.bench_response_format
+"""
+import argparse
+import re
+import time
+
+from database import DatabaseManager
+from response_format import RESPONSE_FORMATS, encode_result
+
+DATASETS = [
+    ("sales", "sqlite:///data/business.db", "SELECT * FROM sales"),
+    ("monthly_usage", "sqlite:///data/verizon_mobile.db", "SELECT * FROM monthly_usage"),
+]
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+
+    TOKENIZER = "cl100k_base"
+except ImportError:
+    _token_pattern = re.compile(r"\w+|[^\w\s]")
+
+    def count_tokens(text):
+        # Long unbroken runs (base64, hashes) split into ~4-char BPE pieces
+        return sum(1 if len(piece) <= 8 else -(-len(piece) // 4)
+                   for piece in _token_pattern.findall(text))
+
+    TOKENIZER = "approximate"
+
+
+def bench_format(result, response_format, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = encode_result(result, response_format)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'bytes': len(payload.encode('utf-8')),
+        'ms': timings[len(timings) // 2],
+        'tokens': count_tokens(payload),
+    }
+
+
+def main(max_rows, repeat):
+    print(f"📦 Response format benchmark (tokenizer: {TOKENIZER})")
+
+    for label, url, query in DATASETS:
+        result = DatabaseManager(url).execute_query(query, max_rows=max_rows)
+        if not result['success']:
+            print(f"\n❌ {label}: {result['error']}")
+            continue
+
+        print(f"\n{label}: {result['row_count']} rows x {len(result['columns'])} columns")
+        print(f"{'format':<10}{'bytes':>12}{'vs json':>10}{'ms':>10}{'tokens':>12}{'vs json':>10}")
+
+        baseline = None
+        for response_format in RESPONSE_FORMATS:
+            stats = bench_format(result, response_format, repeat)
+            baseline = baseline or stats
+            print(f"{response_format:<10}{stats['bytes']:>12,}"
+                  f"{stats['bytes'] / baseline['bytes']:>9.0%} "
+                  f"{stats['ms']:>10.2f}{stats['tokens']:>12,}"
+                  f"{stats['tokens'] / baseline['tokens']:>9.0%} ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.max_rows, args.repeat)
@@ -0,0 +1,94 @@
+"""
+query_database latency while a Power BI export is running
+
+Compares the old behaviour (handlers run directly on the event loop) with
+server.call_tool, which offloads handlers to the worker pool. Queries
+arrive at a fixed rate; latency is measured from arrival to response, so
+time spent stuck behind a blocked event loop is counted.
+
+Run from the repo root after create_sample_data.py:
+    python -m benchmarks.bench_tool_concurrency
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import server
+
+QUERY = "SELECT product, SUM(revenue) AS total_revenue FROM sales GROUP BY product"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def inline_call(name, arguments):
+    """Pre-offload behaviour: run the handler on the event loop itself"""
+    return server.TOOL_HANDLERS[name](arguments)
+
+
+async def run_scenario(call, n_queries, interval_ms):
+    latencies = []
+    exported = []
+
+    async def export():
+        result = await call("create_powerbi_dataset", {})
+        exported.append(result)
+
+    async def query(arrival):
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await call("query_database", {"sql_query": QUERY, "max_rows": 100})
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    start = time.perf_counter()
+    export_task = asyncio.create_task(export())
+    arrivals = [start + i * interval_ms / 1000 for i in range(n_queries)]
+    await asyncio.gather(export_task, *(query(a) for a in arrivals))
+    elapsed = time.perf_counter() - start
+
+    _cleanup_exports(exported)
+    return {
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies),
+        'wall_s': elapsed,
+    }
+
+
+def _cleanup_exports(exported):
+    for result in exported:
+        # call_tool returns TextContent; inline_call returns the raw dict
+        if isinstance(result, dict) and result.get('filepath'):
+            path = result['filepath']
+        elif isinstance(result, list):
+            import json
+            path = json.loads(result[0].text).get('filepath')
+        else:
+            path = None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+async def main(n_queries, interval_ms):
+    print(f"⏱️  {n_queries} query_database calls every {interval_ms}ms during create_powerbi_dataset\n")
+    print(f"{'mode':<10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'wall s':>10}")
+
+    for label, call in (("inline", inline_call), ("offload", server.call_tool)):
+        stats = await run_scenario(call, n_queries, interval_ms)
+        print(f"{label:<10}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['max_ms']:>10.2f}{stats['wall_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.interval_ms))
@@ -0,0 +1,383 @@
+"""
+Latency, throughput, peak RSS and payload size of every MCP tool
+
+Generates the business dataset with generate_data.py at each scale into
+a scratch directory, then drives server.call_tool in-process (one child
+process per scale, so the server's module-level DatabaseManager and the
+peak RSS both start fresh). ask_question uses a stub Anthropic client
+that answers from canned SQL, so no API key or network is needed and
+the timings are the server's own overhead (add --llm-latency-ms to
+simulate the model).
+
+Results go to benchmarks/results/<timestamp>-<commit>.json; pass
+--compare with an earlier file to see regressions between commits.
+
+Run from the repo root:
+    python -m benchmarks.bench_tools --scales 1 10 100
+    python -m benchmarks.bench_tools --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+# A case slower than this ratio (p50 latency or peak RSS) is flagged by --compare
+REGRESSION_THRESHOLD = 1.2
+
+# Canned answers for the stub model, keyed by question
+NL_QUESTIONS = {
+    "What's the total revenue by product?":
+        "SELECT product, SUM(revenue) AS total_revenue FROM sales GROUP BY product ORDER BY total_revenue DESC",
+    "Which sales rep has the most sales?":
+        "SELECT sales_rep, COUNT(*) AS deals, SUM(revenue) AS total_revenue FROM sales "
+        "GROUP BY sales_rep ORDER BY deals DESC",
+    "What's our average deal size by region?":
+        "SELECT c.region, AVG(s.revenue) AS avg_deal_size FROM sales s "
+        "JOIN customers c ON s.customer_id = c.customer_id GROUP BY c.region ORDER BY avg_deal_size DESC",
+}
+
+# (name, tool, arguments, options); options: repeat, cold (clear caches before each call)
+CASES = [
+    ("query_point", "query_database",
+     {"sql_query": "SELECT * FROM sales WHERE rowid = 100"}, {"cold": True}),
+    ("query_aggregate", "query_database",
+     {"sql_query": "SELECT product, SUM(revenue) AS total_revenue FROM sales GROUP BY product"}, {"cold": True}),
+    ("query_aggregate_cached", "query_database",
+     {"sql_query": "SELECT product, SUM(revenue) AS total_revenue FROM sales GROUP BY product"}, {}),
+    ("query_join", "query_database",
+     {"sql_query": "SELECT c.region, SUM(s.revenue) AS revenue FROM sales s "
+                   "JOIN customers c ON s.customer_id = c.customer_id GROUP BY c.region"}, {"cold": True}),
+    ("query_1000_rows_json", "query_database",
+     {"sql_query": "SELECT * FROM sales", "max_rows": 1000}, {"cold": True}),
+    ("query_1000_rows_columnar", "query_database",
+     {"sql_query": "SELECT * FROM sales", "max_rows": 1000, "response_format": "columnar"}, {"cold": True}),
+    ("query_stream_page", "query_database",
+     {"sql_query": "SELECT * FROM sales", "page_size": 1000}, {"cold": True}),
+    ("get_database_schema", "get_database_schema", {"force_refresh": True}, {}),
+    ("get_table_sample", "get_table_sample", {"table_name": "sales", "limit": 5}, {}),
+    ("get_cache_stats", "get_cache_stats", {}, {}),
+    ("analyze_csv_columns", "analyze_csv", {"filename": "sales_export.csv", "operation": "columns"}, {}),
+    ("analyze_csv_head", "analyze_csv", {"filename": "sales_export.csv", "operation": "head"}, {}),
+    ("analyze_csv_summary", "analyze_csv", {"filename": "sales_export.csv", "operation": "summary"}, {}),
+    ("analyze_csv_describe", "analyze_csv", {"filename": "sales_export.csv", "operation": "describe"}, {}),
+    ("ask_question_generate", "ask_question",
+     {"question": "What's our average deal size by region?"}, {"cold": True}),
+    ("ask_question_cached", "ask_question",
+     {"question": "What's the total revenue by product?"}, {}),
+    ("export_xlsx", "export_to_powerbi",
+     {"sql_query": "SELECT * FROM sales", "filename": "bench_sales.xlsx"}, {"repeat": 1}),
+    ("export_parquet", "export_to_powerbi",
+     {"sql_query": "SELECT * FROM sales", "filename": "bench_sales", "format": "parquet"}, {"repeat": 1}),
+    ("create_powerbi_dataset", "create_powerbi_dataset", {}, {"repeat": 1}),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def current_rss():
+    """Resident set size in bytes, or None where it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RSSSampler:
+    """Peak RSS while a block runs, sampled from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and rss > (self.peak or 0):
+                self.peak = rss
+
+
+class StubMessages:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def create(self, model, max_tokens, messages):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        prompt = messages[0]['content']
+        question = prompt.rsplit('QUESTION:', 1)[-1].split('\n', 1)[0].strip()
+        sql = NL_QUESTIONS.get(question, "SELECT COUNT(*) AS row_count FROM sales")
+        return StubResponse(sql)
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.content = [StubText(text)]
+
+
+class StubText:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubAnthropic:
+    """Stands in for anthropic.Anthropic: same messages.create call, canned SQL"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.messages = StubMessages(latency_ms)
+
+
+def _rows(payload: dict):
+    for key in ('row_count', 'rows_exported'):
+        if isinstance(payload.get(key), int):
+            return payload[key]
+    if isinstance(payload.get('rows_per_table'), dict):
+        return sum(payload['rows_per_table'].values())
+    if isinstance(payload.get('rows'), list):
+        return len(payload['rows'])
+    return None
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+async def run_case(server, tool: str, arguments: dict, repeat: int, cold: bool) -> dict:
+    latencies = []
+    payload_bytes = 0
+    rows = None
+    errors = []
+
+    # Cold calls skip the result cache and the NL-to-SQL cache
+    nl_cache = server.nl_engine.cache if server.nl_engine is not None else None
+    if cold and nl_cache is not None:
+        server.nl_engine.cache = None
+
+    with RSSSampler() as sampler:
+        baseline = sampler.peak
+        for _ in range(repeat):
+            if cold:
+                server.db.invalidate_cache()
+            start = time.perf_counter()
+            response = await server.call_tool(tool, dict(arguments))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            text = response[0].text
+            payload_bytes = len(text.encode('utf-8'))
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                payload = {}
+            if isinstance(payload, dict):
+                if payload.get('success') is False and payload.get('error') not in errors:
+                    errors.append(payload.get('error'))
+                rows = _rows(payload)
+                if tool in ('export_to_powerbi', 'create_powerbi_dataset') and payload.get('filepath'):
+                    _remove(payload['filepath'])
+
+    if nl_cache is not None:
+        server.nl_engine.cache = nl_cache
+    total_s = sum(latencies) / 1000
+    return {
+        'tool': tool,
+        'calls': repeat,
+        'cold': cold,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'calls_per_s': round(repeat / total_s, 1) if total_s else None,
+        'rows': rows,
+        'payload_bytes': payload_bytes,
+        'peak_rss_mb': round(sampler.peak / 2**20, 1) if sampler.peak else None,
+        'rss_growth_mb': round((sampler.peak - baseline) / 2**20, 1) if sampler.peak and baseline else None,
+        'errors': errors,
+    }
+
+
+async def run_scale(repeat: int, llm_latency_ms: float, only: list) -> dict:
+    """Benchmark every case against the dataset in ./data (runs in the child process)"""
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+    import server
+
+    if server.nl_engine is not None:
+        server.nl_engine.client = StubAnthropic(llm_latency_ms)
+
+    results = {}
+    for name, tool, arguments, options in CASES:
+        if only and name not in only:
+            continue
+        results[name] = await run_case(server, tool, arguments,
+                                       options.get('repeat', repeat), options.get('cold', False))
+    return results
+
+
+def _generate(scale: float, workdir: str) -> dict:
+    from generate_data import generate
+    data_dir = os.path.join(workdir, 'data')
+    return generate('business', scale, seed=42, formats=['sqlite', 'csv'], output_dir=data_dir)
+
+
+def _child(scale: float, workdir: str, repeat: int, llm_latency_ms: float, only: list) -> dict:
+    # Runs with the scratch directory as cwd, where the server's relative data/ paths point
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])),
+               DB_TYPE='sqlite',
+               SQLITE_DATABASE_URL='sqlite:///data/business.db',
+               NL_CACHE_PATH='data/nl_query_cache.db',
+               QUERY_LOG_PATH='data/query_log.db')
+    command = [sys.executable, '-m', 'benchmarks.bench_tools', '--child',
+               '--repeat', str(repeat), '--llm-latency-ms', str(llm_latency_ms)]
+    if only:
+        command += ['--only', *only]
+    completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'success': False, 'error': completed.stderr.strip().splitlines()[-1:] or ['child failed']}
+    # The server prints status lines on import; the results are the last line
+    return {'success': True, 'cases': json.loads(completed.stdout.strip().splitlines()[-1])}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_scale(scale: float, sales_rows: int, cases: dict):
+    print(f"\n📏 scale {scale:g} ({sales_rows:,} sales rows)")
+    print(f"{'case':<28}{'p50 ms':>10}{'p95 ms':>10}{'calls/s':>10}{'rows':>9}{'bytes':>11}{'peak MB':>9}{'+MB':>7}")
+    for name, stats in cases.items():
+        flag = '  ❌ ' + str(stats['errors'][0])[:60] if stats['errors'] else ''
+        print(f"{name:<28}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['calls_per_s'] or 0:>10.1f}{stats['rows'] or 0:>9,}{stats['payload_bytes']:>11,}"
+              f"{stats['peak_rss_mb'] or 0:>9.1f}{stats['rss_growth_mb'] or 0:>7.1f}{flag}")
+
+
+def compare(previous_path: str, current: dict) -> int:
+    """Print per-case ratios against an earlier results file; returns the number of regressions"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    print(f"\n🔍 vs {previous.get('commit')} ({previous.get('timestamp')}), "
+          f"flagging ratios above {REGRESSION_THRESHOLD:.2f}")
+    regressions = 0
+    for scale, run in current['scales'].items():
+        before = previous.get('scales', {}).get(scale)
+        if not before or not run.get('success') or not before.get('success'):
+            continue
+        print(f"\n📏 scale {scale}")
+        print(f"{'case':<28}{'p50 before':>12}{'p50 now':>10}{'ratio':>8}{'RSS before':>12}{'RSS now':>10}")
+        for name, stats in run['cases'].items():
+            old = before['cases'].get(name)
+            if not old:
+                continue
+            latency_ratio = stats['p50_ms'] / old['p50_ms'] if old['p50_ms'] else 1.0
+            rss_ratio = (stats['peak_rss_mb'] / old['peak_rss_mb']
+                         if stats['peak_rss_mb'] and old['peak_rss_mb'] else 1.0)
+            regressed = latency_ratio > REGRESSION_THRESHOLD or rss_ratio > REGRESSION_THRESHOLD
+            regressions += regressed
+            print(f"{name:<28}{old['p50_ms']:>12.2f}{stats['p50_ms']:>10.2f}{latency_ratio:>8.2f}"
+                  f"{old['peak_rss_mb'] or 0:>12.1f}{stats['peak_rss_mb'] or 0:>10.1f}"
+                  f"{'  ⚠️  regression' if regressed else ''}")
+    print(f"\n{regressions} regression(s)")
+    return regressions
+
+
+def main(args) -> int:
+    results = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'llm_latency_ms': args.llm_latency_ms,
+        'scales': {},
+    }
+    print(f"⏱️  MCP tool benchmark at commit {results['commit']} "
+          f"(scales {', '.join(f'{s:g}' for s in args.scales)}, {args.repeat} calls per case)")
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix='mcp-bench-') as workdir:
+            generated = _generate(scale, workdir)
+            sales_rows = generated['rows_per_table']['sales']
+            run = _child(scale, workdir, args.repeat, args.llm_latency_ms, args.only)
+        run.update({'sales_rows': sales_rows, 'rows_per_table': generated['rows_per_table'],
+                    'generate_s': generated['elapsed_s']})
+        results['scales'][f"{scale:g}"] = run
+        if run['success']:
+            print_scale(scale, sales_rows, run['cases'])
+        else:
+            print(f"\n❌ scale {scale:g}: {run['error']}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        return 1 if compare(args.compare, results) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=float, nargs='+', default=[1, 10, 100],
+                        help="generate_data.py scale factors (1 = 200 sales rows)")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls per case (exports run once)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="Simulated model latency for ask_question")
+    parser.add_argument("--only", nargs='+', default=[], help="Run only these cases")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file; exits 1 if any case regressed")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_scale(args.repeat, args.llm_latency_ms, args.only))))
+    else:
+        sys.exit(main(args))
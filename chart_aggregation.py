@@ -0,0 +1,228 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Every planned chart stays within these bounds, whatever the row count
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '1000'))          # line/area points per series
+CHART_MAX_CATEGORIES = int(os.getenv('CHART_MAX_CATEGORIES', '50'))    # bars, boxes, slices, ...
+CHART_MAX_SERIES = int(os.getenv('CHART_MAX_SERIES', '10'))            # colour groups
+CHART_RAW_POINTS = int(os.getenv('CHART_RAW_POINTS', '5000'))          # scatter drawn point by point up to this
+CHART_DENSITY_BINS = int(os.getenv('CHART_DENSITY_BINS', '80'))        # per axis, for dense scatters
+CHART_HIST_BINS = int(os.getenv('CHART_HIST_BINS', '60'))
+CHART_VIOLIN_BINS = int(os.getenv('CHART_VIOLIN_BINS', '50'))
+
+# Bar charts of at most this many rows are drawn from the rows themselves
+RAW_BAR_ROWS = 500
+
+# Time buckets for line/area charts, finest first: (pandas frequency, approximate seconds)
+_TIME_BUCKETS = [('s', 1), ('min', 60), ('h', 3600), ('D', 86400), ('W', 7 * 86400),
+                 ('MS', 30 * 86400), ('QS', 91 * 86400), ('YS', 365 * 86400)]
+
+_SUMMED = ('pie', 'donut', 'treemap', 'sunburst', 'waterfall', 'funnel')
+
+
+def _is_numeric(values: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+
+def _columns(df: pd.DataFrame, x, y, color) -> pd.DataFrame:
+    """The chart's columns, y numeric, rows missing x or y dropped"""
+    names = [c for c in dict.fromkeys([x, y, color]) if c and c in df.columns]
+    d = df[names]
+    if y and y in d.columns and not _is_numeric(d[y]):
+        d = d.assign(**{y: pd.to_numeric(d[y], errors='coerce')})
+    return d.dropna(subset=[c for c in (x, y) if c and c in d.columns])
+
+
+def _top(values: pd.Series, limit: int, weights: pd.Series = None) -> pd.Index:
+    """The limit most frequent (or heaviest) values"""
+    totals = values.value_counts() if weights is None else weights.abs().groupby(values, observed=True).sum()
+    return totals.nlargest(limit).index
+
+
+def _keep(d: pd.DataFrame, column, limit: int, weights=None):
+    """Rows whose column value is among the top limit; whether any were cut"""
+    if not column or d[column].nunique() <= limit:
+        return d, False
+    top = _top(d[column], limit, d[weights] if weights else None)
+    return d[d[column].isin(top)], True
+
+
+def _plan(kind: str, data: pd.DataFrame, rows: int, color=None, y_label=None, truncated=False) -> dict:
+    return {
+        'kind': kind,
+        'data': data,
+        'color': color,
+        'y_label': y_label,
+        'rows': rows,
+        'points': len(data),
+        'truncated': truncated,
+    }
+
+
+def _grouped(d, rows, x, y, color, how, limit=CHART_MAX_CATEGORIES, label=True) -> dict:
+    d, cut_colors = _keep(d, color, CHART_MAX_SERIES)
+    d, cut = _keep(d, x, limit, weights=y)
+    keys = [x] + ([color] if color else [])
+    data = d.groupby(keys, observed=True)[y].agg(how).reset_index()
+    return _plan('grouped', data, rows, color, f"{y} ({how})" if label else None, cut or cut_colors)
+
+
+def _trend(d, rows, x, y, color) -> dict:
+    if len(d) <= CHART_MAX_POINTS:
+        return _plan('raw', d.sort_values(x), rows, color)
+    d, cut = _keep(d, color, CHART_MAX_SERIES)
+    keys = [color] if color else []
+    values = d[x]
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        span = (values.max() - values.min()).total_seconds()
+        freq = next((f for f, seconds in _TIME_BUCKETS if span / seconds <= CHART_MAX_POINTS), 'YS')
+        data = d.groupby([pd.Grouper(key=x, freq=freq)] + keys, observed=True)[y].mean().dropna().reset_index()
+        return _plan('bucketed', data, rows, color, f"{y} (mean per {freq})", cut)
+
+    if _is_numeric(values):
+        # Equal-width bins over x; each point is the bin's mean x and mean y
+        low, high = float(values.min()), float(values.max())
+        width = (high - low) / CHART_MAX_POINTS or 1.0
+        bins = np.minimum(((values.to_numpy(dtype=np.float64) - low) / width).astype(np.int64), CHART_MAX_POINTS - 1)
+        data = d.groupby([bins] + keys, observed=True)[[x, y]].mean()
+        data = (data.reset_index(level=keys) if keys else data).reset_index(drop=True)
+        return _plan('binned', data.sort_values(x), rows, color, f"{y} (mean)", cut)
+
+    return _grouped(d, rows, x, y, color, 'mean', limit=CHART_MAX_POINTS)
+
+
+def _scatter(d, rows, x, y, color) -> dict:
+    if len(d) <= CHART_RAW_POINTS:
+        return _plan('raw', d, rows, color)
+    if not (_is_numeric(d[x]) and _is_numeric(d[y])):
+        return _plan('sample', d.sample(n=CHART_RAW_POINTS, random_state=42), rows, color, truncated=True)
+    # Density: rows counted into a grid, one point per non-empty cell
+    counts, x_edges, y_edges = np.histogram2d(d[x].to_numpy(dtype=np.float64), d[y].to_numpy(dtype=np.float64),
+                                              bins=CHART_DENSITY_BINS)
+    i, j = np.nonzero(counts)
+    data = pd.DataFrame({
+        x: (x_edges[i] + x_edges[i + 1]) / 2,
+        y: (y_edges[j] + y_edges[j + 1]) / 2,
+        'count': counts[i, j].astype(np.int64),
+    })
+    return _plan('density', data, rows)
+
+
+def _histogram(d, rows, x) -> dict:
+    values = d[x]
+    if not _is_numeric(values):
+        d, cut = _keep(d, x, CHART_MAX_CATEGORIES)
+        data = d[x].value_counts().rename_axis(x).reset_index(name='count')
+        return _plan('counts', data, rows, truncated=cut)
+    values = values.to_numpy(dtype=np.float64)
+    edges = np.histogram_bin_edges(values, bins='auto')
+    if len(edges) - 1 > CHART_HIST_BINS:
+        edges = np.histogram_bin_edges(values, bins=CHART_HIST_BINS)
+    counts, edges = np.histogram(values, bins=edges)
+    data = pd.DataFrame({x: (edges[:-1] + edges[1:]) / 2, 'count': counts, 'width': np.diff(edges)})
+    return _plan('histogram', data, rows)
+
+
+def _groups(d, x, y):
+    """(rows, group label per row, group column name, whether categories were cut) for per-category stats"""
+    if x and x != y and x in d.columns:
+        d, cut = _keep(d, x, CHART_MAX_CATEGORIES)
+        return d, d[x], x, cut
+    return d, pd.Series('all', index=d.index), 'group', False
+
+
+def _box_stats(d, rows, x, y) -> dict:
+    d, groups, name, cut = _groups(d, x, y)
+    values = d[y]
+    grouped = values.groupby(groups, observed=True)
+    stats = grouped.quantile([.25, .5, .75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    iqr = stats['q3'] - stats['q1']
+    # Tukey whiskers: the most extreme values within 1.5 IQR of the box
+    low = groups.map(stats['q1'] - 1.5 * iqr).astype(float)
+    high = groups.map(stats['q3'] + 1.5 * iqr).astype(float)
+    stats['lowerfence'] = values.where(values >= low).groupby(groups, observed=True).min()
+    stats['upperfence'] = values.where(values <= high).groupby(groups, observed=True).max()
+    stats['mean'] = grouped.mean()
+    stats['count'] = grouped.size()
+    return _plan('box_stats', stats.rename_axis(name).reset_index(), rows, truncated=cut)
+
+
+def _violin_density(d, rows, x, y) -> dict:
+    d, groups, name, cut = _groups(d, x, y)
+    codes, labels = pd.factorize(groups, sort=True)
+    values = d[y].to_numpy(dtype=np.float64)
+    edges = np.histogram_bin_edges(values, bins=CHART_VIOLIN_BINS)
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, CHART_VIOLIN_BINS - 1)
+    # One histogram per group in a single bincount, each scaled to its own peak
+    counts = np.bincount(codes * CHART_VIOLIN_BINS + bins,
+                         minlength=len(labels) * CHART_VIOLIN_BINS).reshape(len(labels), CHART_VIOLIN_BINS)
+    density = counts / np.maximum(counts.max(axis=1, keepdims=True), 1)
+    data = pd.DataFrame({
+        name: np.repeat(np.asarray(labels, dtype=object), CHART_VIOLIN_BINS),
+        y: np.tile((edges[:-1] + edges[1:]) / 2, len(labels)),
+        'density': density.ravel(),
+    })
+    return _plan('violin_density', data, rows, truncated=cut)
+
+
+def _matrix(df, x, y, color) -> dict:
+    """Mean y per (x, color) cell when both are small categoricals, else the numeric correlation matrix"""
+    if y and y in df.columns and color and color in df.columns and color not in (x, y) and x in df.columns:
+        d = _columns(df, x, y, color)
+        if d[x].nunique() <= CHART_MAX_CATEGORIES and d[color].nunique() <= 20:
+            return _plan('matrix', d.pivot_table(values=y, index=x, columns=color, aggfunc='mean', observed=True),
+                         len(df))
+    return _plan('matrix', df.select_dtypes(include=[np.number]).corr(), len(df))
+
+
+def plan_chart(df: pd.DataFrame, ctype: str, x: str, y: str = None, color: str = None) -> dict:
+    """
+    The reduced data a chart needs, computed on all rows
+
+    Aggregates with pandas/numpy so only a bounded series reaches Plotly:
+    bars and slices become per-category means or sums, lines become
+    time-bucketed or x-binned means, dense scatters become a grid of
+    counts, histograms become bin counts, and box/violin charts become
+    per-category quartiles or density profiles. Small inputs that are
+    already within the bounds are passed through as rows.
+
+    Returns:
+        dict with kind (raw, grouped, bucketed, binned, sample, density,
+        histogram, counts, box_stats, violin_density, matrix), data (DataFrame),
+        color (the colour column still usable, if any), y_label, rows
+        (input rows), points (rows shipped) and truncated (whether
+        categories or series beyond the caps were left out)
+    """
+    ct = ctype.lower()
+    if ct == 'heatmap':
+        return _matrix(df, x, y, color)
+    if color == x:
+        color = None  # colouring by the x column adds no series
+    d = _columns(df, x, y, color)
+    rows = len(df)
+    has_y = bool(y and y in d.columns)
+    if not len(d):
+        return _plan('raw', d, rows)
+
+    if ct == 'histogram':
+        return _histogram(d, rows, x)
+    if not has_y:
+        return _plan('raw', d.head(CHART_RAW_POINTS), rows, color, truncated=len(d) > CHART_RAW_POINTS)
+    if ct in ('line', 'area'):
+        return _trend(d, rows, x, y, color)
+    if ct in ('scatter', 'bubble'):
+        return _scatter(d, rows, x, y, color)
+    if ct == 'box':
+        return _box_stats(d, rows, x, y)
+    if ct == 'violin':
+        return _violin_density(d, rows, x, y)
+    if ct in _SUMMED:
+        return _grouped(d, rows, x, y, None, 'sum', label=False)
+    # bar and anything unrecognised
+    if len(d) <= RAW_BAR_ROWS:
+        return _plan('raw', d, rows, color)
+    return _grouped(d, rows, x, y, color, 'mean')
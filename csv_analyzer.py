@@ -0,0 +1,316 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from csv_cache import get_csv_cache
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is optional; the pandas C reader streams too
+    pa = None
+
+# Bytes per pyarrow block / rows per pandas chunk; peak memory is a few chunks
+CSV_BLOCK_BYTES = int(os.getenv('CSV_BLOCK_BYTES', str(4 * 2**20)))
+CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', '200000'))
+
+# Values kept per numeric column for the approximate quartiles
+CSV_QUANTILE_SAMPLE = int(os.getenv('CSV_QUANTILE_SAMPLE', '20000'))
+
+# Distinct values counted exactly per text column before unique/top become approximate
+CSV_DISTINCT_LIMIT = int(os.getenv('CSV_DISTINCT_LIMIT', '100000'))
+
+QUARTILES = (('25%', 0.25), ('50%', 0.5), ('75%', 0.75))
+
+
+def read_columns(path: str) -> list:
+    """Column names from the header line only"""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_head(path: str, rows: int = 10) -> pd.DataFrame:
+    """First rows of the file, without reading the rest"""
+    return pd.read_csv(path, nrows=max(int(rows), 0))
+
+
+def _arrow_chunks(path: str):
+    # Multithreaded parsing; column types are inferred from the first block
+    reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES))
+    yield from reader
+
+
+def _pandas_chunks(path: str):
+    # The C reader infers types per chunk, so a column may widen part way through
+    yield from pd.read_csv(path, chunksize=CSV_CHUNK_ROWS)
+
+
+class _NumericColumn:
+    """Count, min/max, Welford mean/variance and a bottom-k sample for quartiles"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sample = np.empty(0)
+        self.keys = np.empty(0)
+
+    def update(self, values: np.ndarray):
+        n = len(values)
+        if not n:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        # Chan et al.'s pairwise merge of (count, mean, M2)
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        low, high = values.min(), values.max()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        # Keep the values with the smallest random keys: a uniform sample of everything seen
+        keys = np.concatenate([self.keys, self.rng.random(n)])
+        sample = np.concatenate([self.sample, values.astype(float)])
+        if len(keys) > CSV_QUANTILE_SAMPLE:
+            keep = np.argpartition(keys, CSV_QUANTILE_SAMPLE)[:CSV_QUANTILE_SAMPLE]
+            keys, sample = keys[keep], sample[keep]
+        self.keys, self.sample = keys, sample
+
+    def describe(self) -> dict:
+        stats = {'count': self.count}
+        if not self.count:
+            return stats
+        stats['mean'] = self.mean
+        stats['std'] = (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
+        stats['min'] = _scalar(self.min)
+        for label, q in QUARTILES:
+            stats[label] = float(np.quantile(self.sample, q))
+        stats['max'] = _scalar(self.max)
+        if self.count > len(self.sample):
+            stats['quartiles_approximate'] = True
+        return stats
+
+
+class _TextColumn:
+    """Count and value frequencies; frequencies are pruned past CSV_DISTINCT_LIMIT"""
+
+    def __init__(self):
+        self.count = 0
+        self.counts = pd.Series(dtype='int64')
+        self.pruned = False
+        self.min = None
+        self.max = None
+
+    def update(self, values: pd.Series):
+        self.count += len(values)
+        if not len(values):
+            return
+        if pd.api.types.is_datetime64_any_dtype(values):
+            low, high = values.min(), values.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        counts = values.value_counts()
+        if self.pruned:
+            # Past the limit only tracked values, or ones frequent enough to displace them, are counted
+            counts = counts[(self.counts.index.get_indexer(counts.index) >= 0) | (counts > self.counts.min())]
+        self.counts = self.counts.add(counts, fill_value=0)
+        if len(self.counts) > CSV_DISTINCT_LIMIT:
+            # Keep the most frequent half; counts of rarer values are dropped
+            self.counts = self.counts.nlargest(CSV_DISTINCT_LIMIT // 2)
+            self.pruned = True
+
+    def describe(self) -> dict:
+        stats = {'count': self.count}
+        if not len(self.counts):
+            return stats
+        stats['unique'] = len(self.counts)
+        stats['top'] = _scalar(self.counts.idxmax())
+        stats['freq'] = int(self.counts.max())
+        if self.min is not None:
+            stats['min'] = _scalar(self.min)
+            stats['max'] = _scalar(self.max)
+        if self.pruned:
+            # unique is a lower bound; top/freq are the heaviest hitters seen
+            stats['unique_approximate'] = True
+        return stats
+
+
+def _scalar(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _merge_dtype(previous, current):
+    if previous is None or previous == current:
+        return current
+    if pd.api.types.is_numeric_dtype(previous) and pd.api.types.is_numeric_dtype(current):
+        return np.result_type(previous, current)
+    return np.dtype(object)
+
+
+class CSVProfile:
+    """Shape, dtypes, null counts and describe()-style statistics in one streaming pass"""
+
+    def __init__(self, with_statistics: bool = True, seed: int = 0):
+        self.with_statistics = with_statistics
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.columns = []
+        self.dtypes = {}
+        self.nulls = {}
+        self.stats = {}
+
+    def update(self, chunk):
+        """Add a pandas DataFrame or pyarrow RecordBatch"""
+        if pa is not None and isinstance(chunk, pa.RecordBatch):
+            if not self.with_statistics:
+                # Shape, types and nulls come straight from the Arrow metadata
+                self._update_arrow(chunk)
+                return
+            chunk = chunk.to_pandas(date_as_object=False)
+        if not self.columns:
+            self.columns = list(chunk.columns)
+        self.rows += len(chunk)
+
+        for column in self.columns:
+            values = chunk[column]
+            self.dtypes[column] = _merge_dtype(self.dtypes.get(column), values.dtype)
+            nulls = values.isna()
+            self.nulls[column] = self.nulls.get(column, 0) + int(nulls.sum())
+            if not self.with_statistics:
+                continue
+
+            values = values[~nulls]
+            numeric = (pd.api.types.is_numeric_dtype(values.dtype)
+                       and not pd.api.types.is_bool_dtype(values.dtype))
+            state = self.stats.get(column)
+            if state is None:
+                state = self.stats[column] = _NumericColumn(self.rng) if numeric else _TextColumn()
+            elif numeric and isinstance(state, _TextColumn):
+                # Earlier chunks were text, so the column is text (as pandas would read it)
+                values = values.astype(str)
+            elif not numeric and isinstance(state, _NumericColumn):
+                # A numeric column turned out to hold text: frequencies start from here
+                previous = state
+                state = self.stats[column] = _TextColumn()
+                state.count, state.pruned = previous.count, True
+            state.update(values.to_numpy() if isinstance(state, _NumericColumn) else values)
+
+    def _update_arrow(self, batch):
+        if not self.columns:
+            self.columns = list(batch.schema.names)
+        self.rows += batch.num_rows
+        dtypes = batch.schema.empty_table().to_pandas(date_as_object=False).dtypes
+        for column, array in zip(self.columns, batch.columns):
+            self.dtypes[column] = _merge_dtype(self.dtypes.get(column), dtypes[column])
+            self.nulls[column] = self.nulls.get(column, 0) + array.null_count
+
+    def summary(self) -> dict:
+        return {
+            'shape': (self.rows, len(self.columns)),
+            'columns': self.columns,
+            'dtypes': {col: str(self.dtypes[col]) for col in self.columns},
+            'null_counts': {col: self.nulls[col] for col in self.columns}
+        }
+
+    def statistics(self) -> dict:
+        return {col: self.stats[col].describe() for col in self.columns}
+
+
+def profile_csv(path: str, with_statistics: bool = True, sink=None) -> CSVProfile:
+    """
+    Stream a CSV file once and return its CSVProfile
+
+    Reads with pyarrow when it is installed. If a later block doesn't fit
+    the types pyarrow inferred from the first one, the file is profiled
+    again with the pandas chunked reader. The Arrow batches are also
+    handed to sink (see CSVFileCache.sink), so the parse can be reused.
+    """
+    if pa is not None:
+        profile = CSVProfile(with_statistics)
+        try:
+            for batch in _arrow_chunks(path):
+                if sink is not None:
+                    sink.write(batch)
+                profile.update(batch)
+        except pa.ArrowInvalid:
+            if sink is not None:
+                sink.abort()
+        else:
+            if sink is not None:
+                sink.close()
+            return profile
+
+    profile = CSVProfile(with_statistics)
+    for chunk in _pandas_chunks(path):
+        profile.update(chunk)
+    return profile
+
+
+def profile_table(table, with_statistics: bool = True) -> CSVProfile:
+    """CSVProfile of an already parsed (cached) Arrow table"""
+    profile = CSVProfile(with_statistics)
+    for batch in table.to_batches(max_chunksize=CSV_CHUNK_ROWS):
+        profile.update(batch)
+    return profile
+
+
+def analyze_csv(path: str, operation: str, rows: int = 10) -> dict:
+    """
+    Run one analyze_csv operation, reading only as much of the file as it needs
+
+    Once summary or describe has parsed a file, the table and results are
+    kept in the CSV file cache, so later operations on the unchanged file
+    skip parsing.
+
+    Args:
+        path: CSV file path
+        operation: 'columns' (header only), 'head' (first rows only),
+            'summary' or 'describe' (one streaming pass, bounded memory)
+        rows: Rows for 'head'
+
+    Returns:
+        dict with the operation's result (without the filename)
+    """
+    if operation not in ("columns", "head", "summary", "describe"):
+        raise ValueError(f"Unknown operation: {operation}. Use summary, head, describe or columns")
+
+    cache = get_csv_cache()
+    key = cache.key(path) if cache is not None and cache.enabled else None
+    entry = cache.get(key) if key is not None else None
+    table = entry['table'] if entry is not None else None
+
+    if operation == "columns":
+        return {"columns": table.schema.names if table is not None else read_columns(path)}
+
+    if operation == "head":
+        if table is not None:
+            return {"rows": table.slice(0, max(int(rows), 0)).to_pandas().to_dict('records')}
+        return {"rows": read_head(path, rows).to_dict('records')}
+
+    if entry is not None and operation in entry['results']:
+        return entry['results'][operation]
+
+    with_statistics = operation == "describe"
+    if table is not None:
+        profile = profile_table(table, with_statistics)
+    else:
+        profile = profile_csv(path, with_statistics, cache.sink(key) if key is not None else None)
+
+    results = {"summary": profile.summary()}
+    if with_statistics:
+        results["describe"] = {"statistics": profile.statistics()}
+    if key is not None:
+        for name, result in results.items():
+            cache.put_result(key, name, result)
+    return results[operation]
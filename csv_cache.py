@@ -0,0 +1,215 @@
+from collections import OrderedDict
+import glob
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # without pyarrow only analyze_csv results are cached
+    pa = None
+
+
+class _TableSink:
+    """Collects the record batches of one streaming pass into a cache entry
+
+    Files small enough for the memory budget are kept as an in-memory
+    Arrow table. Larger ones are written to an Arrow IPC (Feather v2)
+    sidecar as the batches arrive and memory-mapped afterwards, so the
+    whole file is never held in memory.
+    """
+
+    def __init__(self, cache, key: tuple, file_size: int):
+        self.cache = cache
+        self.key = key
+        self.batches = []
+        self.writer = None
+        self.tmp_path = None
+        if file_size > cache.max_bytes // 4 and cache.sidecars:
+            self.tmp_path = f"{cache.sidecar_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def write(self, batch):
+        if self.tmp_path is None:
+            self.batches.append(batch)
+            return
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.tmp_path), exist_ok=True)
+            self.writer = pa_ipc.new_file(self.tmp_path, batch.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.tmp_path is None:
+            if self.batches:
+                self.cache.put_table(self.key, pa.Table.from_batches(self.batches))
+            self.batches = []
+            return
+        if self.writer is None:
+            return
+        self.writer.close()
+        path = self.cache.sidecar_path(self.key)
+        os.replace(self.tmp_path, path)
+        self.cache.remove_old_sidecars(self.key)
+        self.cache.put_table(self.key, _map_sidecar(path), mapped=True)
+
+    def abort(self):
+        self.batches = []
+        if self.writer is not None:
+            self.writer.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def _map_sidecar(path: str):
+    # Zero-copy: columns point into the mapped file; the OS pages them in and out
+    return pa_ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+class CSVFileCache:
+    """LRU cache of parsed CSV files for analyze_csv, keyed on path, size and mtime
+
+    Each entry holds the parsed Arrow table (in memory, or memory-mapped
+    from a sidecar file for files too big for the budget) and the results
+    already computed from it. Editing or replacing the file changes its
+    size or mtime, so stale entries are never served. Sidecars outlive
+    the process and are reused after a restart while the file is
+    unchanged.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, sidecar_dir: str = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('CSV_CACHE_MAX_ENTRIES', '32'))
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else int(float(os.getenv('CSV_CACHE_MAX_MB', '256')) * 1024 * 1024))
+        self.sidecar_dir = sidecar_dir or os.getenv('CSV_CACHE_DIR', 'data/.csv_cache')
+        self.sidecars = pa is not None and os.getenv('CSV_CACHE_SIDECARS', 'true').lower() in ('1', 'true', 'yes')
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.sidecar_loads = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(path: str) -> tuple:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def sidecar_path(self, key: tuple) -> str:
+        path, size, mtime_ns = key
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.sidecar_dir, f"{digest}-{size}-{mtime_ns}.arrow")
+
+    def remove_old_sidecars(self, key: tuple):
+        current = self.sidecar_path(key)
+        prefix = os.path.basename(current).split('-', 1)[0]
+        for path in glob.glob(os.path.join(self.sidecar_dir, f"{prefix}-*.arrow")):
+            if path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped (Windows) or already gone; the next write retries
+                    pass
+
+    def get(self, key: tuple):
+        """Cache entry for an unchanged file: {'table': pa.Table or None, 'results': {...}}"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        if self.sidecars and os.path.exists(self.sidecar_path(key)):
+            try:
+                table = _map_sidecar(self.sidecar_path(key))
+            except (OSError, pa.ArrowInvalid):
+                return None
+            self.sidecar_loads += 1
+            return self.put_table(key, table, mapped=True)
+        return None
+
+    def sink(self, key: tuple):
+        """Sink for the record batches of a streaming read, or None if tables aren't cached"""
+        if pa is None or not self.enabled:
+            return None
+        return _TableSink(self, key, key[1])
+
+    def put_table(self, key: tuple, table, mapped: bool = False) -> dict:
+        # Mapped tables live in the page cache, not the heap: they don't count against max_bytes
+        size = 0 if mapped else table.nbytes
+        if size > self.max_bytes:
+            return self.put_result(key, None, None)
+        with self._lock:
+            entry = self._store(key)
+            self._bytes += size - entry['size']
+            entry.update({'table': table, 'mapped': mapped, 'size': size})
+            self._evict()
+            return entry
+
+    def put_result(self, key: tuple, operation: str, result) -> dict:
+        with self._lock:
+            entry = self._store(key)
+            if operation is not None:
+                entry['results'][operation] = result
+            self._evict()
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'mapped_entries': sum(1 for e in self._entries.values() if e['mapped']),
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'sidecar_loads': self.sidecar_loads,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _store(self, key: tuple) -> dict:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {
+                'table': None, 'mapped': False, 'size': 0, 'results': {}, 'stored_at': time.monotonic()
+            }
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, oldest = self._entries.popitem(last=False)
+            self._bytes -= oldest['size']
+            self.evictions += 1
+
+
+_csv_cache = None
+_csv_cache_lock = threading.Lock()
+
+
+def get_csv_cache():
+    """Process-wide CSVFileCache, or None when CSV_CACHE_ENABLED is false"""
+    global _csv_cache
+    if os.getenv('CSV_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _csv_cache_lock:
+        if _csv_cache is None:
+            _csv_cache = CSVFileCache()
+        return _csv_cache
@@ -13,6 +13,10 @@ import os
 from datetime import datetime
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from data_cleaning import clean_frame
+from dataset_profile import get_profile
+from chart_aggregation import plan_chart
+from dataset_store import content_key, get_dataset_store, shared_view
 import plotly.express as px
 import plotly.graph_objects as go
 
@@ -70,8 +74,6 @@ def get_color(idx=0):   return CHART_SINGLE[idx % len(CHART_SINGLE)]
 # ── Constants ─────────────────────────────────────────────────────────────────
 MAX_ROWS_FULL    = 50_000
 MAX_SAMPLE_ROWS  = 2_000
-MAX_PLOT_ROWS    = 10_000
-MAX_ANOMALY_ROWS = 10_000
 MAX_COLS_DESC    = 20
 
 MODEL_PRICING = {
@@ -129,7 +131,7 @@ def init_state():
         "kpis":{}, "snapshots":[],
         "question_set":False, "data_loaded":False, "analysed":False, "data_cleaned":False,
         "session_cost":0.0, "session_tokens":0, "model_calls":{"haiku":0,"sonnet":0,"opus":0},
-        "large_dataset":False, "dataset_rows":0, "dataset_cols":0,
+        "large_dataset":False, "dataset_rows":0, "dataset_cols":0, "clean_report":None, "dataset_key":None,
         "active_role":"", "dashboard_desc":"", "_show_upload":False,
     }
     for k, v in D.items():
@@ -139,19 +141,22 @@ init_state()
 client = get_client()
 
 def is_large(df): return len(df) > MAX_ROWS_FULL
-def sdf(df, n=MAX_SAMPLE_ROWS): return df if len(df) <= n else df.sample(n=n, random_state=42)
+
+def profile(df):
+    # The loaded dataset is profiled once, under its content hash; reruns never rescan it
+    key = st.session_state.dataset_key if (df is st.session_state.df or df is st.session_state.df_clean) else None
+    return get_profile(df, key, large_rows=MAX_ROWS_FULL, sample_rows=MAX_SAMPLE_ROWS, max_stat_columns=MAX_COLS_DESC)
 
 def df_summary(df, max_rows=5):
-    ds = sdf(df, max(max_rows*10, MAX_SAMPLE_ROWS)) if is_large(df) else df
+    p = profile(df)
     b = io.StringIO()
-    b.write(f"Shape: {df.shape[0]:,} rows x {df.shape[1]} columns")
-    b.write(f" (sample of {len(ds):,})\n" if is_large(df) else "\n")
-    b.write(f"Columns: {list(df.columns)}\n")
-    b.write(f"Dtypes:\n{df.dtypes.to_string()}\n")
-    b.write(f"Sample:\n{ds.head(max_rows).to_string()}\n")
-    nc = ds.select_dtypes(include=[np.number]).columns[:MAX_COLS_DESC]
-    if len(nc): b.write(f"Stats:\n{ds[nc].describe().to_string()}\n")
-    nl = df.isnull().sum(); ni = nl[nl > 0]
+    b.write(f"Shape: {p.rows:,} rows x {len(p.columns)} columns")
+    b.write(f" (sample of {p.sample_size:,})\n" if p.sampled else "\n")
+    b.write(f"Columns: {p.columns}\n")
+    b.write(f"Dtypes:\n{p.dtypes.to_string()}\n")
+    b.write(f"Sample:\n{p.sample.head(max_rows).to_string()}\n")
+    if p.stats is not None: b.write(f"Stats:\n{p.stats.to_string()}\n")
+    ni = p.null_counts[p.null_counts > 0]
     b.write(f"Nulls:\n{ni.to_string()}\n" if len(ni) else "Nulls: None\n")
     return b.getvalue()
 
@@ -179,74 +184,77 @@ def pjson(text):
 def snum(s): return pd.to_numeric(s, errors="coerce")
 
 def auto_clean(df):
-    df = df.copy()
-    for c in df.select_dtypes(include="object").columns:
-        df[c] = df[c].astype(str).str.strip().replace({"nan":np.nan,"None":np.nan,"":np.nan})
-    for c in df.select_dtypes(include="object").columns:
-        cv = snum(df[c])
-        if cv.notna().sum() / max(len(df), 1) > 0.7: df[c] = cv
-    df.dropna(axis=1, how="all", inplace=True)
-    return df
+    # One pass per column: strip/nulls, numeric/datetime, compact dtypes (see data_cleaning)
+    return clean_frame(df)[0]
 
 def detect_anomalies(df):
-    ds = sdf(df, MAX_ANOMALY_ROWS) if is_large(df) else df
     alerts = []
-    for c in ds.select_dtypes(include=[np.number]).columns[:8]:
-        q1, q3 = ds[c].quantile(.25), ds[c].quantile(.75)
-        iqr = q3 - q1
-        if iqr == 0: continue
-        out = ds[(ds[c] < q1-2.5*iqr) | (ds[c] > q3+2.5*iqr)]
-        if len(out):
-            alerts.append(f"**{c}**: {len(out)} outliers ({round(len(out)/len(ds)*100,1)}%) outside 2.5x IQR [{round(q1-2.5*iqr,2)}, {round(q3+2.5*iqr,2)}]")
+    # Most affected columns first
+    for c, o in sorted(profile(df).outliers.items(), key=lambda item: -item[1]["count"]):
+        if o["count"]:
+            alerts.append(f"**{c}**: {o['count']} outliers ({round(o['count']/o['checked']*100,1)}%) outside 2.5x IQR [{round(o['low'],2)}, {round(o['high'],2)}]")
     return alerts
 
 def build_chart(df, ctype, x, y, color=None, title="", color_idx=0):
     try:
-        dp = sdf(df, MAX_PLOT_ROWS) if is_large(df) else df.copy()
-        if y and y in dp.columns: dp[y] = snum(dp[y]); dp = dp.dropna(subset=[y])
-        if x and x in dp.columns: dp = dp.dropna(subset=[x])
+        ct = ctype.lower()
+        # Aggregated on all rows; only the reduced series goes to Plotly (see chart_aggregation)
+        plan = plan_chart(df, ct, x, y, color if color and color in df.columns else None)
+        dp = plan["data"]
         if len(dp) == 0: st.warning(f"No data to plot: {title}"); return None
-        vc = color if color and color in dp.columns else None
+        vc = plan["color"]
         palette = get_palette(color_idx); single = get_color(color_idx)
-        kw = dict(x=x, y=y, title=title, color=vc, color_discrete_sequence=palette)
-        ct = ctype.lower()
-        if ct == "bar":
-            if len(dp) > 500:
-                da = dp.groupby(x, as_index=False)[y].mean()
-                fig = px.bar(da, x=x, y=y, title=title, color_discrete_sequence=palette)
-            else: fig = px.bar(dp, **kw)
+        labels = {y: plan["y_label"]} if plan["y_label"] else None
+        kw = dict(x=x, y=y, title=title, color=vc, color_discrete_sequence=palette, labels=labels)
+        if ct == "bar":         fig = px.bar(dp, **kw)
         elif ct == "line":      fig = px.line(dp, **kw)
-        elif ct == "scatter":   fig = px.scatter(dp, **kw)
         elif ct == "area":      fig = px.area(dp, **kw)
-        elif ct == "histogram": fig = px.histogram(dp, x=x, title=title, color_discrete_sequence=[single])
-        elif ct == "box":       fig = px.box(dp, x=x, y=y, title=title, color_discrete_sequence=palette)
-        elif ct == "violin":    fig = px.violin(dp, x=x, y=y, title=title, color_discrete_sequence=palette)
+        elif ct in ("scatter", "bubble") and plan["kind"] == "density":
+            fig = px.scatter(dp, x=x, y=y, color="count", size="count" if ct == "bubble" else None, title=title,
+                             color_continuous_scale="Oranges", labels={"count": "rows"})
+        elif ct == "scatter":   fig = px.scatter(dp, **kw)
+        elif ct == "histogram":
+            fig = px.bar(dp, x=x, y="count", title=title, color_discrete_sequence=[single])
+            fig.update_layout(bargap=0 if plan["kind"] == "histogram" else .2)
+        elif ct == "box":
+            g = dp.columns[0]
+            fig = go.Figure(go.Box(x=dp[g].astype(str).tolist(), q1=dp["q1"], median=dp["median"], q3=dp["q3"],
+                                   lowerfence=dp["lowerfence"], upperfence=dp["upperfence"], mean=dp["mean"],
+                                   name=y, marker_color=single, boxpoints=False))
+            fig.update_layout(title=title, xaxis_title=g, yaxis_title=y)
+        elif ct == "violin":
+            g = dp.columns[0]; fig = go.Figure()
+            for i, (k, dv) in enumerate(dp.groupby(g, sort=False)):
+                w = dv["density"].to_numpy() * .4
+                fig.add_trace(go.Scatter(x=np.concatenate([i - w, (i + w)[::-1]]), y=np.concatenate([dv[y], dv[y][::-1]]),
+                                         fill="toself", mode="lines", name=str(k), line=dict(color=palette[i % len(palette)], width=1)))
+            cats = dp[g].unique()
+            fig.update_layout(title=title, yaxis_title=y, showlegend=False,
+                              xaxis=dict(tickvals=list(range(len(cats))), ticktext=[str(c) for c in cats]))
         elif ct == "pie":
-            da = dp.groupby(x, as_index=False)[y].sum().nlargest(15, y)
+            da = dp.nlargest(15, y)
             fig = px.pie(da, names=x, values=y, title=title, color_discrete_sequence=px.colors.qualitative.Set3)
         elif ct == "donut":
-            da = dp.groupby(x, as_index=False)[y].sum().nlargest(15, y)
+            da = dp.nlargest(15, y)
             fig = px.pie(da, names=x, values=y, title=title, hole=.45, color_discrete_sequence=px.colors.qualitative.Pastel)
-        elif ct == "heatmap":
-            piv = (dp.pivot_table(values=y, index=x, columns=vc, aggfunc="mean")
-                   if (vc and dp[x].nunique() <= 50 and dp[vc].nunique() <= 20)
-                   else dp.select_dtypes(include=[np.number]).corr())
-            fig = px.imshow(piv, title=title, color_continuous_scale="RdYlGn")
-        elif ct == "funnel":    fig = px.funnel(dp, x=y, y=x, title=title, color_discrete_sequence=palette)
+        elif ct == "heatmap":   fig = px.imshow(dp, title=title, color_continuous_scale="RdYlGn")
+        elif ct == "funnel":    fig = px.funnel(dp.sort_values(y, ascending=False), x=y, y=x, title=title, color_discrete_sequence=palette)
         elif ct == "treemap":
-            da = dp.groupby(x, as_index=False)[y].sum(); da = da[da[y] > 0]
+            da = dp[dp[y] > 0]
             fig = px.treemap(da, path=[x], values=y, title=title, color_discrete_sequence=px.colors.qualitative.Bold)
         elif ct == "sunburst":
-            da = dp.groupby(x, as_index=False)[y].sum(); da = da[da[y] > 0]
+            da = dp[dp[y] > 0]
             fig = px.sunburst(da, path=[x], values=y, title=title, color_discrete_sequence=px.colors.qualitative.Vivid)
         elif ct == "bubble":
             sc = dp[y].copy(); sc = sc - sc.min() + 1 if sc.min() <= 0 else sc
             fig = px.scatter(dp, x=x, y=y, size=sc, title=title, color_discrete_sequence=[single])
         elif ct == "waterfall":
-            dw = dp.groupby(x, as_index=False)[y].sum()
-            fig = go.Figure(go.Waterfall(x=dw[x].astype(str).tolist(), y=dw[y].tolist(), connector={"line":{"color":single}}))
+            fig = go.Figure(go.Waterfall(x=dp[x].astype(str).tolist(), y=dp[y].tolist(), connector={"line":{"color":single}}))
             fig.update_layout(title=title)
         else: fig = px.bar(dp, **kw)
+        if plan["truncated"]:
+            fig.add_annotation(text=f"Top categories of {plan['rows']:,} rows", xref="paper", yref="paper", x=1, y=1.08,
+                               showarrow=False, font=dict(size=10, color="#888"))
         fig.update_layout(
             paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="#111111",
             font=dict(family="Plus Jakarta Sans", color="#FFF", size=12),
@@ -368,12 +376,13 @@ def tab_setup():
         b1, b2 = st.columns(2)
         with b1:
             if st.button("▶  Try Sample Data", key="hero_sample", use_container_width=True, type="primary"):
-                df = get_sample_data()
-                st.session_state.df = df; st.session_state.df_clean = df.copy()
+                df, _ = get_dataset_store().get_or_load("sample_sales_data", get_sample_data)
+                st.session_state.df = df; st.session_state.df_clean = df; st.session_state.dataset_key = "sample_sales_data"
                 st.session_state.filename = "sample_sales_data.csv"
                 st.session_state.data_loaded = True; st.session_state.data_cleaned = True
                 st.session_state.large_dataset = False
                 st.session_state.dataset_rows = len(df); st.session_state.dataset_cols = len(df.columns)
+                st.session_state.clean_report = None
                 if not st.session_state.business_question:
                     st.session_state.business_question = "What's driving revenue growth this quarter?"
                     st.session_state.question_set = True
@@ -457,20 +466,32 @@ def _setup_uploader():
         try:
             df = None
             with st.spinner(f"Loading {uploaded.name}... please wait"):
-                if uploaded.name.endswith(".csv"):
-                    try: df = pd.read_csv(uploaded)
-                    except Exception: uploaded.seek(0); df = pd.read_csv(uploaded, encoding="latin-1")
-                else:
+                sheet = None
+                if not uploaded.name.endswith(".csv"):
                     xl = pd.ExcelFile(uploaded)
                     sheet = st.selectbox("Select sheet:", xl.sheet_names, key="sheet_sel") if len(xl.sheet_names) > 1 else xl.sheet_names[0]
-                    df = pd.read_excel(uploaded, sheet_name=sheet)
-                df = auto_clean(df)
+
+                def load():
+                    uploaded.seek(0)
+                    if sheet is None:
+                        try: raw = pd.read_csv(uploaded)
+                        except Exception: uploaded.seek(0); raw = pd.read_csv(uploaded, encoding="latin-1")
+                    else:
+                        raw = pd.read_excel(uploaded, sheet_name=sheet)
+                    cleaned, report["clean"] = clean_frame(raw)
+                    return cleaned
+
+                # Same bytes (from any session) = same dataset: parsed and held once
+                report = {"clean": None}
+                key = content_key(uploaded.getbuffer(), sheet)
+                df, _ = get_dataset_store().get_or_load(key, load)
 
             if df is not None:
                 # Write ALL session state atomically AFTER spinner completes
-                df_clean = df.copy()
+                # df and df_clean are copy-on-write views of the shared dataset
                 st.session_state.df           = df
-                st.session_state.df_clean     = df_clean
+                st.session_state.df_clean     = df
+                st.session_state.dataset_key  = key
                 st.session_state.filename     = uploaded.name
                 st.session_state.data_loaded  = True
                 st.session_state.data_cleaned = True
@@ -478,6 +499,7 @@ def _setup_uploader():
                 st.session_state.large_dataset = is_large(df)
                 st.session_state.dataset_rows  = len(df)
                 st.session_state.dataset_cols  = len(df.columns)
+                st.session_state.clean_report  = report["clean"]
                 st.session_state["_show_upload"] = False
                 st.session_state.analysis_result = None
                 st.session_state.recommendations = None
@@ -488,8 +510,12 @@ def _setup_uploader():
                 mb = uploaded.size / (1024*1024) if hasattr(uploaded, "size") else 0
                 rows_fmt = f"{len(df)/1_000_000:.2f}M" if len(df) >= 1_000_000 else f"{len(df):,}"
                 st.success(f"✅ Loaded **{uploaded.name}** — {rows_fmt} rows × {len(df.columns)} columns ({mb:.1f} MB)")
+                if report["clean"]:
+                    r = report["clean"]
+                    st.info(f"🧹 Cleaned in {r['elapsed_ms']/1000:.1f}s — {len(r['conversions'])} columns converted, "
+                            f"memory {r['memory_before']/2**20:.1f} → {r['memory_after']/2**20:.1f} MB (−{r['reduction_pct']:.0f}%)")
                 if is_large(df):
-                    st.info(f"📊 Large dataset — AI uses {MAX_SAMPLE_ROWS:,}-row sample. Charts up to {MAX_PLOT_ROWS:,} rows.")
+                    st.info(f"📊 Large dataset — AI uses {MAX_SAMPLE_ROWS:,}-row sample. Charts aggregate all rows.")
                 st.rerun()
         except Exception as e: st.error(f"Error reading file: {e}")
 
@@ -497,6 +523,7 @@ def _setup_uploader():
 def _setup_workspace():
     """Compact workspace shown after data is loaded."""
     df = st.session_state.df
+    p = profile(df)
 
     if not st.session_state.business_question:
         st.markdown("""<p style="font-family:'Space Grotesk',sans-serif;font-size:.72rem;font-weight:700;
@@ -531,9 +558,11 @@ def _setup_workspace():
                 st.session_state.question_set = False
                 st.rerun()
 
-    rows_fmt = f"{df.shape[0]/1_000_000:.2f}M" if df.shape[0] >= 1_000_000 else f"{df.shape[0]:,}"
-    nc  = len(df.select_dtypes(include=[np.number]).columns)
-    nul = df.isnull().sum().sum()
+    rows_fmt = f"{p.rows/1_000_000:.2f}M" if p.rows >= 1_000_000 else f"{p.rows:,}"
+    nc  = len(p.numeric_columns)
+    nul = p.null_total
+    cr = st.session_state.clean_report
+    mem = (f"{cr['memory_after']/2**20:.1f} MB <span style=\"color:#4ADE80\">(−{cr['reduction_pct']:.0f}%)</span>" if cr else "")
     sampling_badge = '<span style="background:#1A1000;border:1px solid #FFBB33;border-radius:999px;padding:.15rem .5rem;font-size:.7rem;color:#FFE0A0">&#128202; Sampling ON</span>' if st.session_state.large_dataset else ""
     st.markdown(f"""
     <div style="background:#1E1E1E;border:1px solid #2E2E2E;border-radius:10px;
@@ -543,16 +572,17 @@ def _setup_workspace():
       <div><span style="font-size:.65rem;color:#6B6B6B;text-transform:uppercase;letter-spacing:.5px">Rows</span>
            <p style="margin:.1rem 0 0;color:#FF5C00;font-size:.83rem;font-weight:700">{rows_fmt}</p></div>
       <div><span style="font-size:.65rem;color:#6B6B6B;text-transform:uppercase;letter-spacing:.5px">Cols</span>
-           <p style="margin:.1rem 0 0;color:#FFF;font-size:.83rem;font-weight:600">{df.shape[1]}</p></div>
+           <p style="margin:.1rem 0 0;color:#FFF;font-size:.83rem;font-weight:600">{len(p.columns)}</p></div>
       <div><span style="font-size:.65rem;color:#6B6B6B;text-transform:uppercase;letter-spacing:.5px">Numeric</span>
            <p style="margin:.1rem 0 0;color:#FFF;font-size:.83rem;font-weight:600">{nc}</p></div>
       <div><span style="font-size:.65rem;color:#6B6B6B;text-transform:uppercase;letter-spacing:.5px">Missing</span>
            <p style="margin:.1rem 0 0;color:{"#FF5C00" if nul>0 else "#4ADE80"};font-size:.83rem;font-weight:600">{nul:,}</p></div>
+      {f'<div><span style="font-size:.65rem;color:#6B6B6B;text-transform:uppercase;letter-spacing:.5px">Memory</span><p style="margin:.1rem 0 0;color:#FFF;font-size:.83rem;font-weight:600">{mem}</p></div>' if mem else ""}
       <div style="margin-left:auto">{sampling_badge}</div>
     </div>""", unsafe_allow_html=True)
 
     with st.expander("Preview data (first 10 rows)", expanded=False):
-        st.dataframe(df.head(10), use_container_width=True)
+        st.dataframe(p.head, use_container_width=True)
 
     with st.expander("Upload a different file"):
         _setup_uploader()
@@ -577,7 +607,7 @@ def tab_analyse():
         st.info("Upload data in the **Setup** tab first."); return
     # Ensure df_clean is always available
     if st.session_state.df_clean is None:
-        st.session_state.df_clean = st.session_state.df.copy()
+        st.session_state.df_clean = st.session_state.df
     df = st.session_state.df_clean
     question = st.session_state.business_question or "General analysis"
     rows = len(df)
@@ -587,7 +617,7 @@ def tab_analyse():
 
     if is_large(df):
         rows_fmt = f"{rows/1_000_000:.2f}M" if rows >= 1_000_000 else f"{rows:,}"
-        st.markdown(f'<div class="ok-box">&#128202; <strong>Large dataset mode</strong> ({rows_fmt} rows) — AI uses a {MAX_SAMPLE_ROWS:,}-row sample. Charts use up to {MAX_PLOT_ROWS:,} rows. Full stats computed on all data.</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="ok-box">&#128202; <strong>Large dataset mode</strong> ({rows_fmt} rows) — AI uses a {MAX_SAMPLE_ROWS:,}-row sample. Charts and full stats are computed on all data.</div>', unsafe_allow_html=True)
 
     if st.button("Run AI Analyst", key="run_analyst"):
         with st.spinner("Running analysis with intelligent model routing..."):
@@ -695,7 +725,7 @@ def tab_explore():
     if not st.session_state.data_loaded or st.session_state.df is None:
         st.info("Upload data in the **Setup** tab first."); return
     if st.session_state.df_clean is None:
-        st.session_state.df_clean = st.session_state.df.copy()
+        st.session_state.df_clean = st.session_state.df
     df = st.session_state.df_clean; rows = len(df)
     st.markdown('<div class="step-label">STEP 4 — NATURAL LANGUAGE QUERY</div>', unsafe_allow_html=True)
     st.markdown("## Ask Questions")
@@ -758,12 +788,12 @@ def tab_dashboard():
     if not st.session_state.data_loaded or st.session_state.df is None:
         st.info("Upload data in the **Setup** tab first."); return
     if st.session_state.df_clean is None:
-        st.session_state.df_clean = st.session_state.df.copy()
+        st.session_state.df_clean = st.session_state.df
     df = st.session_state.df_clean
     question = st.session_state.business_question or "General analysis"
     rows = len(df)
     nc = list(df.select_dtypes(include=[np.number]).columns)
-    cc = list(df.select_dtypes(include="object").columns)
+    cc = list(df.select_dtypes(include=["object", "category", "string"]).columns)
 
     st.markdown('<div class="step-label">STEP 6 — CUSTOM DASHBOARD</div>', unsafe_allow_html=True)
     st.markdown("## Generate Custom Dashboard")
@@ -876,7 +906,7 @@ def tab_monitor():
     if not st.session_state.data_loaded or st.session_state.df is None:
         st.info("Upload data in the **Setup** tab first."); return
     if st.session_state.df_clean is None:
-        st.session_state.df_clean = st.session_state.df.copy()
+        st.session_state.df_clean = st.session_state.df
     df = st.session_state.df_clean
     st.markdown('<div class="step-label">STEP 8 — MONITOR & ITERATE</div>', unsafe_allow_html=True)
     st.markdown("## Monitor & Iterate")
@@ -907,7 +937,7 @@ def tab_monitor():
             if st.button("Add KPI", key="add_kpi"):
                 if kl and kc:
                     try:
-                        lv={"df":df,"pd":pd,"np":np}; exec(kc,{},lv); val=lv.get("result")
+                        lv={"df":shared_view(df),"pd":pd,"np":np}; exec(kc,{},lv); val=lv.get("result")
                         if val is not None:
                             st.session_state.kpis[kl]={"value":float(val),"label":kl}
                             st.success(f"KPI '{kl}' = {val:.2f}"); st.rerun()
@@ -13,6 +13,8 @@ import numpy as np
 from io import BytesIO
 from pathlib import Path
 import warnings
+from dataset_profile import DatasetProfile, get_profile
+from dataset_store import content_key
 
 warnings.filterwarnings('ignore')
 load_dotenv()
@@ -77,12 +79,17 @@ def get_claude_client():
         return None
 
 # Enhanced data quality validation (handles Power BI better)
-def validate_data_quality(df, sheet_info=None):
-    """Enhanced data quality assessment that handles Power BI exports properly"""
+def validate_data_quality(df, sheet_info=None, profile=None):
+    """Enhanced data quality assessment that handles Power BI exports properly
+
+    Null counts, duplicates and memory come from the dataset's profile
+    (computed here if not given), so reruns don't rescan the data.
+    """
+    profile = profile if profile is not None else DatasetProfile(df)
     quality_report = {
-        'total_rows': len(df),
-        'total_columns': len(df.columns),
-        'memory_usage': f"{df.memory_usage(deep=True).sum() / 1024**2:.2f} MB",
+        'total_rows': profile.rows,
+        'total_columns': len(profile.columns),
+        'memory_usage': f"{profile.memory_bytes / 1024**2:.2f} MB",
         'issues': [],
         'recommendations': [],
         'column_analysis': {},
@@ -103,7 +110,7 @@ def validate_data_quality(df, sheet_info=None):
         quality_report['data_type'] = 'Sales Data'
     
     # Check for missing values (be more intelligent based on data type)
-    missing_data = df.isnull().sum()
+    missing_data = profile.null_counts
     
     if quality_report['data_type'] == 'Reference Data':
         # For reference data, only flag if > 60% missing
@@ -118,8 +125,8 @@ def validate_data_quality(df, sheet_info=None):
             quality_report['recommendations'].append("Consider data cleaning or imputation")
     
     # Check for duplicate rows
-    duplicates = df.duplicated().sum()
-    if duplicates > 0:
+    duplicates = profile.duplicates
+    if duplicates:
         quality_report['issues'].append(f"{duplicates} duplicate rows found")
         quality_report['recommendations'].append("Remove duplicate rows for accurate analysis")
     
@@ -844,7 +851,9 @@ def main():
         st.session_state['uploaded_df'] = combined_df
 
         with show_loading_state("Analyzing data quality..."):
-            quality_report = validate_data_quality(combined_df)
+            # Profiled once per set of uploaded files
+            files_key = "|".join(content_key(f.getbuffer(), f.name) for f in uploaded_files)
+            quality_report = validate_data_quality(combined_df, profile=get_profile(combined_df, files_key))
             st.session_state['data_quality_report'] = quality_report
 
         # FIXED: Display quality results with proper spacing
@@ -0,0 +1,241 @@
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (backs the string[pyarrow] dtype)
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:  # high-cardinality text stays as Python objects
+    STRING_DTYPE = None
+
+# Narrow dtypes to save memory: low-cardinality text -> category, other text ->
+# Arrow strings, numbers downcast where no value changes. On by default; set
+# CLEAN_COMPACT_DTYPES=false (or pass compact=False) to keep the original dtypes
+COMPACT_DTYPES = os.getenv('CLEAN_COMPACT_DTYPES', 'true').lower() in ('1', 'true', 'yes')
+
+# When compacting, text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = float(os.getenv('DATASET_CATEGORY_MAX_RATIO', '0.5'))
+
+# A text column becomes numeric (or datetime) when more than this share of its rows parse
+PARSE_MIN_SHARE = float(os.getenv('CLEAN_PARSE_MIN_SHARE', '0.7'))
+
+# Integers are never downcast below this width: int8/int16 arithmetic
+# (e.g. units * price_cents) overflows silently in pandas
+MIN_INT_BITS = int(os.getenv('CLEAN_MIN_INT_BITS', '32'))
+
+NULL_TOKENS = ['nan', 'None', '']
+
+# ISO dates / timestamps; other layouts (01/02/2024, ...) are ambiguous and stay text
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$')
+
+# Rows checked before parsing every distinct value; a column whose sample
+# is far below PARSE_MIN_SHARE (IDs, names, ...) is not parsed in full
+_SAMPLE_ROWS = 1000
+_SAMPLE_MIN_SHARE = PARSE_MIN_SHARE / 2
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _estimated_bytes(df: pd.DataFrame) -> int:
+    """frame_bytes without visiting every cell: Python objects are sized from a sample of rows"""
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object and len(df):
+            values = df.iloc[:, i].to_numpy()
+            sample = values[::max(len(values) // _SAMPLE_ROWS, 1)]
+            total += int(sum(map(sys.getsizeof, sample)) / len(sample) * len(values))
+    return total
+
+
+def _is_text(dtype) -> bool:
+    if isinstance(dtype, pd.CategoricalDtype):
+        return False
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def _factorize_text(values: pd.Series):
+    """
+    Integer codes plus the distinct stripped labels of a text column
+
+    Stripping, null tokens and parsing are then done once per distinct
+    value instead of once per row. Returns (codes, labels) with code -1
+    for nulls.
+    """
+    try:
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    except TypeError:  # unhashable cells (lists, dicts): compare them by their text
+        codes, uniques = pd.factorize(values.astype(str), use_na_sentinel=True)
+    raw = pd.Index(uniques).astype(STRING_DTYPE or str)
+    labels = raw.str.strip()
+    nulls = labels.isin(NULL_TOKENS)
+    if nulls.any() or not labels.equals(raw):
+        # "a" and " a " are one value once stripped
+        label_codes, labels = pd.factorize(labels.where(~nulls), use_na_sentinel=True)
+        codes = np.append(label_codes, -1)[codes]
+    return codes, pd.Index(labels)
+
+
+def _parsed_rows(codes: np.ndarray, parsed: np.ndarray) -> int:
+    """Rows whose label parsed"""
+    present = codes[codes >= 0]
+    return int(parsed[present].sum()) if len(present) else 0
+
+
+def _sample_passes(codes: np.ndarray, labels: pd.Index, test) -> bool:
+    """Whether test(labels) holds for enough of an evenly spaced sample of rows"""
+    sample = codes[::max(len(codes) // _SAMPLE_ROWS, 1)]
+    hit = np.unique(sample[sample >= 0])
+    passed = np.zeros(len(labels), dtype=bool)
+    passed[hit] = test(labels[hit])
+    return _parsed_rows(sample, passed) > _SAMPLE_MIN_SHARE * len(sample)
+
+
+def _as_numbers(codes: np.ndarray, labels: pd.Index, rows: int):
+    if not _sample_passes(codes, labels, lambda l: np.asarray(pd.to_numeric(l, errors='coerce').notna())):
+        return None
+    numbers = np.asarray(pd.to_numeric(labels, errors='coerce'))
+    if numbers.dtype.kind not in 'iuf':
+        numbers = numbers.astype(float)
+    parsed = ~np.isnan(numbers) if numbers.dtype.kind == 'f' else np.ones(len(numbers), dtype=bool)
+    if _parsed_rows(codes, parsed) <= PARSE_MIN_SHARE * rows:
+        return None
+    if numbers.dtype.kind in 'iu' and (codes >= 0).all():
+        return numbers[codes]
+    return np.append(numbers.astype(float), np.nan)[codes]
+
+
+def _as_datetimes(codes: np.ndarray, labels: pd.Index, rows: int):
+    if not _sample_passes(codes, labels, lambda l: np.array([bool(_ISO_DATE.match(x)) for x in l], dtype=bool)):
+        return None
+    try:
+        dates = pd.to_datetime(labels, errors='coerce', format='ISO8601')
+    except (ValueError, TypeError):  # e.g. mixed UTC offsets
+        return None
+    if _parsed_rows(codes, np.asarray(dates.notna())) <= PARSE_MIN_SHARE * rows:
+        return None
+    return dates.take(codes, allow_fill=True, fill_value=pd.NaT)
+
+
+def _downcast_int(values: np.ndarray) -> np.ndarray:
+    if not len(values):
+        return values
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.bits >= MIN_INT_BITS and info.min <= low and high <= info.max:
+            return values.astype(dtype, copy=False)
+    return values
+
+
+def _downcast_float(values: np.ndarray) -> np.ndarray:
+    # Only when float32 holds every value exactly; 19.99 etc. keep float64
+    narrow = values.astype(np.float32)
+    with np.errstate(over='ignore', invalid='ignore'):
+        exact = np.array_equal(narrow.astype(np.float64), values, equal_nan=True)
+    return narrow if exact else values
+
+
+def _downcast(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == 'i':
+        return _downcast_int(values)
+    if values.dtype.kind == 'f':
+        return _downcast_float(values)
+    return values
+
+
+def clean_column(values: pd.Series, rows: int = None, compact: bool = None):
+    """
+    Clean one column in a single pass
+
+    Text is stripped and "nan"/"None"/"" become nulls; the column then
+    becomes numeric if most rows parse as numbers, datetime if most parse
+    as ISO dates, otherwise stays text. With compact (default
+    COMPACT_DTYPES, on) text becomes categorical (few distinct values) or
+    compact strings, and numbers are downcast where no value changes;
+    compact=False keeps the column's own text dtype and 64-bit numbers.
+
+    Returns:
+        The cleaned values (ndarray, Index, Categorical or extension array), or None when the column is empty
+    """
+    rows = len(values) if rows is None else rows
+    compact = COMPACT_DTYPES if compact is None else compact
+    dtype = values.dtype
+
+    if _is_text(dtype):
+        codes, labels = _factorize_text(values)
+        if not (codes >= 0).any():
+            return None
+        numbers = _as_numbers(codes, labels, rows)
+        if numbers is not None:
+            return _downcast(numbers) if compact else numbers
+        dates = _as_datetimes(codes, labels, rows)
+        if dates is not None:
+            return dates
+        if compact and len(labels) <= CATEGORY_MAX_RATIO * max(rows, 1):
+            return pd.Categorical.from_codes(codes, categories=labels)
+        text = pd.api.extensions.take(labels.array, codes, allow_fill=True)
+        if not compact or (isinstance(dtype, pd.StringDtype) and dtype.storage == 'pyarrow'):
+            return text.astype(dtype)  # stripped, in the column's own dtype
+        return text
+
+    if values.isna().all():
+        return None
+    if compact and isinstance(dtype, np.dtype) and dtype.kind in 'if':
+        return _downcast(values.to_numpy())
+    return values
+
+
+def clean_frame(df: pd.DataFrame, compact: bool = None):
+    """
+    Clean an uploaded DataFrame column by column (see clean_column)
+
+    Empty columns are dropped. The input frame is not modified and the
+    result is a new frame, so callers need not copy it. Pass compact=False
+    when the original dtypes are needed (no categoricals or downcasting).
+
+    Returns:
+        (cleaned DataFrame, report) where the report has memory before
+        (estimated for object columns) and after, the conversions made and
+        the columns dropped
+    """
+    start = time.perf_counter()
+    memory_before = _estimated_bytes(df)
+    rows = len(df)
+
+    cleaned = df.copy(deep=False)
+    keep = []
+    conversions = {}
+    dropped = []
+    for i, name in enumerate(df.columns):
+        values = df.iloc[:, i]
+        result = clean_column(values, rows, compact)
+        if result is None:
+            dropped.append(str(name))
+            continue
+        keep.append(i)
+        if result is not values:
+            cleaned.isetitem(i, result)
+            new_dtype = cleaned.dtypes.iloc[i]
+            if new_dtype != values.dtype:
+                conversions[str(name)] = f"{values.dtype} -> {new_dtype}"
+    if dropped:
+        cleaned = cleaned.iloc[:, keep]
+
+    memory_after = frame_bytes(cleaned)
+    report = {
+        'rows': rows,
+        'columns': len(keep),
+        'memory_before': memory_before,
+        'memory_after': memory_after,
+        'reduction_pct': round(100 * (1 - memory_after / memory_before), 1) if memory_before else 0.0,
+        'conversions': conversions,
+        'dropped': dropped,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+    return cleaned, report
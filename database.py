@@ -1,37 +1,290 @@
-from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, text, event
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import json
+from schema_catalog import SchemaCatalog
+from result_stream import ResultStream, streams
+from sql_rewriter import QueryRejected, prepare_query
+from query_cache import QueryResultCache, fingerprint
+from materialized_views import MaterializedViewManager
+from query_log import get_query_log
 
 load_dotenv()
 
+# One engine per database URL per process. server.py, PowerBIExporter and
+# NaturalLanguageQueryEngine all build a DatabaseManager, and they should
+# share the same connection pool instead of opening one each.
+_engines = {}
+_pool_stats = {}
+_catalogs = {}
+_result_caches = {}
+_views = {}
+_registry_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_pool_settings() -> dict:
+    """Pool configuration, overridable through environment variables"""
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+
+def get_sqlite_pragmas() -> dict:
+    """PRAGMAs applied to every new SQLite connection"""
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        # 256 MB of memory-mapped I/O
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 268435456),
+        # Negative values are KiB, so this is a 64 MB page cache
+        'cache_size': _env_int('SQLITE_CACHE_SIZE', -65536),
+    }
+
+
+def default_database_url():
+    """Build the database URL selected by DB_TYPE"""
+    db_type = os.getenv('DB_TYPE', 'sqlite')
+
+    if db_type == 'sqlite':
+        return os.getenv('SQLITE_DATABASE_URL', 'sqlite:///data/business.db')
+    elif db_type == 'postgresql':
+        return os.getenv('POSTGRES_CONNECTION_STRING')
+    elif db_type == 'mysql':
+        return os.getenv('MYSQL_CONNECTION_STRING')
+    elif db_type == 'snowflake':
+        # For your Snowflake experience!
+        from snowflake.sqlalchemy import URL
+        return URL(
+            account=os.getenv('SNOWFLAKE_ACCOUNT'),
+            user=os.getenv('SNOWFLAKE_USER'),
+            password=os.getenv('SNOWFLAKE_PASSWORD'),
+            database=os.getenv('SNOWFLAKE_DATABASE'),
+            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE')
+        )
+
+    raise ValueError(f"Unsupported DB_TYPE: {db_type}")
+
+
+class PoolStats:
+    """Thread-safe checkout/wait counters for one engine's pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def attach(self, engine):
+        """Register pool event listeners on the engine"""
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_conn, conn_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(engine, 'checkin')
+        def _on_checkin(dbapi_conn, conn_record):
+            with self._lock:
+                self.checkins += 1
+
+        @event.listens_for(engine, 'invalidate')
+        def _on_invalidate(dbapi_conn, conn_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def record_wait(self, wait_ms: float):
+        # Anything over 1ms means the caller queued behind the pool
+        with self._lock:
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if wait_ms > 1.0:
+                self.waits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+            }
+
+
+def _apply_sqlite_pragmas(engine):
+    pragmas = get_sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_conn, conn_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def get_engine(url=None):
+    """
+    Return the process-wide engine for a database URL, creating it on first use
+
+    Args:
+        url: SQLAlchemy URL (defaults to the DB_TYPE configuration)
+
+    Returns:
+        Shared SQLAlchemy Engine
+    """
+    if url is None:
+        url = default_database_url()
+    key = str(url)
+
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+
+        settings = get_pool_settings()
+        is_sqlite = key.startswith('sqlite')
+        kwargs = {
+            'echo': False,
+            'pool_pre_ping': settings['pool_pre_ping'],
+            'pool_recycle': settings['pool_recycle'],
+        }
+        if is_sqlite and ':memory:' not in key and key not in ('sqlite://', 'sqlite:///'):
+            # File databases get a real QueuePool shared across threads
+            kwargs['connect_args'] = {'check_same_thread': False}
+        if not is_sqlite or 'connect_args' in kwargs:
+            kwargs.update(
+                pool_size=settings['pool_size'],
+                max_overflow=settings['max_overflow'],
+                pool_timeout=settings['pool_timeout'],
+            )
+
+        engine = create_engine(url, **kwargs)
+        if is_sqlite:
+            _apply_sqlite_pragmas(engine)
+
+        stats = PoolStats()
+        stats.attach(engine)
+
+        _engines[key] = engine
+        _pool_stats[key] = stats
+        _catalogs[key] = SchemaCatalog(engine)
+        _result_caches[key] = QueryResultCache()
+        _views[key] = MaterializedViewManager(engine)
+        return engine
+
+
+def get_pool_stats(url=None) -> dict:
+    """Pool status and counters for a registered engine"""
+    key = str(url if url is not None else default_database_url())
+    engine = _engines.get(key)
+    if engine is None:
+        return {'success': False, 'error': 'Engine not initialised'}
+
+    pool = engine.pool
+    stats = {
+        'success': True,
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+        **_pool_stats[key].snapshot(),
+    }
+    for attr in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, attr):
+            stats[attr] = getattr(pool, attr)()
+    return stats
+
+
+def dispose_engines():
+    """Close every pooled connection (used by tests and forked workers)"""
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _pool_stats.clear()
+        _catalogs.clear()
+        _result_caches.clear()
+        _views.clear()
+
+
 class DatabaseManager:
     """Manages database connections and query execution"""
     
-    def __init__(self):
-        db_type = os.getenv('DB_TYPE', 'sqlite')
-        
-        if db_type == 'sqlite':
-            self.engine = create_engine('sqlite:///data/business.db', echo=False)
-        elif db_type == 'postgresql':
-            conn_str = os.getenv('POSTGRES_CONNECTION_STRING')
-            self.engine = create_engine(conn_str)
-        elif db_type == 'mysql':
-            conn_str = os.getenv('MYSQL_CONNECTION_STRING')
-            self.engine = create_engine(conn_str)
-        elif db_type == 'snowflake':
-            # For your Snowflake experience!
-            from snowflake.sqlalchemy import URL
-            self.engine = create_engine(URL(
-                account=os.getenv('SNOWFLAKE_ACCOUNT'),
-                user=os.getenv('SNOWFLAKE_USER'),
-                password=os.getenv('SNOWFLAKE_PASSWORD'),
-                database=os.getenv('SNOWFLAKE_DATABASE'),
-                warehouse=os.getenv('SNOWFLAKE_WAREHOUSE')
-            ))
-        
-        self.Session = sessionmaker(bind=self.engine)
+    def __init__(self, db_url=None):
+        self.db_url = db_url if db_url is not None else default_database_url()
+        self.engine = get_engine(self.db_url)
+        self.dialect = self.engine.dialect.name
+        self._pool_stats = _pool_stats[str(self.db_url)]
+        self.catalog = _catalogs[str(self.db_url)]
+        self.result_cache = _result_caches[str(self.db_url)]
+        self.views = _views[str(self.db_url)]
+
+    def _checkout(self):
+        start = time.perf_counter()
+        conn = self.engine.connect()
+        self._pool_stats.record_wait((time.perf_counter() - start) * 1000)
+        return conn
+
+    @contextmanager
+    def connect(self):
+        """Check a connection out of the shared pool, recording wait time"""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_pool_stats(self) -> dict:
+        """Connection pool counters for this manager's engine"""
+        return get_pool_stats(self.db_url)
+
+    def get_cache_stats(self) -> dict:
+        """Hit/miss counters for the result cache and schema catalog"""
+        return {
+            'success': True,
+            'query_cache': self.result_cache.stats(),
+            'schema_catalog': self.catalog.stats(),
+            'materialized_views_routed': self.views.routed,
+            'connection_pool': self.get_pool_stats()
+        }
+
+    def invalidate_cache(self, tables=None):
+        """Drop cached results for the given tables (or all of them)"""
+        self.result_cache.invalidate(tables)
+
+    def _data_version(self, conn, tables):
+        # Database-level change tokens (reused briefly, see
+        # SchemaCatalog.recent_change_tokens) plus local per-table write counters
+        return (self.catalog.recent_change_tokens(conn), self.result_cache.table_versions(tables))
     
     def execute_query(self, query: str, max_rows: int = 100):
         """
@@ -45,33 +298,64 @@ class DatabaseManager:
             dict with success status, columns, rows, and metadata
         """
         try:
-            with self.Session() as session:
-                # Security: Only SELECT queries allowed
-                if not query.strip().upper().startswith('SELECT'):
-                    return {
-                        'success': False,
-                        'error': 'Only SELECT queries are allowed for security'
-                    }
+            # Security: only read-only SELECT/WITH queries, with the row cap
+            # pushed into the outermost query for this dialect
+            query = prepare_query(query, max_rows, self.dialect)
+        except QueryRejected as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        try:
+            with self.connect() as conn:
+                # Aggregates over sales may be answered from a summary table;
+                # the workload log keeps the query as the caller wrote it
+                logged_query = query
+                query, view = self.views.route(conn, query)
                 
-                # Add LIMIT if not present
-                if 'LIMIT' not in query.upper():
-                    query = f"{query} LIMIT {max_rows}"
+                cache_key, tables = None, None
+                if self.result_cache.enabled:
+                    cache_key, tables = fingerprint(query, max_rows, self.dialect)
+                
+                query_log = get_query_log()
+                if cache_key:
+                    version = self._data_version(conn, tables)
+                    cached = self.result_cache.get(cache_key, version)
+                    if cached is not None:
+                        # Still part of the workload: the index advisor weighs queries by how often they are asked
+                        if query_log is not None:
+                            query_log.record(self.db_url, logged_query, 0.0, cached=True)
+                        return {**cached, 'cached': True}
                 
                 # Execute query
-                result = session.execute(text(query))
+                start = time.perf_counter()
+                result = conn.execute(text(query))
                 columns = list(result.keys())
                 rows = result.fetchall()
+                elapsed_ms = (time.perf_counter() - start) * 1000
                 
                 # Convert to list of dicts for JSON serialization
                 data = [dict(zip(columns, row)) for row in rows]
                 
-                return {
+                response = {
                     'success': True,
                     'columns': columns,
                     'data': data,
                     'row_count': len(data),
                     'query_executed': query
                 }
+                if view:
+                    response['materialized_view'] = view
+                
+                # Workload for the index advisor
+                if query_log is not None:
+                    query_log.record(self.db_url, logged_query, elapsed_ms)
+                
+                if cache_key:
+                    self.result_cache.put(cache_key, version, response, tables)
+                
+                return response
                 
         except Exception as e:
             return {
@@ -80,42 +364,144 @@ class DatabaseManager:
                 'error_type': type(e).__name__
             }
     
-    def get_schema_info(self):
+    def iter_batches(self, query: str, batch_size: int = 10000, max_rows: int = None):
+        """
+        Yield (columns, rows) batches straight from the database cursor
+        
+        Used by exports, which need every row but never all of them at once.
+        An empty result yields a single (columns, []) batch.
+        
+        Args:
+            query: SQL SELECT statement
+            batch_size: Rows fetched per round trip
+            max_rows: Optional cap on total rows (None for no cap)
+        
+        Raises:
+            QueryRejected: if the query is not read-only
+        """
+        query = prepare_query(query, max_rows, self.dialect)
+        
+        with self.connect() as conn:
+            query, _ = self.views.route(conn, query)
+            result = conn.execution_options(yield_per=batch_size).execute(text(query))
+            columns = list(result.keys())
+            empty = True
+            for rows in result.partitions(batch_size):
+                empty = False
+                yield columns, rows
+            if empty:
+                yield columns, []
+    
+    def execute_query_stream(self, query: str, page_size: int = 100, max_rows: int = None):
+        """
+        Execute SQL query and return only its first page of results
+        
+        Rows are pulled from the database cursor in page_size batches, so
+        memory is bounded by the page size rather than the result size.
+        
+        Args:
+            query: SQL SELECT statement
+            page_size: Rows per page (capped at STREAM_MAX_PAGE_SIZE)
+            max_rows: Optional cap on total rows across all pages
+        
+        Returns:
+            dict with the first page and a next_token for fetch_page
+        """
+        try:
+            query = prepare_query(query, max_rows, self.dialect)
+        except QueryRejected as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        page_size = max(1, min(int(page_size), int(os.getenv('STREAM_MAX_PAGE_SIZE', '5000'))))
+        
+        conn = self._checkout()
+        try:
+            result = conn.execution_options(yield_per=page_size).execute(text(query))
+        except Exception as e:
+            conn.close()
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+        
+        stream = ResultStream(conn, result, page_size, max_rows)
+        token = streams.register(stream)
+        return self.fetch_page(token)
+    
+    def fetch_page(self, token: str):
+        """
+        Fetch the next page of a streamed result
+        
+        Args:
+            token: Continuation token returned by the previous page
+        
+        Returns:
+            dict with rows, has_more and the token for the page after
+        """
+        stream = streams.get(token)
+        if stream is None:
+            return {
+                'success': False,
+                'error': 'Unknown or expired continuation token'
+            }
+        
+        try:
+            with stream.lock:
+                rows = stream.next_page()
+        except Exception as e:
+            streams.discard(token)
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+        
+        has_more = not stream.exhausted
+        if not has_more:
+            streams.discard(token)
+        
+        return {
+            'success': True,
+            'columns': stream.columns,
+            'data': [dict(zip(stream.columns, row)) for row in rows],
+            'row_count': len(rows),
+            'rows_returned_total': stream.rows_returned,
+            'has_more': has_more,
+            'next_token': token if has_more else None
+        }
+    
+    def close_stream(self, token: str):
+        """Release the cursor and connection behind a continuation token"""
+        streams.discard(token)
+        return {'success': True, 'closed': token}
+    
+    def get_schema_info(self, force_refresh: bool = False):
         """
         Get comprehensive database schema information
         
+        Served from the shared schema catalog; tables and columns are only
+        re-introspected when the TTL expires or a DDL change is detected.
+        
+        Args:
+            force_refresh: Bypass the cache and re-read the schema
+        
         Returns:
             dict containing all tables, columns, and data types
         """
         try:
-            inspector = inspect(self.engine)
-            schema_info = {}
-            
-            for table_name in inspector.get_table_names():
-                columns = []
-                for column in inspector.get_columns(table_name):
-                    columns.append({
-                        'name': column['name'],
-                        'type': str(column['type']),
-                        'nullable': column['nullable']
-                    })
-                
-                # Get sample row count
-                with self.Session() as session:
-                    count_result = session.execute(
-                        text(f"SELECT COUNT(*) as count FROM {table_name}")
-                    )
-                    row_count = count_result.fetchone()[0]
-                
-                schema_info[table_name] = {
-                    'columns': columns,
-                    'row_count': row_count
-                }
+            catalog = self.catalog.get(force_refresh=force_refresh)
+            schema_info = catalog['tables']
             
             return {
                 'success': True,
                 'tables': schema_info,
-                'table_count': len(schema_info)
+                'table_count': len(schema_info),
+                'cached': catalog['cached'],
+                'refreshed_at': catalog['refreshed_at']
             }
             
         except Exception as e:
@@ -127,8 +513,8 @@ class DatabaseManager:
     def get_sample_data(self, table_name: str, limit: int = 5):
         """Get sample rows from a table"""
         try:
-            with self.Session() as session:
-                result = session.execute(
+            with self.connect() as conn:
+                result = conn.execute(
                     text(f"SELECT * FROM {table_name} LIMIT {limit}")
                 )
                 columns = list(result.keys())
@@ -159,4 +545,7 @@ if __name__ == "__main__":
     result = db.execute_query("SELECT * FROM sales ORDER BY revenue DESC")
     print(f"Found {result['row_count']} rows")
     if result['success']:
-        print(f"Top sale: {result['data'][0]}")
\ No newline at end of file
+        print(f"Top sale: {result['data'][0]}")
+    
+    print("\n🔌 Connection Pool:")
+    print(json.dumps(db.get_pool_stats(), indent=2))
\ No newline at end of file
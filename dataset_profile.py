@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_cleaning import frame_bytes
+from quantile_sketch import sketch_columns
+
+# Outliers are values beyond this many IQRs outside the quartiles
+OUTLIER_IQR_FACTOR = 2.5
+
+
+def _nunique(values: pd.Series):
+    try:
+        return int(values.nunique(dropna=True))
+    except TypeError:  # unhashable cells (lists, dicts)
+        return None
+
+
+class DatasetProfile:
+    """Everything the dashboards show or prompt with about one dataset
+
+    Shape, dtypes, null counts, cardinality, duplicate rows, memory, numeric
+    stats (describe), IQR outlier counts and a few sample rows. Computed
+    once per dataset; reruns read the profile instead of the data.
+    Datasets over large_rows are described from a random sample, as the
+    dashboards always did. Outliers are checked in every numeric column
+    over all rows: quartiles come from t-digest sketches built in one
+    parallel pass (see quantile_sketch), then every value is compared
+    with the fences.
+    """
+
+    def __init__(self, df: pd.DataFrame, large_rows: int = 50_000, sample_rows: int = 2_000,
+                 max_stat_columns: int = 20, head_rows: int = 10, random_state: int = 42):
+        self.rows = len(df)
+        self.columns = list(df.columns)
+        self.dtypes = df.dtypes
+        self.numeric_columns = list(df.select_dtypes(include=[np.number]).columns)
+        self.null_counts = df.isnull().sum()
+        self.null_total = int(self.null_counts.sum())
+        self.cardinality = {c: _nunique(df[c]) for c in self.columns}
+        try:
+            self.duplicates = int(df.duplicated().sum())
+        except TypeError:
+            self.duplicates = None
+        self.memory_bytes = frame_bytes(df)
+        self.head = df.head(head_rows).copy()
+
+        self.sampled = self.rows > large_rows
+        ds = df.sample(n=sample_rows, random_state=random_state) if self.sampled and self.rows > sample_rows else df
+        self.sample_size = len(ds)
+        self.sample = ds.head(head_rows).copy()
+        stat_columns = self.numeric_columns[:max_stat_columns]
+        self.stats = ds[stat_columns].describe() if stat_columns else None
+
+        self.outliers = {}
+        for c, sketch in sketch_columns(df, self.numeric_columns).items():
+            self.outliers[c] = self._outliers(df[c], *sketch.quantile([.25, .75]))
+
+    @staticmethod
+    def _outliers(values: pd.Series, q1: float, q3: float) -> dict:
+        iqr = q3 - q1
+        low, high = q1 - OUTLIER_IQR_FACTOR * iqr, q3 + OUTLIER_IQR_FACTOR * iqr
+        return {
+            'q1': q1,
+            'q3': q3,
+            'low': low,
+            'high': high,
+            'count': int(((values < low) | (values > high)).sum()) if iqr > 0 else 0,
+            'checked': len(values),
+        }
+
+
+class ProfileCache:
+    """LRU of DatasetProfiles keyed by dataset (content hash) and profile options"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = (max_entries if max_entries is not None
+                            else int(os.getenv('PROFILE_CACHE_MAX_ENTRIES', '64')))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, df: pd.DataFrame, **options) -> DatasetProfile:
+        cache_key = (key, tuple(sorted(options.items())))
+        with self._lock:
+            profile = self._entries.get(cache_key)
+            if profile is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        profile = DatasetProfile(df, **options)
+        with self._lock:
+            self._entries[cache_key] = profile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'profiles': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_profile_cache = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    """The process-wide ProfileCache shared by all dashboard sessions"""
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = ProfileCache()
+        return _profile_cache
+
+
+def get_profile(df: pd.DataFrame, key: str = None, **options) -> DatasetProfile:
+    """
+    Profile of a dataset
+
+    Args:
+        df: The dataset
+        key: Identifies this exact data (e.g. the upload's content hash);
+            the profile is cached under it. Without a key it is computed
+            and not kept.
+        options: DatasetProfile sampling options
+    """
+    if key is None:
+        return DatasetProfile(df, **options)
+    return get_profile_cache().get_or_compute(key, df, **options)
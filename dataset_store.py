@@ -0,0 +1,171 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+from data_cleaning import CATEGORY_MAX_RATIO, COMPACT_DTYPES, STRING_DTYPE, frame_bytes
+
+if STRING_DTYPE is not None:
+    import pyarrow
+
+
+def shared_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A copy of df that shares its column buffers
+
+    pandas 3 (required) is always copy-on-write, so a shallow copy is
+    enough: whoever modifies it copies only what it modifies, and df is
+    never written through.
+    """
+    return df.copy(deep=False)
+
+
+def content_key(data, *params) -> str:
+    """SHA-256 of the uploaded bytes plus anything that changes the parse (e.g. sheet name)"""
+    digest = hashlib.sha256(data)
+    for param in params:
+        digest.update(b'\0' + str(param).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store text columns compactly
+
+    Text becomes Arrow-backed strings (one contiguous buffer instead of a
+    Python object per cell). With COMPACT_DTYPES (the default),
+    low-cardinality text becomes categorical instead (one copy of each distinct value plus
+    small integer codes).
+    """
+    converted = {}
+    for column in df.columns:
+        values = df[column]
+        if not (pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype)):
+            continue
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == STRING_DTYPE:
+            continue
+        # Only all-text columns; mixed objects (numbers, dicts, lists, ...) are left alone
+        if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+            continue
+        if COMPACT_DTYPES and values.nunique(dropna=True) <= CATEGORY_MAX_RATIO * max(len(values), 1):
+            converted[column] = values.astype('category')
+        elif STRING_DTYPE is not None:
+            converted[column] = values.astype(STRING_DTYPE)
+    return df.assign(**converted) if converted else df
+
+
+class DatasetStore:
+    """Process-wide store of uploaded datasets for the Streamlit dashboards
+
+    Streamlit runs every user session in one process. Each distinct upload
+    (by content hash) is parsed once, compacted, and kept once; sessions
+    get views of it (see shared_view), so two users uploading the same file, and the
+    df / df_clean pair within a session, all share the same column
+    buffers. Bounded by total bytes with LRU eviction; evicting only
+    drops the store's reference, sessions keep their views.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else int(float(os.getenv('DATASET_STORE_MAX_MB', '4096')) * 1024 * 1024))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """A view of a stored dataset, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return shared_view(entry['df'])
+
+    def put(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Compact and store a dataset; returns a view of the stored frame"""
+        df = compact_frame(df)
+        if STRING_DTYPE is not None:
+            # Hand the parse/convert scratch buffers back to the OS
+            pyarrow.default_memory_pool().release_unused()
+        size = frame_bytes(df)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)['size']
+            if size <= self.max_bytes:
+                self._entries[key] = {'df': df, 'size': size}
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, oldest = self._entries.popitem(last=False)
+                    self._bytes -= oldest['size']
+                    self.evictions += 1
+        return shared_view(df)
+
+    def get_or_load(self, key: str, loader):
+        """
+        View of the dataset for key, calling loader() to build it on a miss
+
+        Concurrent sessions uploading the same file wait for one parse
+        instead of each parsing it.
+
+        Returns:
+            (DataFrame view, whether it came from the store)
+        """
+        while True:
+            df = self.get(key)
+            if df is not None:
+                with self._lock:
+                    self.hits += 1
+                return df, True
+            with self._lock:
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+            with self._lock:
+                if key not in self._entries:
+                    # The other load failed or the result was too big to keep: load it here
+                    self.misses += 1
+                    break
+
+        try:
+            return self.put(key, loader()), False
+        finally:
+            with self._lock:
+                event = self._loading.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'datasets': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_dataset_store = None
+_dataset_store_lock = threading.Lock()
+
+
+def get_dataset_store() -> DatasetStore:
+    """The process-wide DatasetStore shared by all dashboard sessions"""
+    global _dataset_store
+    with _dataset_store_lock:
+        if _dataset_store is None:
+            _dataset_store = DatasetStore()
+        return _dataset_store
@@ -0,0 +1,365 @@
+from itertools import chain
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from powerbi_export import PowerBIExporter, EXPORT_BATCH_SIZE
+
+# Export jobs running at once (each holds one pooled DB connection while reading)
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', str(min(os.cpu_count() or 4, 8))))
+
+# Where workbooks/Parquet are encoded: 'auto' (default) uses a child process only
+# for jobs of at least EXPORT_PROCESS_MIN_ROWS rows on a multi-core machine;
+# true always spawns one, false always encodes in the worker thread
+_ENCODE_MODE = os.getenv('EXPORT_ENCODE_PROCESSES', 'auto').lower()
+EXPORT_ENCODE_PROCESSES = None if _ENCODE_MODE == 'auto' else _ENCODE_MODE in ('1', 'true', 'yes')
+
+# Spawning an encoder costs close to a second, more than small jobs take to
+# encode in the worker thread
+EXPORT_PROCESS_MIN_ROWS = int(os.getenv('EXPORT_PROCESS_MIN_ROWS', '100000'))
+
+# Batches buffered between a query thread and its encoder process
+EXPORT_QUEUE_BATCHES = int(os.getenv('EXPORT_QUEUE_BATCHES', '4'))
+
+# spawn works the same on Windows (where Power BI Desktop runs) and Linux,
+# and never forks a process that holds open database connections
+_mp = multiprocessing.get_context('spawn')
+
+
+class ExportJob:
+    """One export in the job graph
+
+    A job exports either a single query (one 'Data' sheet / one Parquet
+    file) or a list of tables (one sheet each / one Parquet file each in
+    a folder). depends_on names jobs that must succeed first.
+    """
+
+    def __init__(self, name: str, filename: str, query: str = None, tables: list = None,
+                 export_format: str = 'xlsx', depends_on: list = None):
+        if (query is None) == (tables is None):
+            raise ValueError(f"Job {name}: give exactly one of query or tables")
+        if export_format not in ('xlsx', 'parquet'):
+            raise ValueError(f"Job {name}: unknown format {export_format}")
+        self.name = name
+        self.filename = filename
+        self.query = query
+        self.tables = tables
+        self.export_format = export_format
+        self.depends_on = list(depends_on or [])
+
+    def sheets(self) -> list:
+        """(sheet or file name, query) pairs, in output order"""
+        if self.tables is not None:
+            return [(t, f"SELECT * FROM {t}") for t in self.tables]
+        return [('Data', self.query)]
+
+    def filepath(self, export_dir: str) -> str:
+        filepath = os.path.join(export_dir, self.filename)
+        if self.export_format == 'parquet' and self.tables is None and not filepath.endswith('.parquet'):
+            filepath += '.parquet'
+        return filepath
+
+
+def _encode(export_format: str, filepath: str, sheets) -> dict:
+    """
+    Write (sheet_name, batches) pairs to one workbook or Parquet file(s)
+
+    A Parquet file path ending in .parquet gets the single sheet; any
+    other path is a folder with one <sheet_name>.parquet per sheet.
+    """
+    start = time.perf_counter()
+    rows_per_sheet = {}
+
+    if export_format == 'xlsx':
+        workbook = PowerBIExporter._workbook(filepath)
+        try:
+            for sheet_name, batches in sheets:
+                rows_per_sheet[sheet_name] = PowerBIExporter._write_batches(workbook, sheet_name, batches)['rows']
+        finally:
+            workbook.close()
+    else:
+        single_file = filepath.endswith('.parquet')
+        if not single_file:
+            os.makedirs(filepath, exist_ok=True)
+        for sheet_name, batches in sheets:
+            target = filepath if single_file else os.path.join(filepath, f"{sheet_name}.parquet")
+            rows_per_sheet[sheet_name] = PowerBIExporter._write_parquet(target, batches)['rows']
+
+    return {'rows_per_sheet': rows_per_sheet, 'encode_s': time.perf_counter() - start}
+
+
+def _read_ahead(sheets, min_rows: int):
+    """
+    Pull batches from (sheet_name, batches) pairs until min_rows rows have
+    arrived or the data runs out
+
+    Returns:
+        (whether min_rows was reached, sheets replaying everything read)
+    """
+    sheets = iter(sheets)
+    buffered = []
+    seen = 0
+    for sheet_name, batches in sheets:
+        taken = []
+        buffered.append((sheet_name, taken, batches))
+        for batch in batches:
+            taken.append(batch)
+            seen += len(batch[1])
+            if seen >= min_rows:
+                return True, _replay(buffered, sheets)
+    return False, _replay(buffered, sheets)
+
+
+def _replay(buffered, rest):
+    for sheet_name, taken, batches in buffered:
+        yield sheet_name, chain(taken, batches)
+    yield from rest
+
+
+class _QueryFailed(Exception):
+    """The query thread failed part way; it raises its own exception"""
+
+
+def _queued_sheets(batch_queue):
+    # Message protocol: ('sheet', name), ('rows', columns, rows)..., ('end',) per sheet; None ends the job.
+    # ('error', message) replaces the rest of the job when the query fails.
+    while True:
+        message = batch_queue.get()
+        if message is None:
+            return
+        if message[0] == 'error':
+            raise _QueryFailed(message[1])
+        yield message[1], _queued_batches(batch_queue)
+
+
+def _queued_batches(batch_queue):
+    while True:
+        message = batch_queue.get()
+        if message[0] == 'end':
+            return
+        if message[0] == 'error':
+            raise _QueryFailed(message[1])
+        yield message[1], message[2]
+
+
+def _encoder_process(export_format: str, filepath: str, batch_queue, result_queue):
+    """Child process entry point: encode everything the query thread sends"""
+    try:
+        result_queue.put({'success': True, **_encode(export_format, filepath, _queued_sheets(batch_queue))})
+    except Exception as e:
+        # Keep reading so the query thread never blocks on a full queue
+        while batch_queue.get() is not None:
+            pass
+        result_queue.put({'success': False, 'error': str(e), 'query_failed': isinstance(e, _QueryFailed)})
+
+
+class ExportScheduler:
+    """Runs a graph of export jobs concurrently
+
+    Each job's query runs in a worker thread against the exporter's shared
+    engine. Encoding (xlsxwriter or pyarrow, both CPU-bound) stays in that
+    thread unless the job is large: once its first EXPORT_PROCESS_MIN_ROWS
+    rows have arrived, and there is more than one core, the rest of the job
+    is encoded in a child process fed through a small bounded queue, so big
+    jobs encode on separate cores and memory stays flat. Jobs start as soon
+    as their dependencies have succeeded.
+    """
+
+    def __init__(self, exporter: PowerBIExporter = None, workers: int = None,
+                 encode_in_process: bool = None):
+        self.exporter = exporter if exporter is not None else PowerBIExporter()
+        self.db = self.exporter.db
+        self.workers = workers if workers is not None else EXPORT_WORKERS
+        # None: decide per job by size
+        self.encode_in_process = EXPORT_ENCODE_PROCESSES if encode_in_process is None else encode_in_process
+
+    def run(self, jobs: list, on_complete=None) -> dict:
+        """
+        Run all jobs, respecting depends_on
+
+        Args:
+            jobs: ExportJob list
+            on_complete: Optional callback(job_result) as each job finishes
+
+        Returns:
+            dict with success status, per-job results and wall time
+        """
+        by_name = {job.name: job for job in jobs}
+        if len(by_name) != len(jobs):
+            return {'success': False, 'error': 'Job names must be unique'}
+        for job in jobs:
+            unknown = [d for d in job.depends_on if d not in by_name]
+            if unknown:
+                return {'success': False, 'error': f"Job {job.name} depends on unknown jobs {unknown}"}
+        cycle = self._find_cycle(by_name)
+        if cycle:
+            return {'success': False, 'error': f"Dependency cycle: {' -> '.join(cycle)}"}
+
+        start = time.perf_counter()
+        results = {}
+        pending = {job.name: set(job.depends_on) for job in jobs}
+        running = {}
+
+        def finish(result):
+            results[result['job']] = result
+            if on_complete:
+                on_complete(result)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs))),
+                                thread_name_prefix='export') as executor:
+            while pending or running:
+                for name in [n for n, deps in pending.items() if not deps - results.keys()]:
+                    del pending[name]
+                    failed = [d for d in by_name[name].depends_on if not results[d]['success']]
+                    if failed:
+                        finish({'job': name, 'success': False, 'error': f"Skipped: {failed} failed"})
+                        continue
+                    running[executor.submit(self._run_job, by_name[name], start)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    finish(future.result())
+
+        ordered = [results[job.name] for job in jobs]
+        return {
+            'success': all(r['success'] for r in ordered),
+            'jobs': ordered,
+            'elapsed_s': round(time.perf_counter() - start, 3),
+            'workers': self.workers,
+            'encode_in_process': 'auto' if self.encode_in_process is None else self.encode_in_process
+        }
+
+    def _run_job(self, job: ExportJob, scheduler_start: float) -> dict:
+        filepath = job.filepath(self.exporter.export_dir)
+        started = time.perf_counter()
+        timing = {'query_s': 0.0}
+
+        def batches(query):
+            # Time spent waiting on the database, as opposed to encoding
+            iterator = self.db.iter_batches(query, EXPORT_BATCH_SIZE)
+            while True:
+                fetch_start = time.perf_counter()
+                batch = next(iterator, None)
+                timing['query_s'] += time.perf_counter() - fetch_start
+                if batch is None:
+                    return
+                yield batch
+
+        try:
+            sheets = ((name, batches(query)) for name, query in job.sheets())
+            in_process = self.encode_in_process
+            if in_process is None:
+                in_process = (os.cpu_count() or 1) > 1
+                if in_process:
+                    in_process, sheets = _read_ahead(sheets, EXPORT_PROCESS_MIN_ROWS)
+            if in_process:
+                encoded = self._encode_in_child(job, filepath, sheets)
+            else:
+                query_before = timing['query_s']
+                encoded = _encode(job.export_format, filepath, sheets)
+                # Same thread pulls and encodes: don't count the fetches made while encoding twice
+                encoded['encode_s'] -= timing['query_s'] - query_before
+            result = {'success': True, 'filepath': filepath, 'encoded_in_process': in_process, **encoded}
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        finished = time.perf_counter()
+        result.update({
+            'job': job.name,
+            'started_s': round(started - scheduler_start, 3),
+            'total_s': round(finished - started, 3),
+            'query_s': round(timing['query_s'], 3),
+        })
+        if 'encode_s' in result:
+            result['encode_s'] = round(result['encode_s'], 3)
+        if 'rows_per_sheet' in result:
+            result['rows'] = sum(result['rows_per_sheet'].values())
+        return result
+
+    def _encode_in_child(self, job: ExportJob, filepath: str, sheets) -> dict:
+        batch_queue = _mp.Queue(maxsize=EXPORT_QUEUE_BATCHES)
+        result_queue = _mp.Queue()
+        process = _mp.Process(
+            target=_encoder_process,
+            args=(job.export_format, filepath, batch_queue, result_queue),
+            daemon=True
+        )
+        process.start()
+
+        def send(message):
+            # Bounded put, so a dead encoder cannot hang the worker thread
+            while True:
+                try:
+                    batch_queue.put(message, timeout=1)
+                    return
+                except queue.Full:
+                    if not process.is_alive():
+                        raise RuntimeError(f"Encoder process for {job.name} exited")
+
+        error = None
+        try:
+            for sheet_name, batches in sheets:
+                send(('sheet', sheet_name))
+                for columns, rows in batches:
+                    send(('rows', columns, [tuple(row) for row in rows]))
+                send(('end',))
+            send(None)
+        except Exception as e:
+            error = e
+            if process.is_alive():
+                # Query failed part way: the encoder stops without finishing the file
+                try:
+                    send(('error', str(e)))
+                    send(None)
+                except RuntimeError:
+                    pass
+
+        encoded = self._wait_result(process, result_queue, job.name)
+        process.join()
+        if not encoded.pop('success') and not encoded.get('query_failed'):
+            # The encoder's own exception, not "exited" from a failed send
+            raise RuntimeError(encoded['error'])
+        if error is not None:
+            raise error
+        return encoded
+
+    @staticmethod
+    def _wait_result(process, result_queue, job_name: str) -> dict:
+        while True:
+            try:
+                return result_queue.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    # A result sent just before exit is still readable
+                    try:
+                        return result_queue.get_nowait()
+                    except queue.Empty:
+                        raise RuntimeError(f"Encoder process for {job_name} exited without a result")
+
+    @staticmethod
+    def _find_cycle(by_name: dict):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return None
+            if state.get(name) == 'visiting':
+                return path[path.index(name):] + [name]
+            state[name] = 'visiting'
+            for dep in by_name[name].depends_on:
+                cycle = visit(dep, path + [name])
+                if cycle:
+                    return cycle
+            state[name] = 'done'
+            return None
+
+        for name in by_name:
+            cycle = visit(name, [])
+            if cycle:
+                return cycle
+        return None
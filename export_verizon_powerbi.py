@@ -1,27 +1,22 @@
-import sqlite3
-import pandas as pd
-import os
+from database import DatabaseManager
+from powerbi_export import PowerBIExporter
 
 def export_verizon_to_powerbi():
     """Export Verizon data to Power BI format"""
     
-    conn = sqlite3.connect('data/verizon_mobile.db')
-    output_file = 'powerbi_exports/verizon_mobile_dashboard.xlsx'
+    exporter = PowerBIExporter(DatabaseManager('sqlite:///data/verizon_mobile.db'))
     
     print("📱 Exporting Verizon Mobile data to Power BI...")
     
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        # Export each table
-        tables = ['customers', 'monthly_usage', 'network_performance', 'plans']
-        
-        for table in tables:
-            df = pd.read_sql(f"SELECT * FROM {table}", conn)
-            df.to_excel(writer, sheet_name=table, index=False)
-            print(f"   ✅ {table}: {len(df)} rows")
+    # Export each table, streamed into its own sheet
+    tables = ['customers', 'monthly_usage', 'network_performance', 'plans']
+    result = exporter.export_tables_to_excel(tables, 'verizon_mobile_dashboard.xlsx')
     
-    conn.close()
-    print(f"\n✅ Export complete: {output_file}")
+    for table, rows in result['rows_per_table'].items():
+        print(f"   ✅ {table}: {rows} rows")
+    
+    print(f"\n✅ Export complete: {result['filepath']}")
     print("🎨 Ready to build your dashboard in Power BI!")
 
 if __name__ == "__main__":
-    export_verizon_to_powerbi()
\ No newline at end of file
+    export_verizon_to_powerbi()
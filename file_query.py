@@ -0,0 +1,280 @@
+import os
+import re
+import threading
+import time
+
+from database import DatabaseManager
+
+try:
+    import duckdb
+except ImportError:  # query_files reports how to enable it
+    duckdb = None
+
+# DuckDB spills to disk past this; keeps multi-GB scans from exhausting memory
+FILE_QUERY_MEMORY_LIMIT = os.getenv('FILE_QUERY_MEMORY_LIMIT', '1GB')
+FILE_QUERY_THREADS = int(os.getenv('FILE_QUERY_THREADS', str(os.cpu_count() or 4)))
+
+# Schema the database tables appear under, e.g. db.sales
+DB_SCHEMA = 'db'
+
+_DB_TABLE_REF = re.compile(rf'\b{DB_SCHEMA}\s*\.\s*"?(\w+)"?', re.IGNORECASE)
+
+
+def _view_name(stem: str) -> str:
+    name = re.sub(r'\W+', '_', stem).strip('_').lower()
+    return name if name and not name[0].isdigit() else f"t_{name}"
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class FileQueryEngine:
+    """SQL over the CSV and Parquet files in data/, run by an embedded DuckDB
+
+    Every file is a view: sales_export, verizon_usage, ... (the Parquet
+    copy wins when a file exists in both formats), and each file is also
+    reachable by its name, e.g. "sales_export.csv". DuckDB scans the files
+    in parallel and only reads the columns (and, for Parquet, the row
+    groups) a query needs, so large files are aggregated without being
+    loaded into Python.
+
+    Tables of the server's database are available as db.<table>. A SQLite
+    database is attached directly when DuckDB's sqlite extension is
+    installed; otherwise the tables a query references are copied in and
+    re-copied when their data changes.
+
+    File access is locked to the data directory and only single SELECT
+    statements are run.
+    """
+
+    def __init__(self, db: DatabaseManager = None, data_dir: str = 'data'):
+        self.db = db if db is not None else DatabaseManager()
+        self.data_dir = os.path.abspath(data_dir)
+        self.database_access = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._files_signature = None
+        self._views = {}
+        self._copied = {}
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+
+        conn = duckdb.connect(config={
+            'threads': FILE_QUERY_THREADS,
+            'memory_limit': FILE_QUERY_MEMORY_LIMIT,
+            # Never reach out to the network for extensions from inside a tool call
+            'autoinstall_known_extensions': False,
+        })
+        allowed = [self.data_dir + os.sep]
+
+        db_path = self._sqlite_path()
+        if db_path:
+            try:
+                conn.execute(f"ATTACH {_literal(db_path)} AS {DB_SCHEMA} (TYPE sqlite, READ_ONLY)")
+                allowed.append(db_path)
+                self.database_access = 'attached'
+            except duckdb.Error:
+                self.database_access = None
+        if self.database_access is None:
+            conn.execute(f"CREATE SCHEMA {DB_SCHEMA}")
+            self.database_access = 'copied'
+
+        # From here on the connection can only read the data directory (and the database file)
+        conn.execute(f"SET allowed_paths = [{', '.join(_literal(p) for p in allowed if not p.endswith(os.sep))}]")
+        conn.execute(f"SET allowed_directories = [{_literal(allowed[0])}]")
+        conn.execute("SET enable_external_access = false")
+        conn.execute("SET lock_configuration = true")
+        self._conn = conn
+        return conn
+
+    def _sqlite_path(self):
+        url = self.db.engine.url
+        if self.db.dialect != 'sqlite' or not url.database or url.database == ':memory:':
+            return None
+        return os.path.abspath(url.database)
+
+    def _scan_files(self) -> dict:
+        """{view name: (scan SQL, file name, format)} for the files in data/"""
+        if not os.path.isdir(self.data_dir):
+            return {}
+        found = []
+        for entry in sorted(os.scandir(self.data_dir), key=lambda e: e.name):
+            name = entry.name
+            if entry.is_file() and name.lower().endswith('.csv'):
+                found.append((name, 'csv', f"read_csv({_literal(entry.path)})"))
+            elif entry.is_file() and name.lower().endswith('.parquet'):
+                found.append((name, 'parquet', f"read_parquet({_literal(entry.path)})"))
+            elif entry.is_dir() and not name.startswith('.') and any(
+                    f.lower().endswith('.parquet') for f in os.listdir(entry.path)):
+                # A folder of Parquet files (e.g. a partitioned export) is one table
+                found.append((name, 'parquet', f"read_parquet({_literal(os.path.join(entry.path, '*.parquet'))})"))
+
+        views = {}
+        # Parquet after CSV, so it takes the short name when both exist
+        for name, file_format, scan in sorted(found, key=lambda f: f[1] == 'parquet'):
+            views[_view_name(os.path.splitext(name)[0])] = (scan, name, file_format)
+        for name, file_format, scan in found:
+            views[name] = (scan, name, file_format)
+        return views
+
+    def _refresh_views(self, conn):
+        signature = tuple(
+            (e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in os.scandir(self.data_dir)
+        ) if os.path.isdir(self.data_dir) else ()
+        if signature == self._files_signature:
+            return
+        views = self._scan_files()
+        for stale in set(self._views) - set(views):
+            conn.execute(f"DROP VIEW IF EXISTS {_quote(stale)}")
+        for view, (scan, _, _) in views.items():
+            conn.execute(f"CREATE OR REPLACE VIEW {_quote(view)} AS SELECT * FROM {scan}")
+        self._views = views
+        self._files_signature = signature
+
+    def _copy_db_tables(self, conn, query: str):
+        """Copy the database tables a query references into the db schema, if they changed"""
+        referenced = {m.lower() for m in _DB_TABLE_REF.findall(query)}
+        if not referenced:
+            return
+        schema = self.db.get_schema_info()
+        if not schema['success']:
+            raise RuntimeError(schema['error'])
+        tables = {t.lower(): t for t in schema['tables']}
+        for name in sorted(referenced & tables.keys()):
+            table = tables[name]
+            with self.db.connect() as db_conn:
+                version = self.db._data_version(db_conn, {name})
+            if self._copied.get(name) == version:
+                continue
+            arrow_table = self._read_db_table(table)
+            conn.register('_db_copy', arrow_table)
+            try:
+                conn.execute(f"CREATE OR REPLACE TABLE {DB_SCHEMA}.{_quote(name)} AS SELECT * FROM _db_copy")
+            finally:
+                conn.unregister('_db_copy')
+            self._copied[name] = version
+
+    def _read_db_table(self, table: str):
+        import pyarrow as pa
+
+        batches = []
+        columns = None
+        for columns, rows in self.db.iter_batches(f"SELECT * FROM {table}"):
+            batches.append(pa.table({c: list(values) for c, values in zip(columns, zip(*rows))}))
+        if not batches:
+            return pa.table({c: [] for c in columns or []})
+        return pa.concat_tables(batches, promote_options='permissive')
+
+    def list_files(self) -> dict:
+        """Views over data/ with their columns, plus the db tables"""
+        if duckdb is None:
+            return self._unavailable()
+        try:
+            with self._lock:
+                conn = self._connect()
+                self._refresh_views(conn)
+                views = dict(self._views)
+            cursor = conn.cursor()
+            files = []
+            for view, (_, filename, file_format) in views.items():
+                if view == filename:
+                    continue
+                columns = cursor.execute(f"DESCRIBE {_quote(view)}").fetchall()
+                files.append({
+                    'table': view,
+                    'file': filename,
+                    'format': file_format,
+                    'columns': {c[0]: c[1] for c in columns}
+                })
+            schema = self.db.get_schema_info()
+            return {
+                'success': True,
+                'files': files,
+                'database_tables': [f"{DB_SCHEMA}.{t}" for t in schema.get('tables', {})],
+                'database_access': self.database_access
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def query(self, query: str, max_rows: int = 100) -> dict:
+        """
+        Run a SELECT over the data files (and db.<table>)
+
+        Args:
+            query: DuckDB SQL; a single SELECT statement
+            max_rows: Maximum rows to return
+
+        Returns:
+            dict with columns, rows, row count and whether rows were cut off
+        """
+        if duckdb is None:
+            return self._unavailable()
+        try:
+            statements = duckdb.extract_statements(query)
+            if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+                return {
+                    'success': False,
+                    'error': 'Only a single SELECT statement is allowed'
+                }
+
+            start = time.perf_counter()
+            with self._lock:
+                conn = self._connect()
+                self._refresh_views(conn)
+                if self.database_access == 'copied':
+                    self._copy_db_tables(conn, query)
+
+            # Each call gets its own cursor (connection) to the shared DuckDB database
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query)
+                columns = [d[0] for d in cursor.description]
+                rows = cursor.fetchmany(max_rows + 1)
+            finally:
+                cursor.close()
+
+            truncated = len(rows) > max_rows
+            data = [dict(zip(columns, row)) for row in rows[:max_rows]]
+            return {
+                'success': True,
+                'columns': columns,
+                'data': data,
+                'row_count': len(data),
+                'truncated': truncated,
+                'query_executed': query,
+                'engine': 'duckdb',
+                'database_access': self.database_access,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+
+    @staticmethod
+    def _unavailable() -> dict:
+        return {
+            'success': False,
+            'error': 'query_files needs DuckDB: pip install duckdb'
+        }
+
+
+# Test the file query engine
+if __name__ == "__main__":
+    import json
+
+    engine = FileQueryEngine()
+    print(json.dumps(engine.list_files(), indent=2, default=str))
@@ -0,0 +1,411 @@
+"""
+Scalable synthetic datasets for load testing
+
+Builds the same tables as create_sample_data.py (business.db) and
+create_verizon_data.py (verizon_mobile.db), vectorized with NumPy and
+written in blocks, so any size fits in memory:
+
+    python generate_data.py --scale 1                       # the demo sizes
+    python generate_data.py --dataset business --scale 500000 --format sqlite parquet
+
+--scale 1 is 50 customers / 200 sales and 500 customers / ~4,800 usage
+rows; every row count grows linearly with it (500,000 -> 100M sales), as
+in TPC-H. products, plans and network_performance are fixed dimension
+tables. Purchases follow a Zipf distribution over customers, dates follow
+a seasonal curve, and the output is identical for the same --seed and
+--scale.
+"""
+import argparse
+import math
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Rows generated per block; also the RNG stream unit, so output does not depend on memory
+BLOCK_ROWS = 1_000_000
+
+PRODUCTS = ['Product A', 'Product B', 'Product C', 'Product D']
+PRODUCT_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+SALES_REPS = ['Alice Johnson', 'Bob Smith', 'Carol Davis', 'David Lee', 'Emma Wilson']
+INDUSTRIES = ['Technology', 'Healthcare', 'Finance', 'Retail', 'Manufacturing']
+REGIONS = ['North America', 'Europe', 'Asia Pacific', 'Latin America']
+TIERS = ['Enterprise', 'Mid-Market', 'SMB']
+STAGES = ['Prospecting', 'Qualification', 'Proposal', 'Negotiation', 'Closed Won']
+UNIT_PRICES = [99, 199, 299, 499, 999]
+
+STATES = ['California', 'Texas', 'Florida', 'New York', 'Pennsylvania',
+          'Illinois', 'Ohio', 'Georgia', 'North Carolina', 'Michigan']
+# Roughly proportional to population
+STATE_WEIGHTS = [0.21, 0.16, 0.12, 0.11, 0.07, 0.07, 0.06, 0.06, 0.06, 0.05]
+PLANS = ['Unlimited', 'Limited 10GB', 'Limited 5GB', 'Prepaid']
+PLAN_PRICES = [70, 55, 45, 40]
+
+# Output file stems per dataset and table (matching the original generators' CSV names)
+DATASETS = {
+    'business': {
+        'database': 'business.db',
+        'files': {'customers': 'customers_export', 'sales': 'sales_export',
+                  'products': 'products_export', 'pipeline': 'pipeline_export'},
+    },
+    'verizon': {
+        'database': 'verizon_mobile.db',
+        'files': {'customers': 'verizon_customers', 'monthly_usage': 'verizon_usage',
+                  'network_performance': 'verizon_network', 'plans': 'verizon_plans'},
+    },
+}
+
+OUTPUT_FORMATS = ['sqlite', 'csv', 'parquet']
+
+
+def _ids(prefix: str, start: int, stop: int, width: int) -> np.ndarray:
+    numbers = np.arange(start, stop).astype(str)
+    return np.char.add(prefix, np.char.zfill(numbers, width))
+
+
+def _pick(rng, values: list, size: int, weights: list = None) -> np.ndarray:
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float) / np.sum(weights)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+
+def _rng(seed: int, stream: int, block: int):
+    # Independent stream per (table, block): any block can be regenerated alone
+    return np.random.default_rng([seed, stream, block])
+
+
+def _width(count: int, minimum: int) -> int:
+    return max(minimum, len(str(count)))
+
+
+def zipf_ranks(rng, n: int, size: int, exponent: float = 1.1) -> np.ndarray:
+    """
+    Ranks 0..n-1 drawn from a bounded Zipf distribution
+
+    Inverse-CDF sampling of the continuous approximation, so the cost is
+    independent of n (numpy's zipf() is unbounded).
+    """
+    u = rng.random(size)
+    if abs(exponent - 1.0) < 1e-9:
+        ranks = np.power(float(n), u)
+    else:
+        a = 1.0 - exponent
+        ranks = np.power(1.0 + u * (math.pow(n, a) - 1.0), 1.0 / a)
+    return np.minimum(ranks.astype(np.int64) - 1, n - 1).clip(0)
+
+
+def scatter(ranks: np.ndarray, n: int) -> np.ndarray:
+    """Map ranks to ids with a fixed permutation, so heavy customers are spread out"""
+    if n <= 1:
+        return ranks
+    multiplier = 2654435761 % n or 1
+    while math.gcd(multiplier, n) != 1:
+        multiplier += 1
+    return (ranks * multiplier + 12345) % n
+
+
+def seasonal_day_weights(start: date, days: int) -> np.ndarray:
+    """Quarter-end and December peaks, quieter weekends"""
+    offsets = np.arange(days)
+    dates = [start + timedelta(days=int(d)) for d in offsets]
+    month = np.array([d.month for d in dates])
+    day = np.array([d.day for d in dates])
+    weekday = np.array([d.weekday() for d in dates])
+
+    weights = 1.0 + 0.25 * np.sin(2 * np.pi * (offsets - 60) / 365.0)
+    weights *= np.where(month == 12, 1.6, 1.0)
+    weights *= np.where(np.isin(month, [3, 6, 9, 12]) & (day >= 20), 1.4, 1.0)
+    weights *= np.where(weekday >= 5, 0.4, 1.0)
+    return weights / weights.sum()
+
+
+class TableWriter:
+    """Writes column blocks of one dataset to SQLite, CSV and/or Parquet"""
+
+    def __init__(self, dataset: str, output_dir: str, formats: list):
+        self.dataset = DATASETS[dataset]
+        self.output_dir = output_dir
+        self.formats = formats
+        self.rows = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._conn = None
+        self._parquet = {}
+        self._csv_started = set()
+        if 'sqlite' in formats:
+            self._conn = sqlite3.connect(os.path.join(output_dir, self.dataset['database']))
+            # Bulk load: no journal or fsync; the file is rebuilt from scratch anyway
+            self._conn.execute("PRAGMA journal_mode=OFF")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("PRAGMA cache_size=-262144")
+
+    def create(self, table: str, columns: dict):
+        """Start (or replace) a table; columns maps name -> SQL type"""
+        self.rows[table] = 0
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                self._conn.execute(f'CREATE TABLE "{table}" ({", ".join(f"{c} {t}" for c, t in columns.items())})')
+        if 'csv' in self.formats:
+            path = self._path(table, 'csv')
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write(self, table: str, block: dict):
+        """Append a block of equal-length column arrays"""
+        columns = list(block)
+        count = len(block[columns[0]])
+        if count == 0:
+            return
+        self.rows[table] += count
+
+        if self._conn is not None:
+            placeholders = ', '.join('?' * len(columns))
+            with self._conn:
+                self._conn.executemany(
+                    f'INSERT INTO "{table}" VALUES ({placeholders})',
+                    zip(*(block[c].tolist() for c in columns))
+                )
+
+        if 'csv' in self.formats:
+            import pandas as pd
+            pd.DataFrame(block).to_csv(self._path(table, 'csv'), mode='a', index=False,
+                                       header=table not in self._csv_started)
+            self._csv_started.add(table)
+
+        if 'parquet' in self.formats:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            arrow_table = pa.table({c: pa.array(block[c].tolist() if block[c].dtype == object else block[c])
+                                    for c in columns})
+            writer = self._parquet.get(table)
+            if writer is None:
+                writer = self._parquet[table] = pq.ParquetWriter(self._path(table, 'parquet'), arrow_table.schema,
+                                                                 compression='snappy')
+            writer.write_table(arrow_table)
+
+    def close(self):
+        for writer in self._parquet.values():
+            writer.close()
+        if self._conn is not None:
+            self._drop_stale_summaries()
+            self._conn.close()
+
+    def _drop_stale_summaries(self):
+        # Summary tables built by materialized_views.py lost their triggers with
+        # the old sales table; drop them so queries are not routed to stale data
+        stale = [r[0] for r in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'mv\\_sales\\_%' ESCAPE '\\'")]
+        with self._conn:
+            for name in stale:
+                self._conn.execute(f'DROP TABLE "{name}"')
+        if stale:
+            print(f"   ⚠️  Dropped stale summary tables {stale}; re-run `python materialized_views.py install`")
+
+    def _path(self, table: str, extension: str) -> str:
+        return os.path.join(self.output_dir, f"{self.dataset['files'][table]}.{extension}")
+
+
+def generate_business(writer: TableWriter, scale: float, seed: int):
+    """customers, sales, products and pipeline at 50 / 200 / 4 / 30 rows per unit of scale"""
+    n_customers = max(1, round(50 * scale))
+    n_sales = max(1, round(200 * scale))
+    n_pipeline = max(1, round(30 * scale))
+    customer_width = _width(n_customers, 4)
+
+    writer.create('customers', {'customer_id': 'TEXT', 'company_name': 'TEXT', 'industry': 'TEXT',
+                                'region': 'TEXT', 'tier': 'TEXT', 'lifetime_value': 'INTEGER'})
+    for b, lo in enumerate(range(0, n_customers, BLOCK_ROWS)):
+        rng = _rng(seed, 0, b)
+        hi = min(lo + BLOCK_ROWS, n_customers)
+        size = hi - lo
+        numbers = np.arange(lo + 1, hi + 1)
+        letters = np.array([chr(65 + i) for i in range(26)], dtype=object)[numbers % 26]
+        writer.write('customers', {
+            'customer_id': _ids('C', lo + 1, hi + 1, customer_width),
+            'company_name': np.char.add(np.char.add('Company ', letters.astype(str)), numbers.astype(str)),
+            'industry': _pick(rng, INDUSTRIES, size),
+            'region': _pick(rng, REGIONS, size, [0.4, 0.3, 0.2, 0.1]),
+            'tier': _pick(rng, TIERS, size, [0.15, 0.35, 0.5]),
+            'lifetime_value': rng.integers(50000, 500001, size),
+        })
+
+    start = date(2024, 1, 1)
+    day_weights = seasonal_day_weights(start, 366)
+    day_labels = np.array([(start + timedelta(days=d)).isoformat() for d in range(366)], dtype=object)
+
+    writer.create('sales', {'sale_id': 'TEXT', 'customer_id': 'TEXT', 'product': 'TEXT', 'sale_date': 'TEXT',
+                            'quantity': 'INTEGER', 'unit_price': 'INTEGER', 'revenue': 'INTEGER', 'sales_rep': 'TEXT'})
+    sale_width = _width(n_sales, 5)
+    for b, lo in enumerate(range(0, n_sales, BLOCK_ROWS)):
+        rng = _rng(seed, 1, b)
+        hi = min(lo + BLOCK_ROWS, n_sales)
+        size = hi - lo
+        customers = scatter(zipf_ranks(rng, n_customers, size), n_customers) + 1
+        quantity = rng.integers(1, 21, size)
+        unit_price = np.asarray(UNIT_PRICES)[rng.choice(len(UNIT_PRICES), size=size)]
+        writer.write('sales', {
+            'sale_id': _ids('S', lo + 1, hi + 1, sale_width),
+            'customer_id': np.char.add('C', np.char.zfill(customers.astype(str), customer_width)),
+            'product': _pick(rng, PRODUCTS, size, PRODUCT_WEIGHTS),
+            'sale_date': day_labels[rng.choice(366, size=size, p=day_weights)],
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'revenue': quantity * unit_price,
+            'sales_rep': _pick(rng, SALES_REPS, size),
+        })
+
+    writer.create('products', {'product_name': 'TEXT', 'category': 'TEXT', 'cost': 'INTEGER',
+                               'margin_percent': 'INTEGER', 'stock_level': 'INTEGER'})
+    writer.write('products', {
+        'product_name': np.array(PRODUCTS, dtype=object),
+        'category': np.array(['Software', 'Hardware', 'Services', 'Consulting'], dtype=object),
+        'cost': np.array([50, 120, 150, 300]),
+        'margin_percent': np.array([50, 40, 50, 67]),
+        'stock_level': np.array([1000, 500, 2000, 100]),
+    })
+
+    writer.create('pipeline', {'opportunity_id': 'TEXT', 'customer_id': 'TEXT', 'stage': 'TEXT',
+                               'expected_value': 'INTEGER', 'probability': 'INTEGER', 'close_date': 'TEXT'})
+    close_labels = np.array([(date(2025, 1, 1) + timedelta(days=d)).isoformat() for d in range(1, 181)], dtype=object)
+    for b, lo in enumerate(range(0, n_pipeline, BLOCK_ROWS)):
+        rng = _rng(seed, 2, b)
+        hi = min(lo + BLOCK_ROWS, n_pipeline)
+        size = hi - lo
+        customers = rng.integers(1, n_customers + 1, size)
+        writer.write('pipeline', {
+            'opportunity_id': _ids('OPP', lo + 1, hi + 1, _width(n_pipeline, 4)),
+            'customer_id': np.char.add('C', np.char.zfill(customers.astype(str), customer_width)),
+            'stage': _pick(rng, STAGES, size, [0.2, 0.25, 0.25, 0.2, 0.1]),
+            'expected_value': rng.integers(10000, 200001, size),
+            'probability': np.asarray([10, 25, 50, 75, 90])[rng.choice(5, size=size)],
+            'close_date': close_labels[rng.integers(0, len(close_labels), size)],
+        })
+
+
+def generate_verizon(writer: TableWriter, scale: float, seed: int):
+    """customers and monthly_usage at 500 / ~4,800 rows per unit of scale, plus plans and network_performance"""
+    n_customers = max(1, round(500 * scale))
+    signup_labels = np.array([(date(2023, 1, 1) + timedelta(days=d)).isoformat() for d in range(731)], dtype=object)
+    months = [f"2024-{m:02d}" for m in range(1, 13)]
+    # Blocks of customers; each yields ~9.6 usage rows per customer
+    customer_block = max(1, BLOCK_ROWS // 10)
+
+    writer.create('customers', {'customer_id': 'TEXT', 'state': 'TEXT', 'plan_type': 'TEXT', 'signup_date': 'TEXT',
+                                'monthly_charge': 'INTEGER', 'status': 'TEXT', 'data_usage_gb': 'REAL',
+                                'satisfaction_score': 'INTEGER'})
+    writer.create('monthly_usage', {'usage_id': 'TEXT', 'customer_id': 'TEXT', 'month': 'TEXT',
+                                    'data_used_gb': 'REAL', 'calls_minutes': 'INTEGER', 'texts_sent': 'INTEGER',
+                                    'revenue': 'INTEGER'})
+
+    usage_count = 0
+    usage_width = _width(round(n_customers * 9.6 * 1.01), 7)
+    for b, lo in enumerate(range(0, n_customers, customer_block)):
+        rng = _rng(seed, 10, b)
+        hi = min(lo + customer_block, n_customers)
+        size = hi - lo
+        plan = rng.choice(len(PLANS), size=size, p=[0.4, 0.25, 0.2, 0.15])
+        charge = np.asarray(PLAN_PRICES)[plan]
+        churned = rng.random(size) < 0.15
+        # Heavy-tailed usage, higher on unlimited plans
+        usage_scale = np.where(plan == 0, 18.0, 8.0)
+        data_usage = np.round(np.clip(rng.lognormal(0, 0.6, size) * usage_scale, 1, 120), 2)
+        customer_ids = _ids('VZ', lo + 1, hi + 1, 6)
+        writer.write('customers', {
+            'customer_id': customer_ids,
+            'state': _pick(rng, STATES, size, STATE_WEIGHTS),
+            'plan_type': np.asarray(PLANS, dtype=object)[plan],
+            'signup_date': signup_labels[rng.integers(0, len(signup_labels), size)],
+            'monthly_charge': charge,
+            'status': np.where(churned, 'Churned', 'Active').astype(object),
+            'data_usage_gb': data_usage,
+            'satisfaction_score': np.clip(np.round(rng.normal(np.where(churned, 2.5, 3.8), 0.9)), 1, 5).astype(np.int64),
+        })
+
+        urng = _rng(seed, 11, b)
+        for month_idx, month in enumerate(months):
+            active = urng.random(size) < 0.8
+            count = int(active.sum())
+            if count == 0:
+                continue
+            # Summer and holiday months run a little heavier on data
+            seasonal = 1.0 + 0.15 * math.sin(2 * math.pi * (month_idx - 3) / 12)
+            writer.write('monthly_usage', {
+                'usage_id': _ids('U', usage_count, usage_count + count, usage_width),
+                'customer_id': customer_ids[active],
+                'month': np.full(count, month, dtype=object),
+                'data_used_gb': np.round(np.clip(data_usage[active] * urng.lognormal(0, 0.3, count) * seasonal, 0.1, 150), 2),
+                'calls_minutes': urng.integers(100, 2001, count),
+                'texts_sent': urng.integers(500, 5001, count),
+                'revenue': charge[active],
+            })
+            usage_count += count
+
+    rng = _rng(seed, 12, 0)
+    writer.create('network_performance', {'state': 'TEXT', 'coverage_percent': 'REAL', 'avg_download_mbps': 'REAL',
+                                          'avg_upload_mbps': 'REAL', 'network_satisfaction': 'REAL'})
+    writer.write('network_performance', {
+        'state': np.array(STATES, dtype=object),
+        'coverage_percent': np.round(rng.uniform(92, 99.5, len(STATES)), 1),
+        'avg_download_mbps': np.round(rng.uniform(50, 150, len(STATES)), 1),
+        'avg_upload_mbps': np.round(rng.uniform(10, 50, len(STATES)), 1),
+        'network_satisfaction': np.round(rng.uniform(3.5, 5.0, len(STATES)), 1),
+    })
+
+    writer.create('plans', {'plan_name': 'TEXT', 'monthly_price': 'INTEGER', 'data_limit_gb': 'INTEGER',
+                            'features': 'TEXT'})
+    writer.write('plans', {
+        'plan_name': np.array(PLANS, dtype=object),
+        'monthly_price': np.array(PLAN_PRICES),
+        'data_limit_gb': np.array([999, 10, 5, 3]),
+        'features': np.array(['Unlimited Talk/Text/Data', 'Talk/Text + 10GB', 'Talk/Text + 5GB', 'Pay As You Go'],
+                             dtype=object),
+    })
+
+
+GENERATORS = {'business': generate_business, 'verizon': generate_verizon}
+
+
+def generate(dataset: str, scale: float = 1, seed: int = 42, formats: list = None, output_dir: str = 'data') -> dict:
+    """
+    Generate one dataset
+
+    Returns:
+        dict with rows per table and elapsed seconds
+    """
+    formats = formats or ['sqlite']
+    start = time.perf_counter()
+    writer = TableWriter(dataset, output_dir, formats)
+    try:
+        GENERATORS[dataset](writer, scale, seed)
+    finally:
+        writer.close()
+    return {
+        'success': True,
+        'dataset': dataset,
+        'rows_per_table': writer.rows,
+        'elapsed_s': round(time.perf_counter() - start, 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic business / Verizon datasets at any scale")
+    parser.add_argument("--dataset", choices=['business', 'verizon', 'all'], default='all')
+    parser.add_argument("--scale", type=float, default=1,
+                        help="Scale factor (1 = demo size; 500000 = 100M sales rows)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", nargs='+', choices=OUTPUT_FORMATS, default=['sqlite'], dest='formats')
+    parser.add_argument("--output-dir", default='data')
+    args = parser.parse_args()
+
+    datasets = ['business', 'verizon'] if args.dataset == 'all' else [args.dataset]
+    for dataset in datasets:
+        print(f"🏗️  Generating {dataset} dataset (scale {args.scale:g}, seed {args.seed})...")
+        result = generate(dataset, args.scale, args.seed, args.formats, args.output_dir)
+        total = sum(result['rows_per_table'].values())
+        for table, rows in result['rows_per_table'].items():
+            print(f"   - {rows:,} {table}")
+        print(f"✅ {total:,} rows in {result['elapsed_s']}s "
+              f"({total / max(result['elapsed_s'], 1e-9):,.0f} rows/s) -> {args.output_dir}/ ({', '.join(args.formats)})")
@@ -0,0 +1,379 @@
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime
+
+from sqlalchemy import text
+
+from powerbi_export import PowerBIExporter
+
+# Tables exported as partitioned Parquet, with the column used as the
+# high-water mark. Appended rows get a rowid above the current maximum in
+# SQLite; deletes below it are caught by the row count, in-place updates and
+# reused rowids only by a verified refresh (see IncrementalRefresher).
+# Other backends need a monotonically increasing id or timestamp column.
+INCREMENTAL_TABLES = {
+    'customers': 'rowid',
+    'sales': 'rowid',
+    'products': 'rowid',
+    'pipeline': 'rowid',
+}
+
+SALES_SUMMARY_QUERY = """
+    SELECT
+        s.sale_date,
+        s.product,
+        s.sales_rep,
+        c.region,
+        c.industry,
+        c.tier as customer_tier,
+        s.quantity,
+        s.revenue,
+        p.category as product_category,
+        p.margin_percent
+    FROM sales s
+    LEFT JOIN customers c ON s.customer_id = c.customer_id
+    LEFT JOIN products p ON s.product = p.product_name
+    WHERE s.{key} > {low} AND s.{key} <= {high}
+"""
+
+# Partial aggregates computed by the database over new rows only
+PRODUCT_DELTA_QUERY = """
+    SELECT product, COUNT(*), SUM(revenue), MIN(revenue), MAX(revenue), COUNT(revenue)
+    FROM sales WHERE {key} > {low} AND {key} <= {high}
+    GROUP BY product
+"""
+
+REP_DELTA_QUERY = """
+    SELECT sales_rep, COUNT(*), SUM(revenue), MAX(revenue), COUNT(revenue)
+    FROM sales WHERE {key} > {low} AND {key} <= {high}
+    GROUP BY sales_rep
+"""
+
+REGION_DELTA_QUERY = """
+    SELECT c.region, s.customer_id, COUNT(s.sale_id), SUM(s.revenue), COUNT(s.revenue)
+    FROM sales s
+    JOIN customers c ON s.customer_id = c.customer_id
+    WHERE s.{key} > {low} AND s.{key} <= {high}
+    GROUP BY c.region, s.customer_id
+"""
+
+
+def _row_checksum(*values) -> int:
+    # Registered as an SQLite function; summed over rows it changes with any insert, update or delete
+    return zlib.crc32(repr(values).encode('utf-8'))
+
+
+def _empty_aggregates() -> dict:
+    return {'product': {}, 'sales_rep': {}, 'region': {}}
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+class IncrementalRefresher:
+    """Delta refresh of the Power BI exports
+
+    Each table's new rows (above its stored high-water mark) are appended
+    as a new Parquet part file under powerbi_exports/incremental/<table>/,
+    which Power BI's Folder connector reads as one table. The three GROUP
+    BY summaries are kept as mergeable partial aggregates (counts, sums,
+    min/max, per-region customer sets) in the state file; only the delta
+    is aggregated by the database, then merged and rewritten.
+
+    Each run first reads, in one read transaction, every table's current
+    maximum key and the row count and maximum key of the rows at or below
+    the stored high-water mark. Every delta query is then bounded by
+    those maxima, so rows appended while the refresh runs are left for
+    the next one, in the table parts, sales_summary and the aggregates
+    alike. If the rows already exported no longer match their stored
+    count and maximum (deletes), that table and the outputs built from it
+    are rebuilt. This check costs one indexed COUNT per table.
+
+    In-place updates, or a deleted maximum rowid reused by a later
+    insert, leave the count and maximum as they were. A checksum of the
+    exported rows is kept in the state, summed from each delta only;
+    refresh(verify=True) recomputes it over every exported row (a full
+    scan) and rebuilds the tables that differ. --full rebuilds
+    everything. The checksum needs SQLite; elsewhere only the count and
+    maximum are checked.
+    """
+
+    def __init__(self, exporter: PowerBIExporter = None, tables: dict = None):
+        self.exporter = exporter if exporter is not None else PowerBIExporter()
+        self.db = self.exporter.db
+        self.tables = tables if tables is not None else dict(INCREMENTAL_TABLES)
+        self.output_dir = os.path.join(self.exporter.export_dir, 'incremental')
+        self.state_path = os.path.join(self.output_dir, 'refresh_state.json')
+
+    def load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {'tables': {}, 'aggregates': _empty_aggregates()}
+
+    def save_state(self, state: dict):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        """Forget all high-water marks and partitions (next refresh is full)"""
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def refresh(self, full: bool = False, verify: bool = False) -> dict:
+        """
+        Append new rows and merge new aggregates into the exports
+
+        Args:
+            full: Discard stored state and rebuild everything
+            verify: Also checksum every exported row to catch in-place updates
+
+        Returns:
+            dict with rows appended per output and the summary files written
+        """
+        if full:
+            self.reset()
+        os.makedirs(self.output_dir, exist_ok=True)
+        state = self.load_state()
+
+        snapshot = self._snapshot(state, verify)
+
+        # Rows already exported changed (deletes, updates, reused rowids): rebuild that table
+        rebuilt = []
+        for table_name, snap in snapshot.items():
+            if snap['rebuild']:
+                rebuilt.append(table_name)
+                self._drop_output(state, table_name)
+                if table_name == 'sales':
+                    self._drop_output(state, 'sales_summary')
+                    state['aggregates'] = _empty_aggregates()
+
+        # sales_summary and region totals embed customer/product attributes;
+        # if those tables changed at all, rebuild them from scratch
+        dimensions_fp = {t: [snapshot[t]['rows'], snapshot[t]['hwm']]
+                         for t in ('customers', 'products') if t in snapshot}
+        dimensions_changed = (state.get('dimensions_fingerprint') not in (None, dimensions_fp)
+                              or any(t in rebuilt for t in ('customers', 'products')))
+        if dimensions_changed:
+            self._drop_output(state, 'sales_summary')
+
+        sales_key = self.tables['sales']
+        sales_hwm = state['tables'].get('sales', {}).get('hwm', 0)
+        appended = {}
+
+        for table_name, key in self.tables.items():
+            appended[table_name] = self._append_table(state, table_name, key, snapshot[table_name])
+
+        sales_high = state['tables']['sales']['hwm']
+        summary_hwm = state['tables'].get('sales_summary', {}).get('hwm', 0)
+        appended['sales_summary'] = self._append_query(
+            state, 'sales_summary',
+            SALES_SUMMARY_QUERY.format(key=sales_key, low=self._literal(summary_hwm), high=self._literal(sales_high)),
+            hwm=sales_high
+        )
+
+        self._merge_aggregates(state['aggregates'], sales_key, sales_hwm, sales_high, dimensions_changed)
+        state['dimensions_fingerprint'] = dimensions_fp
+        state['refreshed_at'] = datetime.now().isoformat(timespec='seconds')
+
+        summaries = self._write_summaries(state['aggregates'])
+        self.save_state(state)
+
+        return {
+            'success': True,
+            'rows_appended': appended,
+            'rebuilt': rebuilt,
+            'summaries': summaries,
+            'output_dir': self.output_dir
+        }
+
+    def _snapshot(self, state: dict, verify: bool = False) -> dict:
+        """
+        Per table, from one read transaction: whether the rows already
+        exported changed (rebuild), the maximum key (hwm) and the row
+        count and checksum of the rows up to it
+        """
+        snapshot = {}
+        with self.db.connect() as conn:
+            checksum = 'NULL'
+            if self.db.dialect == 'sqlite':
+                conn.connection.driver_connection.create_function(
+                    'row_checksum', -1, _row_checksum, deterministic=True)
+                # pysqlite only begins a transaction before writes; hold one
+                # open so every read below sees the same database state
+                conn.exec_driver_sql("BEGIN")
+                checksum = 'SUM(row_checksum({key}, {columns}))'
+
+            for table_name, key in self.tables.items():
+                table_state = state['tables'].get(table_name)
+                hwm = table_state['hwm'] if table_state else 0
+                high = conn.execute(text(f"SELECT MAX({key}) FROM {table_name}")).scalar()
+
+                rebuild = False
+                if table_state:
+                    rows, last = conn.execute(text(
+                        f"SELECT COUNT(*), MAX({key}) FROM {table_name} WHERE {key} <= {self._literal(hwm)}"
+                    )).one()
+                    rebuild = rows != table_state['rows'] or (rows and last != hwm)
+                columns = ', '.join(conn.execute(text(f"SELECT * FROM {table_name} LIMIT 0")).keys())
+                row_checksum = checksum.format(key=key, columns=columns)
+                if table_state and verify and not rebuild:
+                    exported = conn.execute(text(
+                        f"SELECT {row_checksum} FROM {table_name} WHERE {key} <= {self._literal(hwm)}"
+                    )).scalar()
+                    rebuild = exported != table_state.get('checksum')
+
+                # Rows and checksum so far plus the delta; a rebuilt table starts from nothing
+                if rebuild or not table_state:
+                    hwm, rows, total = 0, 0, 0
+                else:
+                    rows, total = table_state['rows'], table_state.get('checksum')
+                if high is None:
+                    high = hwm
+                delta_rows, delta_total = conn.execute(text(
+                    f"SELECT COUNT(*), {row_checksum} FROM {table_name} "
+                    f"WHERE {key} > {self._literal(hwm)} AND {key} <= {self._literal(high)}"
+                )).one()
+                if total is not None and checksum != 'NULL':
+                    total += delta_total or 0
+                else:
+                    total = None
+                snapshot[table_name] = {
+                    'rebuild': bool(rebuild),
+                    'hwm': high,
+                    'rows': rows + delta_rows,
+                    'checksum': total,
+                }
+        return snapshot
+
+    def _drop_output(self, state: dict, name: str):
+        shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+        state['tables'].pop(name, None)
+
+    def _append_table(self, state: dict, table_name: str, key: str, snap: dict) -> int:
+        hwm = state['tables'].get(table_name, {}).get('hwm', 0)
+        query = (f"SELECT * FROM {table_name} WHERE {key} > {self._literal(hwm)} "
+                 f"AND {key} <= {self._literal(snap['hwm'])} ORDER BY {key}")
+        appended = self._append_query(state, table_name, query, hwm=snap['hwm'])
+        # Stored for the next run's check of the rows exported so far
+        table_state = state['tables'][table_name]
+        table_state['rows'], table_state['checksum'] = snap['rows'], snap['checksum']
+        return appended
+
+    def _append_query(self, state: dict, name: str, query: str, hwm) -> int:
+        """Write the rows of query as the next part file for name; hwm is stored as is"""
+        table_state = state['tables'].setdefault(name, {'hwm': 0, 'parts': 0, 'rows': 0})
+        table_state['hwm'] = hwm
+
+        part_dir = os.path.join(self.output_dir, name)
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = os.path.join(part_dir, f"part-{table_state['parts'] + 1:05d}.parquet")
+
+        written = self.exporter._write_parquet(part_path, self.db.iter_batches(query))
+        if written['rows'] == 0:
+            # Nothing new: no empty part files for Power BI to read
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return 0
+
+        table_state['parts'] += 1
+        table_state['rows'] += written['rows']
+        return written['rows']
+
+    def _merge_aggregates(self, aggregates: dict, key: str, since, until, rebuild_regions: bool):
+        # Sales rows with since < key <= until are new
+        since, until = self._literal(since), self._literal(until)
+
+        for product, count, total, low, high, count_revenue in self._rows(
+                PRODUCT_DELTA_QUERY.format(key=key, low=since, high=until)):
+            agg = aggregates['product'].setdefault(product, {
+                'count': 0, 'sum': 0, 'min': None, 'max': None, 'count_revenue': 0
+            })
+            agg['count'] += count
+            agg['sum'] += total or 0
+            agg['min'] = _min(agg['min'], low)
+            agg['max'] = _max(agg['max'], high)
+            agg['count_revenue'] += count_revenue
+
+        for rep, count, total, high, count_revenue in self._rows(
+                REP_DELTA_QUERY.format(key=key, low=since, high=until)):
+            agg = aggregates['sales_rep'].setdefault(rep, {
+                'count': 0, 'sum': 0, 'max': None, 'count_revenue': 0
+            })
+            agg['count'] += count
+            agg['sum'] += total or 0
+            agg['max'] = _max(agg['max'], high)
+            agg['count_revenue'] += count_revenue
+
+        if rebuild_regions:
+            aggregates['region'] = {}
+            region_since = 0
+        else:
+            region_since = since
+
+        # COUNT(DISTINCT customer_id) only merges as a set of ids per region
+        customer_sets = {r: set(a['customers']) for r, a in aggregates['region'].items()}
+        for region, customer_id, count, total, count_revenue in self._rows(
+                REGION_DELTA_QUERY.format(key=key, low=region_since, high=until)):
+            agg = aggregates['region'].setdefault(region, {
+                'customers': [], 'count': 0, 'sum': 0, 'count_revenue': 0
+            })
+            customer_sets.setdefault(region, set()).add(customer_id)
+            agg['count'] += count
+            agg['sum'] += total or 0
+            agg['count_revenue'] += count_revenue
+        for region, customers in customer_sets.items():
+            aggregates['region'][region]['customers'] = sorted(customers)
+
+    def _write_summaries(self, aggregates: dict) -> list:
+        def avg(agg):
+            return agg['sum'] / agg['count_revenue'] if agg['count_revenue'] else None
+
+        summaries = [
+            ('revenue_by_product.xlsx',
+             ['product', 'sales_count', 'total_revenue', 'avg_revenue', 'min_revenue', 'max_revenue'],
+             [(p, a['count'], a['sum'], avg(a), a['min'], a['max'])
+              for p, a in aggregates['product'].items()]),
+            ('regional_performance.xlsx',
+             ['region', 'customer_count', 'total_sales', 'total_revenue', 'avg_deal_size'],
+             [(r, len(a['customers']), a['count'], a['sum'], avg(a))
+              for r, a in aggregates['region'].items()]),
+            ('sales_rep_performance.xlsx',
+             ['sales_rep', 'deals_closed', 'total_revenue', 'avg_deal_size', 'largest_deal'],
+             [(rep, a['count'], a['sum'], avg(a), a['max'])
+              for rep, a in aggregates['sales_rep'].items()]),
+        ]
+
+        written = []
+        for filename, columns, rows in summaries:
+            # Same ORDER BY total_revenue DESC as the full-refresh queries
+            rows.sort(key=lambda row: row[columns.index('total_revenue')] or 0, reverse=True)
+            filepath = os.path.join(self.exporter.export_dir, filename)
+            workbook = self.exporter._workbook(filepath)
+            try:
+                self.exporter._write_batches(workbook, 'Data', [(columns, rows)])
+            finally:
+                workbook.close()
+            written.append(filepath)
+        return written
+
+    def _rows(self, query: str) -> list:
+        rows = []
+        for _, batch in self.db.iter_batches(query):
+            rows.extend(batch)
+        return rows
+
+    @staticmethod
+    def _literal(value) -> str:
+        # High-water marks come from our own state file, but quote them anyway
+        if isinstance(value, (int, float)):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
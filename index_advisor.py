@@ -0,0 +1,331 @@
+import re
+import sqlite3
+import statistics
+import time
+
+from database import DatabaseManager
+from query_log import QueryLog, get_query_log
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # candidate extraction needs the parser
+    sqlglot = None
+
+# SQLite reads a covering index instead of the table; keep them narrow
+MAX_INDEX_COLUMNS = 5
+
+_PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+_RANGE_NODES = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between, exp.Like) if sqlglot else ()
+
+
+def _index_name(prefix: str, table: str, columns: list) -> str:
+    return f"{prefix}_{table}_{'_'.join(columns)}"[:60]
+
+
+def candidate_indexes(query: str, tables: dict) -> list:
+    """
+    Indexes that could serve a query, per table it reads
+
+    Column order follows the usual rule: equality filters, then join keys,
+    then one range filter (or the GROUP BY / ORDER BY columns). If the
+    remaining columns the query reads from the table fit, they are
+    appended so the index covers the query.
+
+    Args:
+        query: SQL SELECT statement
+        tables: {table_name: [column names]} of the database
+
+    Returns:
+        list of (table, columns)
+    """
+    if sqlglot is None:
+        return []
+    try:
+        tree = sqlglot.parse_one(query, read='sqlite')
+    except Exception:
+        return []
+
+    known = {t.lower(): t for t in tables}
+    columns_of = {t: {c.lower(): c for c in cols} for t, cols in tables.items()}
+    candidates = []
+
+    for select in tree.find_all(exp.Select):
+        aliases = {}
+        for table in select.find_all(exp.Table):
+            if table.parent_select is select and table.name.lower() in known:
+                aliases[table.alias_or_name.lower()] = known[table.name.lower()]
+        if not aliases:
+            continue
+
+        def resolve(column):
+            if column.table:
+                table = aliases.get(column.table.lower())
+            else:
+                owners = [t for t in set(aliases.values()) if column.name.lower() in columns_of[t]]
+                table = owners[0] if len(owners) == 1 else None
+            if table is None or column.name.lower() not in columns_of[table]:
+                return None
+            return table, columns_of[table][column.name.lower()]
+
+        usage = {t: {'eq': [], 'join': [], 'range': [], 'order': [], 'used': set()} for t in set(aliases.values())}
+
+        def add(kind, column):
+            resolved = resolve(column)
+            if resolved and resolved[1] not in usage[resolved[0]][kind]:
+                usage[resolved[0]][kind].append(resolved[1])
+
+        for column in select.find_all(exp.Column):
+            if column.parent_select is select:
+                resolved = resolve(column)
+                if resolved:
+                    usage[resolved[0]]['used'].add(resolved[1])
+
+        for predicate in select.find_all(exp.EQ, exp.In, exp.Is, *_RANGE_NODES):
+            if predicate.parent_select is not select:
+                continue
+            left = predicate.this
+            right = predicate.args.get('expression')
+            if not isinstance(left, exp.Column):
+                left, right = right, left
+            if not isinstance(left, exp.Column):
+                continue
+            if isinstance(predicate, exp.EQ) and isinstance(right, exp.Column):
+                add('join', left)
+                add('join', right)
+            elif isinstance(predicate, (exp.EQ, exp.In, exp.Is)):
+                add('eq', left)
+            else:
+                add('range', left)
+
+        for clause in ('group', 'order'):
+            node = select.args.get(clause)
+            if node is not None:
+                for column in node.find_all(exp.Column):
+                    add('order', column)
+
+        for table, use in usage.items():
+            columns = list(dict.fromkeys(use['eq'] + use['join']))
+            tail = use['range'][:1] if use['range'] else use['order']
+            columns += [c for c in tail if c not in columns]
+            columns = columns[:MAX_INDEX_COLUMNS]
+            if not columns:
+                continue
+            rest = sorted(use['used'] - set(columns))
+            if len(columns) + len(rest) <= MAX_INDEX_COLUMNS:
+                columns += rest
+            candidates.append((table, columns))
+
+    return candidates
+
+
+class IndexAdvisor:
+    """Proposes and creates indexes for the logged query workload
+
+    Tables loaded with DataFrame.to_sql have no keys or indexes, so every
+    join and filter is a full scan. The advisor reads the queries logged
+    by DatabaseManager.execute_query, looks at their EXPLAIN QUERY PLAN,
+    proposes covering indexes from their filters, joins and groupings,
+    plus a unique index on each table's id column (SQLite cannot add a
+    PRIMARY KEY to an existing table; a unique index plans the same), and
+    keeps only the indexes the planner actually picks.
+    """
+
+    def __init__(self, db: DatabaseManager = None, query_log: QueryLog = None):
+        self.db = db if db is not None else DatabaseManager()
+        self.query_log = query_log if query_log is not None else (get_query_log() or QueryLog())
+
+    def advise(self, apply: bool = False, repeat: int = 3, limit: int = 50) -> dict:
+        """
+        Time the workload, try the proposed indexes, and time it again
+
+        Everything runs in one transaction, which is rolled back unless
+        apply is set, so a dry run leaves the database untouched.
+
+        Args:
+            apply: Keep the useful indexes
+            repeat: Timed runs per query (the median is reported)
+            limit: Logged queries to consider, most total time first
+
+        Returns:
+            dict with the indexes kept, per-query before/after timings
+            and plans, and workload totals weighted by call counts
+        """
+        if self.db.dialect != 'sqlite':
+            return {'success': False, 'error': 'The index advisor reads SQLite query plans only'}
+
+        workload = self.query_log.workload(self.db.db_url, limit)
+        if not workload:
+            return {'success': False, 'error': 'No logged queries for this database yet'}
+
+        tables = {name: [c['name'] for c in info['columns']]
+                  for name, info in self.db.get_schema_info(force_refresh=True)['tables'].items()}
+
+        # A dedicated connection in autocommit mode, so BEGIN/ROLLBACK cover the DDL too
+        conn = sqlite3.connect(self.db.engine.url.database, isolation_level=None)
+        try:
+            existing = self._existing_indexes(conn)
+            for entry in workload:
+                entry['plan_before'] = self._plan(conn, entry['query'])
+                entry['before_ms'] = self._time(conn, entry['query'], repeat)
+
+            proposals = self._proposals(conn, workload, tables, existing)
+
+            conn.execute("BEGIN")
+            try:
+                for proposal in proposals:
+                    conn.execute(proposal['sql'])
+                conn.execute("ANALYZE")
+
+                used = set()
+                for entry in workload:
+                    entry['plan_after'] = self._plan(conn, entry['query'])
+                    used.update(_PLAN_INDEX.findall(' '.join(entry['plan_after'])))
+
+                kept = []
+                for proposal in proposals:
+                    if proposal['name'] in used or proposal['kind'] == 'primary key':
+                        kept.append(proposal)
+                    else:
+                        conn.execute(f"DROP INDEX {proposal['name']}")
+
+                for entry in workload:
+                    entry['after_ms'] = self._time(conn, entry['query'], repeat)
+
+                conn.execute("COMMIT" if apply else "ROLLBACK")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                return {'success': False, 'error': str(e)}
+        finally:
+            conn.close()
+
+        if apply:
+            self.db.invalidate_cache()
+        before = sum(e['before_ms'] * e['calls'] for e in workload)
+        after = sum(e['after_ms'] * e['calls'] for e in workload)
+        return {
+            'success': True,
+            'applied': apply,
+            'indexes': kept,
+            'queries': workload,
+            'workload_before_ms': round(before, 1),
+            'workload_after_ms': round(after, 1),
+            'speedup': round(before / after, 1) if after else None
+        }
+
+    def _proposals(self, conn, workload: list, tables: dict, existing: dict) -> list:
+        proposals = {}
+
+        def propose(kind, table, columns, unique=False):
+            # Skip anything an existing or already-proposed index starts with
+            others = [] if unique else [p['columns'] for p in proposals.values() if p['table'] == table]
+            for cols in existing.get(table, []) + others:
+                if cols[:len(columns)] == columns:
+                    return
+            name = _index_name('pk' if unique else 'ix', table, columns)
+            proposals[name] = {
+                'name': name,
+                'kind': kind,
+                'table': table,
+                'columns': columns,
+                'sql': f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+            }
+
+        read_tables = set()
+        for entry in workload:
+            for table, columns in candidate_indexes(entry['query'], tables):
+                read_tables.add(table)
+                # Already served by an index: no full scan and no temporary sort
+                if not any((step.startswith('SCAN') and 'USING' not in step) or 'TEMP B-TREE' in step
+                           for step in entry['plan_before']):
+                    continue
+                propose('covering' if len(columns) > 1 else 'filter', table, columns)
+
+        # Unique id columns act as primary keys for joins and lookups
+        for table in sorted(read_tables):
+            key = self._key_column(conn, table, tables[table])
+            if key:
+                propose('primary key', table, [key], unique=True)
+
+        # Longer (covering) proposals first, so prefixes of them are skipped
+        ordered = sorted(proposals.values(), key=lambda p: (p['kind'] != 'primary key', -len(p['columns'])))
+        deduped = []
+        for proposal in ordered:
+            if not any(p['table'] == proposal['table'] and p['columns'][:len(proposal['columns'])] == proposal['columns']
+                       and p is not proposal and p['kind'] != 'primary key' for p in deduped):
+                deduped.append(proposal)
+        return deduped
+
+    def _key_column(self, conn, table: str, columns: list):
+        # to_sql keeps the generator's column order; ids come first
+        first = columns[0] if columns else None
+        if not first or not (first.lower() == 'id' or first.lower().endswith('_id')):
+            return None
+        total, distinct, nulls = conn.execute(
+            f'SELECT COUNT(*), COUNT(DISTINCT "{first}"), SUM("{first}" IS NULL) FROM "{table}"'
+        ).fetchone()
+        return first if total and total == distinct and not nulls else None
+
+    def _existing_indexes(self, conn) -> dict:
+        existing = {}
+        for table, name in conn.execute(
+                "SELECT tbl_name, name FROM sqlite_master WHERE type = 'index'").fetchall():
+            cols = [r[2] for r in conn.execute(f'PRAGMA index_info("{name}")').fetchall()]
+            existing.setdefault(table, []).append(cols)
+        return existing
+
+    def _plan(self, conn, query: str) -> list:
+        try:
+            return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()]
+        except Exception as e:
+            return [f"error: {e}"]
+
+    def _time(self, conn, query: str, repeat: int) -> float:
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            try:
+                conn.execute(query).fetchall()
+            except Exception:
+                return 0.0
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(timings), 2)
+
+
+def print_report(result: dict):
+    if not result['success']:
+        print(f"❌ {result['error']}")
+        return
+
+    print(f"🧭 Index advisor ({'applied' if result['applied'] else 'dry run'})")
+    print("=" * 60)
+    for index in result['indexes']:
+        print(f"   ✅ {index['kind']}: {index['sql']}")
+    if not result['indexes']:
+        print("   No new indexes would help this workload")
+
+    print("\n⏱️  Workload (median ms per call)")
+    for entry in result['queries']:
+        query = ' '.join(entry['query'].split())
+        speedup = entry['before_ms'] / entry['after_ms'] if entry['after_ms'] else 0
+        print(f"   {entry['before_ms']:9.2f} -> {entry['after_ms']:9.2f}  x{speedup:5.1f}  "
+              f"calls={entry['calls']:<5} {query[:70]}")
+    print("\n" + "=" * 60)
+    print(f"Total (weighted by calls): {result['workload_before_ms']:.1f} ms -> "
+          f"{result['workload_after_ms']:.1f} ms (x{result['speedup']})")
+    if not result['applied']:
+        print("Run again with --apply to keep these indexes")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Propose indexes for the logged query workload")
+    parser.add_argument("--db", default=None,
+                        help="SQLAlchemy URL, e.g. sqlite:///data/verizon_mobile.db (default: DB_TYPE configuration)")
+    parser.add_argument("--apply", action="store_true", help="Create the indexes instead of a dry run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query")
+    args = parser.parse_args()
+
+    print_report(IndexAdvisor(DatabaseManager(args.db)).advise(apply=args.apply, repeat=args.repeat))
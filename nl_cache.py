@@ -0,0 +1,267 @@
+from array import array
+from datetime import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Words that rarely change the meaning of a data question
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'for', 'in', 'on', 'by', 'to', 'me', 'us', 'our', 'we',
+    'is', 'are', 'was', 'what', 'whats', 'which', 'show', 'give', 'list', 'tell',
+    'please', 'can', 'you', 'do', 'does', 'i', 'my', 'and', 'with', 'all', 'get',
+}
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return ' '.join(_WORDS.findall(question.lower().replace("'", '')))
+
+
+def schema_hash(tables: dict) -> str:
+    """Hash of table/column names and types (row counts excluded)"""
+    parts = []
+    for table_name in sorted(tables):
+        columns = ','.join(f"{c['name']}:{c['type']}" for c in tables[table_name]['columns'])
+        parts.append(f"{table_name}({columns})")
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _shingles(normalized: str) -> set:
+    words = [w for w in normalized.split() if w not in STOPWORDS] or normalized.split()
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+_INNER_APOSTROPHE = re.compile(r"(?<=\w)'(?=\w)")
+_TOKENS = re.compile(r"""(?<!\w)'([^']+)'(?!\w)|(?<!\w)"([^"]+)"(?!\w)|(\w+)""")
+
+
+def _literals(question: str) -> str:
+    """
+    Values a question filters or ranks by, in order of appearance
+
+    "top 5" and "top 10", "Product A" and "Product D", or "A vs B" and
+    "B vs A" must never share SQL, however similar the wording. Kept:
+    numbers, quoted strings, identifiers (digits or underscores inside a
+    word), single letters other than the words "a" and "I", and
+    capitalised words after the first.
+    """
+    literals = []
+    for position, match in enumerate(_TOKENS.finditer(_INNER_APOSTROPHE.sub('', question))):
+        single, double, word = match.groups()
+        if word is None:
+            literals.append(single or double)
+        elif (any(ch.isdigit() for ch in word) or '_' in word
+              or (len(word) == 1 and word not in ('a', 'I') and (position or word != 'A'))
+              or (position and word[0].isupper() and word != 'I')):
+            literals.append(word)
+    return ' '.join(literals)
+
+
+def _permutations():
+    params = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"perm-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'little') % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:], 'little') % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def minhash(shingles: set) -> array:
+    """64-permutation MinHash signature of a shingle set"""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+              for s in shingles]
+    signature = array('Q')
+    for a, b in _PERMUTATIONS:
+        signature.append(min((a * h + b) % _MERSENNE_PRIME for h in hashes) if hashes else 0)
+    return signature
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(signature: array) -> list:
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append((band, hashlib.blake2b(chunk.tobytes(), digest_size=8).hexdigest()))
+    return keys
+
+
+class NLQueryCache:
+    """Persistent question -> SQL cache with near-duplicate lookup
+
+    Exact matches use the normalized question text. Near-duplicates are
+    found with MinHash signatures over word shingles, bucketed by LSH
+    bands so a lookup only compares a handful of candidates, and only
+    count when both questions name the same literals (numbers, quoted
+    values, identifiers, single letters, capitalised names).
+    """
+
+    def __init__(self, path: str = None, threshold: float = None):
+        self.path = path or os.getenv('NL_CACHE_PATH', 'data/nl_query_cache.db')
+        self.threshold = threshold if threshold is not None else float(os.getenv('NL_CACHE_SIMILARITY', '0.9'))
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.saved_ms = 0.0
+
+    def _create_tables(self):
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                    entry_id INTEGER PRIMARY KEY,
+                    schema_hash TEXT NOT NULL,
+                    question_norm TEXT NOT NULL,
+                    numbers TEXT NOT NULL,  -- _literals(question)
+                    question TEXT NOT NULL,
+                    generated_sql TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    generation_ms REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_used_at TEXT NOT NULL,
+                    UNIQUE (schema_hash, question_norm)
+                );
+                CREATE TABLE IF NOT EXISTS nl_sql_bands (
+                    schema_hash TEXT NOT NULL,
+                    band INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_nl_sql_bands
+                    ON nl_sql_bands (schema_hash, band, bucket);
+            """)
+
+    def lookup(self, question: str, schema_key: str):
+        """
+        Find cached SQL for a question
+
+        Returns:
+            dict with entry_id, generated_sql, match ('exact' or 'similar'),
+            similarity and generation_ms — or None on a miss
+        """
+        normalized = normalize_question(question)
+
+        with self._lock:
+            self.lookups += 1
+            row = self._conn.execute(
+                "SELECT entry_id, generated_sql, generation_ms FROM nl_sql_cache "
+                "WHERE schema_hash = ? AND question_norm = ?",
+                (schema_key, normalized)
+            ).fetchone()
+            if row:
+                self.exact_hits += 1
+                return self._record_hit(row, 'exact', 1.0)
+
+            # Near-duplicates must name exactly the same literal values
+            literals = _literals(question)
+            signature = minhash(_shingles(normalized))
+            candidates = set()
+            for band, bucket in _band_keys(signature):
+                candidates.update(r[0] for r in self._conn.execute(
+                    "SELECT entry_id FROM nl_sql_bands WHERE schema_hash = ? AND band = ? AND bucket = ?",
+                    (schema_key, band, bucket)
+                ))
+            if not candidates:
+                return None
+
+            placeholders = ','.join('?' * len(candidates))
+            best, best_score = None, 0.0
+            for entry_id, generated_sql, generation_ms, numbers, blob in self._conn.execute(
+                f"SELECT entry_id, generated_sql, generation_ms, numbers, signature "
+                f"FROM nl_sql_cache WHERE entry_id IN ({placeholders})",
+                tuple(candidates)
+            ):
+                if numbers != literals:
+                    continue
+                score = similarity(signature, array('Q', blob))
+                if score > best_score:
+                    best, best_score = (entry_id, generated_sql, generation_ms), score
+
+            if best is None or best_score < self.threshold:
+                return None
+            self.similar_hits += 1
+            return self._record_hit(best, 'similar', best_score)
+
+    def _record_hit(self, row, match: str, score: float) -> dict:
+        entry_id, generated_sql, generation_ms = row
+        self.saved_ms += generation_ms
+        with self._conn:
+            self._conn.execute(
+                "UPDATE nl_sql_cache SET hits = hits + 1, last_used_at = ? WHERE entry_id = ?",
+                (datetime.now().isoformat(timespec='seconds'), entry_id)
+            )
+        return {
+            'entry_id': entry_id,
+            'generated_sql': generated_sql,
+            'match': match,
+            'similarity': round(score, 3),
+            'generation_ms': generation_ms,
+        }
+
+    def store(self, question: str, schema_key: str, generated_sql: str, generation_ms: float):
+        """Remember the SQL generated for a question under the current schema"""
+        normalized = normalize_question(question)
+        signature = minhash(_shingles(normalized))
+        now = datetime.now().isoformat(timespec='seconds')
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM nl_sql_bands WHERE entry_id IN (SELECT entry_id FROM nl_sql_cache "
+                "WHERE schema_hash = ? AND question_norm = ?)",
+                (schema_key, normalized)
+            )
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO nl_sql_cache (schema_hash, question_norm, numbers, question, "
+                "generated_sql, signature, generation_ms, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (schema_key, normalized, _literals(question), question, generated_sql,
+                 signature.tobytes(), generation_ms, now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO nl_sql_bands (schema_hash, band, bucket, entry_id) VALUES (?, ?, ?, ?)",
+                [(schema_key, band, bucket, cursor.lastrowid) for band, bucket in _band_keys(signature)]
+            )
+
+    def discard(self, entry_id: int):
+        """Forget an entry whose SQL no longer executes"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM nl_sql_bands WHERE entry_id = ?", (entry_id,))
+            self._conn.execute("DELETE FROM nl_sql_cache WHERE entry_id = ?", (entry_id,))
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        return {
+            'lookups': self.lookups,
+            'exact_hits': self.exact_hits,
+            'similar_hits': self.similar_hits,
+            'hit_rate': round(hits / self.lookups, 3) if self.lookups else 0.0,
+            'saved_ms_total': round(self.saved_ms, 1),
+        }
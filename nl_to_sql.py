@@ -1,17 +1,27 @@
 import os
+import time
 from anthropic import Anthropic
 from database import DatabaseManager
+from nl_cache import NLQueryCache, schema_hash
+from schema_retrieval import SchemaRetriever
 
 class NaturalLanguageQueryEngine:
     """Converts natural language questions to SQL using Claude"""
     
-    def __init__(self):
+    def __init__(self, db: DatabaseManager = None):
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
         
         self.client = Anthropic(api_key=api_key)
-        self.db = DatabaseManager()
+        self.db = db if db is not None else DatabaseManager()
+        
+        # Repeat and near-duplicate questions reuse SQL instead of calling Claude
+        cache_enabled = os.getenv('NL_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.cache = NLQueryCache() if cache_enabled else None
+        
+        # Only the tables relevant to each question go into the prompt
+        self.retriever = SchemaRetriever(self.db)
         
     def query(self, question: str, max_rows: int = 50):
         """
@@ -34,48 +44,41 @@ class NaturalLanguageQueryEngine:
                 'error': 'Failed to retrieve database schema'
             }
         
-        # Step 2: Build schema description for Claude
-        schema_description = self._format_schema(schema['tables'])
-        
-        # Step 3: Create prompt for Claude
-        prompt = f"""You are a SQL expert. Convert the following natural language question into a SQL query.
-
-DATABASE SCHEMA:
-{schema_description}
-
-IMPORTANT RULES:
-1. Generate ONLY a SELECT query (no INSERT, UPDATE, DELETE)
-2. Use proper SQL syntax for SQLite
-3. Include column aliases for clarity
-4. Add ORDER BY when relevant to show most important results first
-5. The query should answer the question directly
-6. Return ONLY the SQL query, no explanations, no markdown, no code blocks
-
-QUESTION: {question}
-
-SQL Query:"""
+        schema_key = schema_hash(schema['tables'])
         
         try:
-            # Step 4: Call Claude API to generate SQL
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=500,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            # Step 2: Reuse SQL from the cache, or ask Claude to write it
+            cache_info = {'hit': None, 'saved_ms': 0.0}
+            schema_context = None
+            cached = self.cache.lookup(question, schema_key) if self.cache else None
             
-            # Extract SQL from response
-            sql_query = message.content[0].text.strip()
-            
-            # Clean up any markdown formatting and semicolons
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-            sql_query = sql_query.rstrip(';')  # Remove trailing semicolons
+            if cached:
+                sql_query = cached['generated_sql']
+                cache_info = {
+                    'hit': cached['match'],
+                    'similarity': cached['similarity'],
+                    'saved_ms': cached['generation_ms']
+                }
+            else:
+                sql_query, generation_ms, schema_context = self._generate_sql(question, schema['tables'])
+                cache_info['generation_ms'] = round(generation_ms, 1)
             
-            # Step 5: Execute the generated SQL
+            # Step 3: Execute the SQL
             result = self.db.execute_query(sql_query, max_rows)
             
+            if not result['success'] and cached:
+                # Cached SQL went stale (e.g. schema drift); regenerate once
+                self.cache.discard(cached['entry_id'])
+                sql_query, generation_ms, schema_context = self._generate_sql(question, schema['tables'])
+                cache_info = {'hit': None, 'saved_ms': 0.0, 'generation_ms': round(generation_ms, 1)}
+                result = self.db.execute_query(sql_query, max_rows)
+            
+            if result['success'] and self.cache and cache_info['hit'] is None:
+                self.cache.store(question, schema_key, sql_query, cache_info['generation_ms'])
+            
+            if self.cache:
+                cache_info.update(self.cache.stats())
+            
             if result['success']:
                 return {
                     'success': True,
@@ -84,7 +87,9 @@ SQL Query:"""
                     'data': result['data'],
                     'columns': result['columns'],
                     'row_count': result['row_count'],
-                    'explanation': f"Generated and executed SQL query successfully"
+                    'explanation': f"Generated and executed SQL query successfully",
+                    'cache': cache_info,
+                    'schema_context': schema_context
                 }
             else:
                 return {
@@ -101,19 +106,58 @@ SQL Query:"""
                 'error': f'Failed to generate or execute SQL: {str(e)}'
             }
     
-    def _format_schema(self, tables: dict) -> str:
-        """Format database schema for Claude's context"""
-        schema_lines = []
+    def _generate_sql(self, question: str, tables: dict):
+        """
+        Ask Claude to write SQL for a question
         
-        for table_name, table_info in tables.items():
-            schema_lines.append(f"\nTable: {table_name} ({table_info['row_count']} rows)")
-            schema_lines.append("Columns:")
-            
-            for col in table_info['columns']:
-                nullable = "NULL" if col['nullable'] else "NOT NULL"
-                schema_lines.append(f"  - {col['name']} ({col['type']}) {nullable}")
+        Returns:
+            (sql_query, generation time in ms, schema tables used)
+        """
+        # Build a compact schema description with only the relevant tables
+        selection = self.retriever.select(question, tables)
+        schema_description = selection['schema']
+        
+        prompt = f"""You are a SQL expert. Convert the following natural language question into a SQL query.
+
+DATABASE SCHEMA:
+{schema_description}
+
+IMPORTANT RULES:
+1. Generate ONLY a SELECT query (no INSERT, UPDATE, DELETE)
+2. Use proper SQL syntax for SQLite
+3. Include column aliases for clarity
+4. Add ORDER BY when relevant to show most important results first
+5. The query should answer the question directly
+6. Return ONLY the SQL query, no explanations, no markdown, no code blocks
+
+QUESTION: {question}
+
+SQL Query:"""
+        
+        start = time.perf_counter()
+        message = self.client.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=500,
+            messages=[{
+                "role": "user",
+                "content": prompt
+            }]
+        )
+        generation_ms = (time.perf_counter() - start) * 1000
+        
+        # Extract SQL from response
+        sql_query = message.content[0].text.strip()
+        
+        # Clean up any markdown formatting and semicolons
+        sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
+        sql_query = sql_query.rstrip(';')  # Remove trailing semicolons
         
-        return "\n".join(schema_lines)
+        schema_context = {
+            'tables': selection['tables'],
+            'pruned': selection['pruned'],
+            'estimated_tokens': selection['estimated_tokens']
+        }
+        return sql_query, generation_ms, schema_context
 
 # Test the engine
 if __name__ == "__main__":
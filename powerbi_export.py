@@ -1,20 +1,100 @@
-import pandas as pd
+import xlsxwriter
 from database import DatabaseManager
+from materialized_views import VIEW_PREFIX
 from datetime import datetime
 import os
 
+# Excel's hard limit per worksheet, header row included
+EXCEL_MAX_ROWS = 1048576
+
+# Rows pulled from the database per round trip while exporting
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '10000'))
+
+# Column widths are estimated from this many leading rows
+WIDTH_SAMPLE_ROWS = 1000
+
+# Parquet layout: Power BI reads snappy and gzip natively
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('PARQUET_ROW_GROUP_SIZE', '131072'))
+PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'snappy')
+
+EXPORT_FORMATS = ['xlsx', 'parquet']
+
+
+def estimate_column_widths(columns: list, sample_rows: list) -> list:
+    """Excel column widths from the header and a sample of rows (max 50)"""
+    widths = []
+    for idx, col in enumerate(columns):
+        longest = max((len(str(row[idx])) for row in sample_rows if row[idx] is not None), default=0)
+        widths.append(min(max(longest, len(str(col))) + 2, 50))
+    return widths
+
 class PowerBIExporter:
     """Export database queries to Power BI-ready formats"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db if db is not None else DatabaseManager()
         self.export_dir = 'powerbi_exports'
         os.makedirs(self.export_dir, exist_ok=True)
     
+    @staticmethod
+    def _workbook(filepath: str):
+        # constant_memory flushes each row to disk as soon as the next one starts
+        return xlsxwriter.Workbook(filepath, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd',
+            'remove_timezone': True
+        })
+    
+    @staticmethod
+    def _write_batches(workbook, sheet_name: str, batches) -> dict:
+        """
+        Stream (columns, rows) batches into a worksheet
+        
+        Rows beyond Excel's per-sheet limit continue on sheet_name_2, _3, ...
+        
+        Returns:
+            dict with columns, rows written and sheet names
+        """
+        header_format = workbook.add_format({'bold': True, 'border': 1})
+        sheets = []
+        worksheet = None
+        columns, widths = [], None
+        row_idx = 0
+        total = 0
+        
+        def new_sheet():
+            name = sheet_name[:31] if not sheets else f"{sheet_name[:27]}_{len(sheets) + 1}"
+            ws = workbook.add_worksheet(name)
+            for idx, width in enumerate(widths):
+                ws.set_column(idx, idx, width)
+            ws.write_row(0, 0, columns, header_format)
+            sheets.append(name)
+            return ws
+        
+        for batch_columns, rows in batches:
+            if worksheet is None:
+                columns = batch_columns
+                widths = estimate_column_widths(columns, rows[:WIDTH_SAMPLE_ROWS])
+                worksheet = new_sheet()
+                row_idx = 1
+            
+            for row in rows:
+                if row_idx >= EXCEL_MAX_ROWS:
+                    worksheet = new_sheet()
+                    row_idx = 1
+                worksheet.write_row(row_idx, 0, row)
+                row_idx += 1
+            total += len(rows)
+        
+        return {'columns': columns, 'rows': total, 'sheets': sheets}
+    
     def export_query_to_excel(self, query: str, filename: str = None):
         """
         Execute SQL query and export results to Excel
         
+        Rows are streamed from the database cursor into the workbook in
+        batches, so memory stays flat regardless of result size.
+        
         Args:
             query: SQL SELECT query
             filename: Output filename (auto-generated if not provided)
@@ -23,18 +103,6 @@ class PowerBIExporter:
             dict with success status and file path
         """
         try:
-            # Execute query (no row limit for exports)
-            result = self.db.execute_query(query, max_rows=10000)
-            
-            if not result['success']:
-                return {
-                    'success': False,
-                    'error': result['error']
-                }
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(result['data'])
-            
             # Generate filename if not provided
             if not filename:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -45,24 +113,143 @@ class PowerBIExporter:
             
             filepath = os.path.join(self.export_dir, filename)
             
-            # Export to Excel with formatting
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Data', index=False)
+            # Export with no row limit; batches go straight to disk
+            workbook = self._workbook(filepath)
+            try:
+                written = self._write_batches(
+                    workbook, 'Data', self.db.iter_batches(query, EXPORT_BATCH_SIZE)
+                )
+            finally:
+                workbook.close()
+            
+            return {
+                'success': True,
+                'filepath': filepath,
+                'rows_exported': written['rows'],
+                'columns': written['columns'],
+                'sheets': written['sheets']
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _write_parquet(filepath: str, batches) -> dict:
+        """
+        Stream (columns, rows) batches into a Parquet file
+        
+        Batches are buffered up to PARQUET_ROW_GROUP_SIZE rows and written
+        as one dictionary-encoded, compressed row group each. Column types
+        are inferred from the values, which SQLite types per row, so they
+        are unified across batches (int64 then REAL becomes float64); if a
+        later row group needs a wider type, the rows already written are
+        rewritten with it.
+        
+        Returns:
+            dict with columns and rows written
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        writer, schema = None, None
+        columns, pending, pending_rows = [], [], 0
+        total = 0
+        
+        def to_table(batch_columns, rows):
+            arrays = [pa.array(values) for values in zip(*rows)] if rows else \
+                     [pa.array([], type=pa.null()) for _ in batch_columns]
+            return pa.Table.from_arrays(arrays, names=batch_columns)
+        
+        def unified(current, new):
+            if current is None or pa.types.is_null(current):
+                return new
+            if pa.types.is_null(new) or new == current:
+                return current
+            try:
+                return pa.unify_schemas([pa.schema([('v', current)]), pa.schema([('v', new)])],
+                                        promote_options='permissive').field('v').type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                return current  # left to the cast, e.g. numbers into a string column
+        
+        def open_writer(target):
+            return pq.ParquetWriter(filepath, target, compression=PARQUET_COMPRESSION, use_dictionary=True)
+        
+        def flush():
+            nonlocal writer, schema
+            types = list(schema.types) if schema is not None else [None] * len(columns)
+            for table in pending:
+                types = [unified(t, new) for t, new in zip(types, table.schema.types)]
+            # Columns with no values yet are stored as strings
+            target = pa.schema([pa.field(name, pa.string() if t is None or pa.types.is_null(t) else t)
+                                for name, t in zip(columns, types)])
+            if writer is None:
+                writer = open_writer(target)
+            elif target != schema:
+                writer.close()
+                written = pq.read_table(filepath).cast(target)
+                writer = open_writer(target)
+                writer.write_table(written, row_group_size=PARQUET_ROW_GROUP_SIZE)
+            schema = target
+            if pending:
+                writer.write_table(pa.concat_tables([table.cast(schema) for table in pending]),
+                                   row_group_size=PARQUET_ROW_GROUP_SIZE)
+                pending.clear()
+        
+        try:
+            for batch_columns, rows in batches:
+                table = to_table(batch_columns, rows)
+                if not columns:
+                    columns = batch_columns
                 
-                # Auto-adjust column widths
-                worksheet = writer.sheets['Data']
-                for idx, col in enumerate(df.columns):
-                    max_length = max(
-                        df[col].astype(str).apply(len).max(),
-                        len(col)
-                    ) + 2
-                    worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+                if table.num_rows:
+                    pending.append(table)
+                    pending_rows += table.num_rows
+                    total += table.num_rows
+                
+                if pending_rows >= PARQUET_ROW_GROUP_SIZE:
+                    flush()
+                    pending_rows = 0
+            
+            if pending or (writer is None and columns):
+                flush()
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        return {'columns': columns, 'rows': total}
+    
+    def export_query_to_parquet(self, query: str, filename: str = None):
+        """
+        Execute SQL query and export results to Parquet
+        
+        Args:
+            query: SQL SELECT query
+            filename: Output filename (auto-generated if not provided)
+            
+        Returns:
+            dict with success status and file path
+        """
+        try:
+            if not filename:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"query_export_{timestamp}.parquet"
+            
+            if filename.endswith('.xlsx'):
+                filename = filename[:-len('.xlsx')]
+            if not filename.endswith('.parquet'):
+                filename += '.parquet'
+            
+            filepath = os.path.join(self.export_dir, filename)
+            written = self._write_parquet(filepath, self.db.iter_batches(query, EXPORT_BATCH_SIZE))
             
             return {
                 'success': True,
                 'filepath': filepath,
-                'rows_exported': len(df),
-                'columns': list(df.columns)
+                'rows_exported': written['rows'],
+                'columns': written['columns']
             }
             
         except Exception as e:
@@ -71,6 +258,17 @@ class PowerBIExporter:
                 'error': str(e)
             }
     
+    def export_query(self, query: str, filename: str = None, export_format: str = 'xlsx'):
+        """Export a query in the requested format (xlsx or parquet)"""
+        if export_format == 'parquet':
+            return self.export_query_to_parquet(query, filename)
+        if export_format != 'xlsx':
+            return {
+                'success': False,
+                'error': f"Unknown format: {export_format}. Use one of {EXPORT_FORMATS}"
+            }
+        return self.export_query_to_excel(query, filename)
+    
     def export_table_to_excel(self, table_name: str, filename: str = None):
         """Export entire table to Excel"""
         query = f"SELECT * FROM {table_name}"
@@ -80,16 +278,73 @@ class PowerBIExporter:
         
         return self.export_query_to_excel(query, filename)
     
-    def create_powerbi_dataset(self):
+    def export_tables_to_excel(self, tables: list, filename: str):
+        """
+        Export several tables to one workbook, one sheet per table
+        
+        Returns:
+            dict with success status, file path and rows per table
+        """
+        filepath = os.path.join(self.export_dir, filename)
+        rows_per_table = {}
+        
+        workbook = self._workbook(filepath)
+        try:
+            for table_name in tables:
+                written = self._write_batches(
+                    workbook, table_name,
+                    self.db.iter_batches(f"SELECT * FROM {table_name}", EXPORT_BATCH_SIZE)
+                )
+                rows_per_table[table_name] = written['rows']
+        finally:
+            workbook.close()
+        
+        return {
+            'success': True,
+            'filepath': filepath,
+            'rows_per_table': rows_per_table
+        }
+    
+    def export_tables_to_parquet(self, tables: list, dirname: str):
+        """
+        Export several tables to a folder with one Parquet file per table
+        
+        Power BI's Folder connector combines them, or each file can be
+        loaded as its own query.
+        
+        Returns:
+            dict with success status, folder path and rows per table
+        """
+        dirpath = os.path.join(self.export_dir, dirname)
+        os.makedirs(dirpath, exist_ok=True)
+        rows_per_table = {}
+        
+        for table_name in tables:
+            written = self._write_parquet(
+                os.path.join(dirpath, f"{table_name}.parquet"),
+                self.db.iter_batches(f"SELECT * FROM {table_name}", EXPORT_BATCH_SIZE)
+            )
+            rows_per_table[table_name] = written['rows']
+        
+        return {
+            'success': True,
+            'filepath': dirpath,
+            'rows_per_table': rows_per_table
+        }
+    
+    def create_powerbi_dataset(self, export_format: str = 'xlsx'):
         """
         Create a complete Power BI dataset with all tables
         
+        Args:
+            export_format: 'xlsx' (one sheet per table) or 'parquet'
+                (one file per table in a dataset folder)
+        
         Returns:
             dict with success status and file paths
         """
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            dataset_file = os.path.join(self.export_dir, f'powerbi_dataset_{timestamp}.xlsx')
             
             # Get all tables
             schema = self.db.get_schema_info()
@@ -100,29 +355,20 @@ class PowerBIExporter:
                     'error': 'Failed to retrieve schema'
                 }
             
-            # Create Excel file with multiple sheets
-            with pd.ExcelWriter(dataset_file, engine='openpyxl') as writer:
-                for table_name in schema['tables'].keys():
-                    result = self.db.execute_query(f"SELECT * FROM {table_name}", max_rows=10000)
-                    
-                    if result['success']:
-                        df = pd.DataFrame(result['data'])
-                        df.to_excel(writer, sheet_name=table_name, index=False)
-                        
-                        # Format worksheet
-                        worksheet = writer.sheets[table_name]
-                        for idx, col in enumerate(df.columns):
-                            max_length = max(
-                                df[col].astype(str).apply(len).max(),
-                                len(col)
-                            ) + 2
-                            col_letter = chr(65 + idx) if idx < 26 else chr(65 + idx//26 - 1) + chr(65 + idx%26)
-                            worksheet.column_dimensions[col_letter].width = min(max_length, 50)
+            # Summary tables are internal to the query router, not data
+            tables = [t for t in schema['tables'] if not t.startswith(VIEW_PREFIX)]
+            
+            if export_format == 'parquet':
+                result = self.export_tables_to_parquet(tables, f'powerbi_dataset_{timestamp}')
+            else:
+                # Create Excel file with multiple sheets
+                result = self.export_tables_to_excel(tables, f'powerbi_dataset_{timestamp}.xlsx')
             
             return {
                 'success': True,
-                'filepath': dataset_file,
-                'tables_exported': list(schema['tables'].keys()),
+                'filepath': result['filepath'],
+                'tables_exported': tables,
+                'rows_per_table': result['rows_per_table'],
                 'message': 'Complete dataset exported. Ready to import into Power BI.'
             }
             
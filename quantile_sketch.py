@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+# Compression: more centroids = more accurate quantiles, bigger sketch.
+# The arcsine scale keeps centroids smallest at the tails, where the IQR
+# fences and outliers are.
+SKETCH_DELTA = int(os.getenv('SKETCH_DELTA', '300'))
+# Columns with at most this many distinct values are kept as exact value counts
+SKETCH_EXACT_VALUES = int(os.getenv('SKETCH_EXACT_VALUES', '4096'))
+SKETCH_CHUNK_ROWS = int(os.getenv('SKETCH_CHUNK_ROWS', '262144'))
+SKETCH_WORKERS = int(os.getenv('SKETCH_WORKERS', str(min(os.cpu_count() or 1, 8))))
+
+
+class TDigest:
+    """Mergeable quantile sketch (merging t-digest)
+
+    A sorted list of weighted centroids. update() folds in a chunk of
+    values, merge() combines digests built on different chunks (or
+    threads, or files), and quantile()/cdf() answer from the centroids
+    alone, in memory bounded by delta regardless of how many values were
+    seen. Min and max are exact.
+
+    Until it has seen more than exact_values distinct values the digest
+    keeps exact (value, count) pairs and answers exactly, matching
+    pandas' linear quantiles. Centroids interpolate between neighbouring
+    values, which misplaces quartiles badly on heavily tied data
+    (quantities, prices, ratings).
+    """
+
+    def __init__(self, delta: int = None, exact_values: int = None):
+        self.delta = delta or SKETCH_DELTA
+        self.exact_values = exact_values if exact_values is not None else SKETCH_EXACT_VALUES
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.exact = True
+        self.count = 0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values) -> 'TDigest':
+        values = np.sort(np.asarray(values, dtype=np.float64))
+        values = values[:len(values) - np.count_nonzero(np.isnan(values))]  # NaNs sort last
+        if not len(values):
+            return self
+        # Reduce the chunk on its own first: sorting the raw values is the bulk of the work
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(values)) + 1])
+        if self.exact and len(starts) <= self.exact_values:
+            means, weights, exact = values[starts], np.diff(np.append(starts, len(values))).astype(np.float64), True
+        else:
+            (means, weights), exact = self._compress(values, np.ones(len(values))), False
+        self._absorb(means, weights, exact, float(values[0]), float(values[-1]))
+        return self
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        if other.count:
+            self._absorb(other.means, other.weights, other.exact, other.min, other.max)
+        return self
+
+    def _absorb(self, means, weights, exact, low, high):
+        self.min = low if np.isnan(self.min) else min(self.min, low)
+        self.max = high if np.isnan(self.max) else max(self.max, high)
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        self.exact = self.exact and exact
+        if self.exact:
+            starts = np.concatenate([[0], np.flatnonzero(np.diff(means)) + 1])
+            means, weights = means[starts], np.add.reduceat(weights, starts)
+            self.exact = len(means) <= self.exact_values
+        self.means, self.weights = (means, weights) if self.exact else self._compress(means, weights)
+        self.count = float(self.weights.sum())
+
+    def _compress(self, means, weights):
+        # Group neighbours whose quantiles fall in the same unit of the scale function
+        total = weights.sum()
+        middle = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.delta / np.pi * np.arcsin(2 * middle - 1))
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(k)) + 1])
+        grouped = np.add.reduceat(weights, starts)
+        return np.add.reduceat(means * weights, starts) / grouped, grouped
+
+    def _positions(self):
+        # Centroid mean i sits at the middle of its weight; min and max at the ends
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        return np.concatenate([[0.0], ranks, [self.count]]), np.concatenate([[self.min], self.means, [self.max]])
+
+    def quantile(self, q):
+        """Value at quantile q (scalar or array) in [0, 1]"""
+        if not self.count:
+            return np.nan if np.isscalar(q) else np.full(len(q), np.nan)
+        if self.exact:
+            # Linear interpolation between the order statistics around q, as pandas does
+            cumulative = np.cumsum(self.weights)
+            h = np.asarray(q) * (self.count - 1)
+            below = self.means[np.searchsorted(cumulative, np.floor(h), side='right')]
+            above = self.means[np.minimum(np.searchsorted(cumulative, np.ceil(h), side='right'), len(self.means) - 1)]
+            return below + (h - np.floor(h)) * (above - below)
+        ranks, values = self._positions()
+        return np.interp(np.asarray(q) * self.count, ranks, values)
+
+    def cdf(self, x):
+        """Estimated share of values <= x"""
+        if not self.count:
+            return np.nan
+        if self.exact:
+            at_or_below = np.searchsorted(self.means, x, side='right')
+            return np.concatenate([[0.0], np.cumsum(self.weights)])[at_or_below] / self.count
+        ranks, values = self._positions()
+        return np.interp(x, values, ranks) / self.count
+
+
+def _sketch_chunk(columns: dict, delta: int) -> dict:
+    return {name: TDigest(delta).update(values) for name, values in columns.items()}
+
+
+def sketch_columns(df, columns=None, delta: int = None, chunk_rows: int = None, workers: int = None) -> dict:
+    """
+    One TDigest per numeric column of df, in one pass over row chunks
+
+    Chunks are sketched in parallel (the sorting releases the GIL) and the
+    per-chunk digests merged.
+
+    Returns:
+        {column: TDigest}
+    """
+    columns = list(columns if columns is not None else df.select_dtypes(include=[np.number]).columns)
+    chunk_rows = chunk_rows or SKETCH_CHUNK_ROWS
+    arrays = {c: df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in columns}
+    chunks = [{c: values[start:start + chunk_rows] for c, values in arrays.items()}
+              for start in range(0, len(df), chunk_rows)]
+
+    sketches = {c: TDigest(delta) for c in columns}
+    workers = min(workers or SKETCH_WORKERS, len(chunks))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(lambda chunk: _sketch_chunk(chunk, delta), chunks))
+    else:
+        partials = [_sketch_chunk(chunk, delta) for chunk in chunks]
+    for partial in partials:
+        for c, sketch in partial.items():
+            sketches[c].merge(sketch)
+    return sketches
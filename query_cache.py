@@ -0,0 +1,209 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+import time
+
+from response_format import dumps_compact
+from sql_rewriter import SQLGLOT_DIALECTS
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # without sqlglot, fingerprints only normalize whitespace/case
+    sqlglot = None
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_OR_CODE = re.compile(r"('(?:[^']|'')*')|([^']+)")
+
+
+def _normalize_text(query: str) -> str:
+    # Upper-case and collapse whitespace outside string literals
+    query = _COMMENTS.sub(' ', query)
+    parts = []
+    for literal, code in _STRING_OR_CODE.findall(query):
+        parts.append(literal if literal else ' '.join(code.upper().split()))
+    return ' '.join(parts).strip().rstrip(';').strip()
+
+
+def fingerprint(query: str, max_rows, dialect: str = 'sqlite'):
+    """
+    Normalized cache key for a query
+
+    Formatting, keyword/identifier casing, comments and table alias names
+    do not change the key. Column aliases do, because they change the
+    result's column names.
+
+    Returns:
+        (key, tables) where tables is the set of referenced table names,
+        or None if they could not be determined
+    """
+    normalized, tables = None, None
+
+    if sqlglot is not None:
+        read = SQLGLOT_DIALECTS.get(dialect, dialect)
+        try:
+            tree = sqlglot.parse_one(query, read=read)
+            cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+            # Rename table aliases to t0, t1, ... in order of appearance. Each
+            # SELECT keeps its own alias map, so a subquery or CTE reusing an
+            # outer alias cannot clash; columns resolve to the nearest scope
+            # that defines their qualifier, as correlated references do.
+            scopes = {}
+            renamed = 0
+            for table in list(tree.find_all(exp.Table)):
+                if table.alias:
+                    new_alias = f"t{renamed}"
+                    renamed += 1
+                    scope = scopes.setdefault(id(table.find_ancestor(exp.Select)), {})
+                    scope[table.alias.lower()] = new_alias
+                    table.set('alias', exp.TableAlias(this=exp.to_identifier(new_alias)))
+            for column in list(tree.find_all(exp.Column)):
+                qualifier = column.table.lower() if column.table else None
+                select = column.find_ancestor(exp.Select) if qualifier else None
+                while select is not None:
+                    aliases = scopes.get(id(select), {})
+                    if qualifier in aliases:
+                        column.set('table', exp.to_identifier(aliases[qualifier]))
+                        break
+                    select = select.find_ancestor(exp.Select)
+
+            normalized = tree.sql(dialect=read, normalize=True, comments=False)
+            tables = {t.name.lower() for t in tree.find_all(exp.Table)} - cte_names
+        except Exception:
+            normalized, tables = None, None
+
+    if normalized is None:
+        normalized = _normalize_text(query)
+
+    digest = hashlib.sha256(f"{dialect}|{max_rows}|{normalized}".encode('utf-8')).hexdigest()
+    return digest, tables
+
+
+def _copy(result: dict) -> dict:
+    # Callers may add keys or edit the rows list; the cached entry must not change
+    copied = dict(result)
+    if isinstance(copied.get('data'), list):
+        copied['data'] = list(copied['data'])
+    return copied
+
+
+class QueryResultCache:
+    """LRU + TTL cache of query results, bounded by entry count and bytes
+
+    Entries are stored with the data version they were computed at and
+    are treated as misses once the version moves on. Tables written
+    through this process can also be invalidated explicitly, which bumps
+    their per-table change counter.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '256'))
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else int(float(os.getenv('QUERY_CACHE_MAX_MB', '64')) * 1024 * 1024))
+        self.ttl = ttl if ttl is not None else float(os.getenv('QUERY_CACHE_TTL', '300'))
+
+        self._entries = OrderedDict()
+        self._table_counters = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def table_versions(self, tables) -> tuple:
+        """Local change counters for the given tables (None = all tables)"""
+        with self._lock:
+            if tables is None:
+                return tuple(sorted(self._table_counters.items()))
+            return tuple(self._table_counters.get(t, 0) for t in sorted(tables))
+
+    def get(self, key: str, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry['version'] != version or time.monotonic() - entry['stored_at'] > self.ttl:
+                self._drop(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(entry['result'])
+
+    def put(self, key: str, version, result: dict, tables=None):
+        size = self._estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                'version': version,
+                'result': _copy(result),
+                'tables': tables,
+                'size': size,
+                'stored_at': time.monotonic(),
+            }
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, tables=None):
+        """Drop entries that read any of the given tables (or everything)"""
+        with self._lock:
+            if tables is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+
+            tables = {t.lower() for t in tables}
+            for table in tables:
+                self._table_counters[table] = self._table_counters.get(table, 0) + 1
+            for key in [k for k, e in self._entries.items()
+                        if e['tables'] is None or e['tables'] & tables]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _estimate_size(self, result: dict) -> int:
+        # Serialize a sample instead of the whole result; big exports skip the cache
+        rows = result.get('data') or []
+        if len(rows) <= 100:
+            return len(dumps_compact(result))
+        sample = dumps_compact(rows[:100])
+        return int(len(sample) * len(rows) / 100)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
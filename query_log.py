@@ -0,0 +1,145 @@
+from datetime import datetime
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Aggregated in memory and written out at most this often
+FLUSH_INTERVAL = float(os.getenv('QUERY_LOG_FLUSH_SECONDS', '10'))
+
+
+class QueryLog:
+    """Workload log of queries run through DatabaseManager.execute_query
+
+    Calls and timings are aggregated per database and SQL text in memory
+    and flushed to a small SQLite file, so the index advisor (a separate
+    process) can read the workload of a running server. Calls answered
+    from the result cache count towards calls (and cached_calls) but not
+    towards the timings.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv('QUERY_LOG_PATH', 'data/query_log.db')
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._conn = None
+        atexit.register(self.flush)
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_log (
+                        db_url TEXT NOT NULL,
+                        query_hash TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        calls INTEGER NOT NULL,
+                        cached_calls INTEGER NOT NULL DEFAULT 0,
+                        total_ms REAL NOT NULL,
+                        max_ms REAL NOT NULL,
+                        last_seen TEXT NOT NULL,
+                        PRIMARY KEY (db_url, query_hash)
+                    )
+                """)
+                columns = [row[1] for row in self._conn.execute("PRAGMA table_info(query_log)")]
+                if 'cached_calls' not in columns:  # log written before cache hits were recorded
+                    self._conn.execute("ALTER TABLE query_log ADD COLUMN cached_calls INTEGER NOT NULL DEFAULT 0")
+        return self._conn
+
+    def record(self, db_url: str, query: str, elapsed_ms: float, cached: bool = False):
+        """Count one call of query against db_url; cached calls were not executed"""
+        key = (str(db_url), hashlib.sha1(query.encode('utf-8')).hexdigest())
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = {'query': query, 'calls': 0, 'cached_calls': 0,
+                                              'total_ms': 0.0, 'max_ms': 0.0}
+            entry['calls'] += 1
+            if cached:
+                entry['cached_calls'] += 1
+            else:
+                entry['total_ms'] += elapsed_ms
+                entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write pending counts to the log file"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            now = datetime.now().isoformat(timespec='seconds')
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("""
+                        INSERT INTO query_log (db_url, query_hash, query, calls, cached_calls, total_ms, max_ms, last_seen)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (db_url, query_hash) DO UPDATE SET
+                            calls = calls + excluded.calls,
+                            cached_calls = cached_calls + excluded.cached_calls,
+                            total_ms = total_ms + excluded.total_ms,
+                            max_ms = MAX(max_ms, excluded.max_ms),
+                            last_seen = excluded.last_seen
+                    """, [(db_url, query_hash, e['query'], e['calls'], e['cached_calls'], e['total_ms'], e['max_ms'], now)
+                          for (db_url, query_hash), e in pending.items()])
+            except sqlite3.Error:
+                # The workload log is best effort; never fail a query over it
+                pass
+
+    def workload(self, db_url: str, limit: int = 200) -> list:
+        """
+        Logged queries for a database, most total time first
+
+        Total time is the average execution time times all calls, cached
+        or not, so a hot query served mostly from cache still ranks by
+        how often it is asked.
+        """
+        self.flush()
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT query, calls, cached_calls, total_ms, max_ms, last_seen FROM query_log "
+            "WHERE db_url = ? ORDER BY total_ms / MAX(calls - cached_calls, 1) * calls DESC LIMIT ?",
+            (str(db_url), limit)
+        ).fetchall()
+        return [
+            {'query': q, 'calls': calls, 'cached_calls': cached,
+             'avg_ms': round(total / max(calls - cached, 1), 2), 'max_ms': round(mx, 2), 'last_seen': seen}
+            for q, calls, cached, total, mx, seen in rows
+        ]
+
+    def clear(self, db_url: str = None):
+        with self._lock:
+            self._pending = {k: v for k, v in self._pending.items() if db_url is not None and k[0] != str(db_url)}
+            conn = self._connect()
+            with conn:
+                if db_url is None:
+                    conn.execute("DELETE FROM query_log")
+                else:
+                    conn.execute("DELETE FROM query_log WHERE db_url = ?", (str(db_url),))
+
+
+_query_log = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log():
+    """Process-wide QueryLog, or None when QUERY_LOG_ENABLED is false"""
+    global _query_log
+    if os.getenv('QUERY_LOG_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _query_log_lock:
+        if _query_log is None:
+            _query_log = QueryLog()
+        return _query_log
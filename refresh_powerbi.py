@@ -1,46 +1,12 @@
 from powerbi_export import PowerBIExporter
+from export_scheduler import ExportJob, ExportScheduler
+from incremental_refresh import IncrementalRefresher
 from datetime import datetime
+import argparse
 import json
+import time
 
-def refresh_all_exports():
-    """
-    One-command refresh for all Power BI exports
-    Overwrites existing files so Power BI refresh works
-    """
-    print("🔄 Starting Power BI Data Refresh...")
-    print("=" * 60)
-    
-    exporter = PowerBIExporter()
-    results = []
-    
-    # Export 1: Complete Dataset (FIXED FILENAME)
-    print("\n📊 Exporting complete dataset...")
-    result = exporter.export_query_to_excel(
-        "SELECT * FROM customers", 
-        "powerbi_dataset_customers.xlsx"
-    )
-    
-    # Export all tables to one file manually
-    import pandas as pd
-    from database import DatabaseManager
-    import os
-    
-    db = DatabaseManager()
-    dataset_file = os.path.join(exporter.export_dir, 'powerbi_dataset_complete.xlsx')
-    
-    with pd.ExcelWriter(dataset_file, engine='openpyxl') as writer:
-        # Export each table
-        for table in ['customers', 'sales', 'products', 'pipeline']:
-            result = db.execute_query(f"SELECT * FROM {table}", max_rows=10000)
-            if result['success']:
-                df = pd.DataFrame(result['data'])
-                df.to_excel(writer, sheet_name=table, index=False)
-    
-    print(f"✅ Success: {dataset_file}")
-    
-    # Export 2: Sales Summary (FIXED FILENAME)
-    print("\n📈 Exporting sales summary...")
-    query = """
+SALES_SUMMARY_QUERY = """
     SELECT 
         s.sale_date,
         s.product,
@@ -56,15 +22,8 @@ def refresh_all_exports():
     LEFT JOIN customers c ON s.customer_id = c.customer_id
     LEFT JOIN products p ON s.product = p.product_name
     """
-    result = exporter.export_query_to_excel(query, 'sales_summary_powerbi.xlsx')
-    if result['success']:
-        print(f"✅ Success: {result['filepath']}")
-    else:
-        print(f"❌ Failed: {result['error']}")
-    
-    # Export 3: Revenue by Product (FIXED FILENAME)
-    print("\n💰 Exporting revenue analysis...")
-    query = """
+
+REVENUE_BY_PRODUCT_QUERY = """
     SELECT 
         product,
         COUNT(*) as sales_count,
@@ -76,13 +35,8 @@ def refresh_all_exports():
     GROUP BY product
     ORDER BY total_revenue DESC
     """
-    result = exporter.export_query_to_excel(query, 'revenue_by_product.xlsx')
-    if result['success']:
-        print(f"✅ Success: {result['filepath']}")
-    
-    # Export 4: Regional Performance (FIXED FILENAME)
-    print("\n🌍 Exporting regional performance...")
-    query = """
+
+REGIONAL_PERFORMANCE_QUERY = """
     SELECT 
         c.region,
         COUNT(DISTINCT s.customer_id) as customer_count,
@@ -94,13 +48,8 @@ def refresh_all_exports():
     GROUP BY c.region
     ORDER BY total_revenue DESC
     """
-    result = exporter.export_query_to_excel(query, 'regional_performance.xlsx')
-    if result['success']:
-        print(f"✅ Success: {result['filepath']}")
-    
-    # Export 5: Sales Rep Performance (FIXED FILENAME)
-    print("\n👥 Exporting sales rep performance...")
-    query = """
+
+SALES_REP_PERFORMANCE_QUERY = """
     SELECT 
         sales_rep,
         COUNT(*) as deals_closed,
@@ -111,14 +60,93 @@ def refresh_all_exports():
     GROUP BY sales_rep
     ORDER BY total_revenue DESC
     """
-    result = exporter.export_query_to_excel(query, 'sales_rep_performance.xlsx')
-    if result['success']:
-        print(f"✅ Success: {result['filepath']}")
+
+def refresh_jobs() -> list:
+    """The full refresh as a job graph (FIXED FILENAMES so Power BI refresh works)"""
+    return [
+        ExportJob('customers', 'powerbi_dataset_customers.xlsx', query="SELECT * FROM customers"),
+        ExportJob('complete_dataset', 'powerbi_dataset_complete.xlsx',
+                  tables=['customers', 'sales', 'products', 'pipeline']),
+        ExportJob('sales_summary', 'sales_summary_powerbi.xlsx', query=SALES_SUMMARY_QUERY),
+        ExportJob('revenue_by_product', 'revenue_by_product.xlsx', query=REVENUE_BY_PRODUCT_QUERY),
+        ExportJob('regional_performance', 'regional_performance.xlsx', query=REGIONAL_PERFORMANCE_QUERY),
+        ExportJob('sales_rep_performance', 'sales_rep_performance.xlsx', query=SALES_REP_PERFORMANCE_QUERY),
+    ]
+
+def refresh_all_exports(workers: int = None):
+    """
+    One-command refresh for all Power BI exports
+    Overwrites existing files so Power BI refresh works
+    
+    Independent exports run concurrently through ExportScheduler, sharing
+    one database engine; per-job timings are printed as each one finishes.
+    """
+    print("🔄 Starting Power BI Data Refresh...")
+    print("=" * 60)
+    
+    scheduler = ExportScheduler(PowerBIExporter(), workers=workers)
+    
+    def report(job):
+        if job['success']:
+            print(f"✅ {job['job']}: {job['filepath']} "
+                  f"({job['rows']} rows, {job['total_s']:.2f}s: query {job['query_s']:.2f}s, "
+                  f"encode {job['encode_s']:.2f}s)")
+        else:
+            print(f"❌ {job['job']} failed: {job['error']}")
+    
+    result = scheduler.run(refresh_jobs(), on_complete=report)
+    if 'jobs' not in result:
+        print(f"❌ Failed: {result['error']}")
+        return result
     
+    slowest = max(result['jobs'], key=lambda job: job.get('total_s', 0))
     print("\n" + "=" * 60)
-    print("✅ All exports complete!")
+    if result['success']:
+        print("✅ All exports complete!")
+    else:
+        print("⚠️  Some exports failed (see above)")
+    print(f"⏱️  {result['elapsed_s']:.2f}s wall time with {scheduler.workers} workers "
+          f"(slowest job: {slowest['job']} {slowest.get('total_s', 0):.2f}s)")
     print("📁 Files location: powerbi_exports/")
     print("🔄 Now click REFRESH in Power BI Desktop to see updated data!")
+    return result
+
+def refresh_incremental(full: bool = False, verify: bool = False):
+    """
+    Append only rows added since the last refresh
+    Tables go to partitioned Parquet folders; summaries are merged and rewritten
+    """
+    print("⚡ Starting incremental Power BI refresh...")
+    print("=" * 60)
+    
+    start = time.perf_counter()
+    result = IncrementalRefresher().refresh(full=full, verify=verify)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    for name in result['rebuilt']:
+        print(f"   🔁 {name}: exported rows changed, rebuilt")
+    for name, rows in result['rows_appended'].items():
+        print(f"   {'✅' if rows else '⏭️ '} {name}: {rows} new rows")
+    for filepath in result['summaries']:
+        print(f"   ✅ {filepath}")
+    
+    print("\n" + "=" * 60)
+    print(f"✅ Incremental refresh complete in {elapsed_ms:.0f} ms")
+    print(f"📁 Partitioned tables: {result['output_dir']}/ (use Power BI's Folder connector)")
 
 if __name__ == "__main__":
-    refresh_all_exports()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh Power BI exports")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Append only new rows and merge summary aggregates")
+    parser.add_argument("--full", action="store_true",
+                        help="With --incremental: discard stored state and rebuild")
+    parser.add_argument("--verify", action="store_true",
+                        help="With --incremental: checksum every exported row to catch in-place updates")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Concurrent export jobs (default: EXPORT_WORKERS)")
+    args = parser.parse_args()
+    
+    if args.incremental:
+        refresh_incremental(full=args.full, verify=args.verify)
+    else:
+        refresh_all_exports(workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import base64
+import csv
+import io
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to compact stdlib json
+    orjson = None
+
+# "json" is the original indented row-per-dict output; the others are compact
+RESPONSE_FORMATS = ["json", "columnar", "csv", "arrow"]
+
+# Keys under which tools return lists of row dicts
+ROW_KEYS = ('data', 'sample_data', 'rows')
+
+
+def dumps_compact(obj) -> str:
+    """Serialize without whitespace, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+
+def _row_key(result: dict):
+    for key in ROW_KEYS:
+        rows = result.get(key)
+        if isinstance(rows, list) and (not rows or isinstance(rows[0], dict)):
+            return key
+    return None
+
+
+def _columns(result: dict, rows: list) -> list:
+    if result.get('columns'):
+        return list(result['columns'])
+    columns = []
+    for row in rows[:1]:
+        columns.extend(row.keys())
+    return columns
+
+
+def to_columnar(columns: list, rows: list) -> dict:
+    """{column: [values...]} — each column name appears once"""
+    return {col: [row.get(col) for row in rows] for col in columns}
+
+
+def to_csv(columns: list, rows: list) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row.get(col) for col in columns])
+    return buffer.getvalue()
+
+
+def to_arrow_base64(columns: list, rows: list) -> str:
+    """Arrow IPC stream, base64 encoded for transport as text"""
+    import pyarrow as pa
+
+    table = pa.Table.from_pydict(to_columnar(columns, rows))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue().to_pybytes()).decode('ascii')
+
+
+def encode_result(result, response_format: str = "json") -> str:
+    """
+    Serialize a tool result in the requested response format
+
+    Args:
+        result: dict returned by a tool handler
+        response_format: json (indented rows), columnar, csv or arrow
+
+    Returns:
+        Text payload for the MCP TextContent
+    """
+    if response_format in (None, "json") or not isinstance(result, dict):
+        return json.dumps(result, indent=2, default=str)
+
+    if response_format not in RESPONSE_FORMATS:
+        return dumps_compact({
+            'success': False,
+            'error': f"Unknown response_format: {response_format}. Use one of {RESPONSE_FORMATS}"
+        })
+
+    key = _row_key(result)
+    if key is None:
+        return dumps_compact(result)
+
+    rows = result[key]
+    columns = _columns(result, rows)
+    encoded = {k: v for k, v in result.items() if k != key}
+    encoded['columns'] = columns
+    encoded['format'] = response_format
+
+    if response_format == "columnar":
+        encoded[key] = to_columnar(columns, rows)
+    elif response_format == "csv":
+        encoded[key] = to_csv(columns, rows)
+    elif response_format == "arrow":
+        try:
+            encoded[key] = to_arrow_base64(columns, rows)
+        except Exception as e:
+            # pyarrow missing, or values Arrow cannot type (mixed columns)
+            encoded['format'] = "columnar"
+            encoded['note'] = f"Arrow encoding unavailable ({e}); returned columnar instead"
+            encoded[key] = to_columnar(columns, rows)
+
+    return dumps_compact(encoded)
@@ -0,0 +1,112 @@
+import os
+import secrets
+import threading
+import time
+
+
+class ResultStream:
+    """An open cursor that hands out one page of rows at a time"""
+
+    def __init__(self, conn, result, page_size: int, max_rows: int = None):
+        self.conn = conn
+        self.result = result
+        self.columns = list(result.keys())
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.rows_returned = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self._closed = False
+        # One row of look-ahead so we know whether another page exists
+        self._peeked = None
+
+    def next_page(self) -> list:
+        """Fetch the next page; only page_size rows are ever held in memory"""
+        self.last_used = time.monotonic()
+
+        limit = self.page_size
+        if self.max_rows is not None:
+            limit = min(limit, self.max_rows - self.rows_returned)
+
+        rows = []
+        if self._peeked is not None and limit > 0:
+            rows.append(self._peeked)
+            self._peeked = None
+        if limit > len(rows):
+            rows.extend(self.result.fetchmany(limit - len(rows)))
+        self.rows_returned += len(rows)
+
+        if self.max_rows is not None and self.rows_returned >= self.max_rows:
+            self.close()
+        elif len(rows) < limit:
+            self.close()
+        else:
+            self._peeked = self.result.fetchone()
+            if self._peeked is None:
+                self.close()
+
+        return rows
+
+    @property
+    def exhausted(self) -> bool:
+        return self._closed
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.result.close()
+        finally:
+            self.conn.close()
+
+
+class StreamRegistry:
+    """Open result streams addressed by opaque continuation tokens
+
+    Each stream holds a pooled connection, so the number of open streams
+    is capped and idle ones are closed after STREAM_IDLE_TIMEOUT seconds.
+    """
+
+    def __init__(self, max_open: int = None, idle_timeout: float = None):
+        self.max_open = max_open if max_open is not None else int(os.getenv('STREAM_MAX_OPEN', '8'))
+        self.idle_timeout = (idle_timeout if idle_timeout is not None
+                             else float(os.getenv('STREAM_IDLE_TIMEOUT', '300')))
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def register(self, stream: ResultStream) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._expire_idle()
+            if len(self._streams) >= self.max_open:
+                # Make room by closing the least recently used stream
+                oldest = min(self._streams, key=lambda t: self._streams[t].last_used)
+                self._streams.pop(oldest).close()
+            self._streams[token] = stream
+        return token
+
+    def get(self, token: str):
+        with self._lock:
+            self._expire_idle()
+            return self._streams.get(token)
+
+    def discard(self, token: str):
+        with self._lock:
+            stream = self._streams.pop(token, None)
+        if stream is not None:
+            stream.close()
+
+    def open_count(self) -> int:
+        with self._lock:
+            return len(self._streams)
+
+    def _expire_idle(self):
+        now = time.monotonic()
+        for token in [t for t, s in self._streams.items()
+                      if s.exhausted or now - s.last_used > self.idle_timeout]:
+            self._streams.pop(token).close()
+
+
+# Shared by every DatabaseManager in the process
+streams = StreamRegistry()
@@ -0,0 +1,292 @@
+from sqlalchemy import text, inspect
+from datetime import datetime
+import os
+import threading
+import time
+
+# Cheap metadata queries used to detect change without re-introspecting.
+# Each returns a single row; "ddl" changes when tables/columns change,
+# "data" changes when rows are written.
+CHANGE_QUERIES = {
+    'postgresql': {
+        'ddl': """
+            SELECT md5(string_agg(table_name || '.' || column_name || ':' || data_type, ','
+                                  ORDER BY table_name, ordinal_position))
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+        """,
+        'data': """
+            SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+            FROM pg_stat_user_tables
+            WHERE schemaname = current_schema()
+        """,
+    },
+    'mysql': {
+        'ddl': """
+            SELECT COUNT(*), MAX(t.CREATE_TIME)
+            FROM information_schema.columns c
+            JOIN information_schema.tables t
+              ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE c.TABLE_SCHEMA = DATABASE()
+        """,
+        'data': """
+            SELECT SUM(TABLE_ROWS), MAX(UPDATE_TIME)
+            FROM information_schema.tables
+            WHERE TABLE_SCHEMA = DATABASE()
+        """,
+    },
+    'snowflake': {
+        'ddl': """
+            SELECT COUNT(*), MAX(t.CREATED)
+            FROM information_schema.columns c
+            JOIN information_schema.tables t
+              ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE c.TABLE_SCHEMA = CURRENT_SCHEMA()
+        """,
+        'data': """
+            SELECT MAX(LAST_ALTERED), SUM(ROW_COUNT)
+            FROM information_schema.tables
+            WHERE TABLE_SCHEMA = CURRENT_SCHEMA()
+        """,
+    },
+}
+
+# Dialects whose data token misses writes: InnoDB does not persist
+# UPDATE_TIME and TABLE_ROWS is an estimate. Cached query results there
+# expire by QUERY_CACHE_TTL (or a write through this process) only.
+TTL_ONLY_DIALECTS = {'mysql'}
+
+# How long the result cache reuses change tokens read from a remote
+# database before querying them again (SQLite's are read every time)
+CHANGE_TOKEN_TTL = float(os.getenv('CHANGE_TOKEN_TTL', '2'))
+
+# Row counts from planner statistics / catalog metadata instead of COUNT(*)
+ESTIMATE_QUERIES = {
+    'postgresql': """
+        SELECT c.relname,
+               CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint
+                    ELSE COALESCE(s.n_live_tup, 0) END
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')
+    """,
+    'mysql': """
+        SELECT TABLE_NAME, TABLE_ROWS
+        FROM information_schema.tables
+        WHERE TABLE_SCHEMA = DATABASE()
+    """,
+    'snowflake': """
+        SELECT TABLE_NAME, ROW_COUNT
+        FROM information_schema.tables
+        WHERE TABLE_SCHEMA = CURRENT_SCHEMA()
+    """,
+}
+
+
+class SchemaCatalog:
+    """Cached schema introspection, refreshed on TTL expiry or detected change"""
+
+    def __init__(self, engine, ttl: float = None):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.ttl = ttl if ttl is not None else float(os.getenv('SCHEMA_CACHE_TTL', '300'))
+
+        self._lock = threading.Lock()
+        self._tables = None
+        self._loaded_at = 0.0
+        self._refreshed_at = None
+        self._ddl_token = None
+        self._data_token = None
+        self._tokens_lock = threading.Lock()
+        self._recent_tokens = None
+        self._tokens_read_at = 0.0
+
+        self.hits = 0
+        self.full_refreshes = 0
+        self.count_refreshes = 0
+
+    def get(self, force_refresh: bool = False) -> dict:
+        """
+        Return table metadata, re-introspecting only when needed
+
+        Args:
+            force_refresh: Ignore the cache and re-read everything
+
+        Returns:
+            dict with tables, whether the result came from cache, and
+            when it was last refreshed
+        """
+        with self._lock:
+            with self.engine.connect() as conn:
+                ddl_token, data_token = self.change_tokens(conn)
+                expired = time.monotonic() - self._loaded_at >= self.ttl
+
+                if force_refresh or expired or self._tables is None or ddl_token != self._ddl_token:
+                    self._tables = self._introspect(conn)
+                    self._loaded_at = time.monotonic()
+                    self.full_refreshes += 1
+                    cached = False
+                elif data_token != self._data_token:
+                    # Same tables and columns; only the row counts moved
+                    self._refresh_row_counts(conn, self._tables)
+                    self.count_refreshes += 1
+                    cached = False
+                else:
+                    self.hits += 1
+                    cached = True
+
+                if not cached:
+                    self._ddl_token, self._data_token = ddl_token, data_token
+                    self._refreshed_at = datetime.now().isoformat(timespec='seconds')
+
+            return {
+                'tables': self._tables,
+                'cached': cached,
+                'refreshed_at': self._refreshed_at,
+            }
+
+    def invalidate(self):
+        """Drop the cached schema so the next get() re-introspects"""
+        with self._lock:
+            self._tables = None
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'full_refreshes': self.full_refreshes,
+            'row_count_refreshes': self.count_refreshes,
+            'ttl_seconds': self.ttl,
+            'refreshed_at': self._refreshed_at,
+        }
+
+    def _introspect(self, conn) -> dict:
+        inspector = inspect(conn)
+        tables = {}
+
+        for table_name in inspector.get_table_names():
+            columns = []
+            for column in inspector.get_columns(table_name):
+                columns.append({
+                    'name': column['name'],
+                    'type': str(column['type']),
+                    'nullable': column['nullable']
+                })
+            try:
+                foreign_keys = [{
+                    'columns': fk['constrained_columns'],
+                    'references': fk['referred_table'],
+                    'referenced_columns': fk['referred_columns']
+                } for fk in inspector.get_foreign_keys(table_name)]
+            except NotImplementedError:
+                foreign_keys = []
+            tables[table_name] = {'columns': columns, 'foreign_keys': foreign_keys, 'row_count': None}
+
+        self._refresh_row_counts(conn, tables)
+        return tables
+
+    def _refresh_row_counts(self, conn, tables: dict):
+        estimates = self._estimated_row_counts(conn, list(tables))
+
+        for table_name, info in tables.items():
+            if table_name in estimates:
+                info['row_count'] = estimates[table_name]
+                info['row_count_estimated'] = True
+            else:
+                info['row_count'] = self._exact_row_count(conn, table_name)
+                info['row_count_estimated'] = False
+
+    def _estimated_row_counts(self, conn, table_names: list) -> dict:
+        if self.dialect == 'sqlite':
+            return self._sqlite_row_estimates(conn, table_names)
+
+        query = ESTIMATE_QUERIES.get(self.dialect)
+        if query is None:
+            return {}
+        try:
+            rows = conn.execute(text(query)).fetchall()
+        except Exception:
+            return {}
+        # Snowflake upper-cases unquoted identifiers; match case-insensitively
+        return {name.lower() if self.dialect == 'snowflake' else name: int(count or 0)
+                for name, count in rows}
+
+    def _sqlite_row_estimates(self, conn, table_names: list) -> dict:
+        estimates = {}
+
+        # sqlite_stat1 exists once ANALYZE has run; first stat field is the row count
+        try:
+            for table_name, stat in conn.execute(text("SELECT tbl, stat FROM sqlite_stat1")):
+                rows = int(str(stat).split()[0])
+                estimates[table_name] = max(estimates.get(table_name, 0), rows)
+        except Exception:
+            pass
+
+        # Otherwise MAX(rowid) is an index lookup and exact for append-only tables
+        for table_name in table_names:
+            if table_name in estimates:
+                continue
+            quoted = self.engine.dialect.identifier_preparer.quote(table_name)
+            try:
+                max_rowid = conn.execute(text(f"SELECT MAX(_rowid_) FROM {quoted}")).scalar()
+                estimates[table_name] = int(max_rowid or 0)
+            except Exception:
+                # WITHOUT ROWID tables fall back to COUNT(*)
+                pass
+        return estimates
+
+    def _exact_row_count(self, conn, table_name: str) -> int:
+        quoted = self.engine.dialect.identifier_preparer.quote(table_name)
+        return conn.execute(text(f"SELECT COUNT(*) FROM {quoted}")).scalar()
+
+    def change_tokens(self, conn):
+        """(ddl_token, data_token); None means "unknown", so only the TTL applies"""
+        if self.dialect == 'sqlite':
+            return self._sqlite_change_tokens(conn)
+
+        queries = CHANGE_QUERIES.get(self.dialect)
+        if queries is None:
+            return None, None
+        try:
+            ddl = tuple(conn.execute(text(queries['ddl'])).fetchone())
+            data = tuple(conn.execute(text(queries['data'])).fetchone())
+            return ddl, data
+        except Exception:
+            return None, None
+
+    def recent_change_tokens(self, conn):
+        """
+        change_tokens() for the result cache, without a metadata round-trip per query
+
+        SQLite's tokens are read every time. Elsewhere they are reused
+        for CHANGE_TOKEN_TTL seconds, so a write by another client can
+        take that long to invalidate cached results. TTL_ONLY_DIALECTS
+        are never queried: (None, None) leaves only the cache TTL.
+        """
+        if self.dialect == 'sqlite':
+            return self.change_tokens(conn)
+        if self.dialect in TTL_ONLY_DIALECTS:
+            return None, None
+        with self._tokens_lock:
+            if self._recent_tokens is None or time.monotonic() - self._tokens_read_at >= CHANGE_TOKEN_TTL:
+                self._recent_tokens = self.change_tokens(conn)
+                self._tokens_read_at = time.monotonic()
+            return self._recent_tokens
+
+    def _sqlite_change_tokens(self, conn):
+        # schema_version lives in the file header, so it is comparable across
+        # pooled connections (unlike PRAGMA data_version, which is per-connection)
+        ddl = conn.execute(text("PRAGMA schema_version")).scalar()
+
+        db_path = self.engine.url.database
+        if not db_path or db_path == ':memory:':
+            return ddl, None
+
+        data = []
+        for path in (db_path, f"{db_path}-wal"):
+            try:
+                st = os.stat(path)
+                data.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                data.append(None)
+        return ddl, tuple(data)
@@ -0,0 +1,227 @@
+from collections import Counter
+import math
+import os
+import re
+import threading
+
+from nl_cache import STOPWORDS, schema_hash
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+# Characters per token for budget estimates (close enough for English/SQL)
+CHARS_PER_TOKEN = 4
+
+
+def _stem(word: str) -> str:
+    # Light plural folding: "customers" -> "customer", "sales" -> "sale"
+    if len(word) > 3 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Lower-case word tokens with snake_case split and plurals folded"""
+    words = _WORDS.findall(str(text).lower().replace('_', ' '))
+    return [_stem(w) for w in words if w not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def infer_relationships(tables: dict) -> dict:
+    """
+    Table adjacency from declared foreign keys, plus shared *_id columns
+
+    Tables loaded with DataFrame.to_sql have no declared keys, so a column
+    like customer_id appearing in both sales and customers counts as a join.
+    """
+    neighbours = {name: set() for name in tables}
+
+    for table_name, info in tables.items():
+        for fk in info.get('foreign_keys') or []:
+            if fk['references'] in neighbours:
+                neighbours[table_name].add(fk['references'])
+                neighbours[fk['references']].add(table_name)
+
+    id_columns = {}
+    for table_name, info in tables.items():
+        for col in info['columns']:
+            if col['name'].lower().endswith('_id'):
+                id_columns.setdefault(col['name'].lower(), set()).add(table_name)
+    for owners in id_columns.values():
+        if 1 < len(owners) <= 10:
+            for table_name in owners:
+                neighbours[table_name].update(owners - {table_name})
+
+    return neighbours
+
+
+def format_table(table_name: str, info: dict, samples: dict = None) -> str:
+    """One compact line per table: name(col TYPE, ...) ~rows"""
+    samples = samples or {}
+    columns = []
+    for col in info['columns']:
+        entry = f"{col['name']} {col['type']}"
+        if col['name'] in samples:
+            entry += f" e.g. {'|'.join(samples[col['name']])}"
+        columns.append(entry)
+
+    row_count = info.get('row_count')
+    rows = f" ~{row_count} rows" if row_count is not None else ""
+    return f"{table_name}({', '.join(columns)}){rows}"
+
+
+class SchemaRetriever:
+    """Selects the tables relevant to a question for the NL-to-SQL prompt
+
+    Each table is indexed as a BM25 document built from its name, column
+    names and a few sample values. The highest-scoring tables are added
+    to the prompt until the token budget is used, followed by the tables
+    they join to. Schemas that fit the budget are sent whole.
+    """
+
+    def __init__(self, db=None, token_budget: int = None, sample_values: bool = None):
+        self.db = db
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv('NL_SCHEMA_TOKEN_BUDGET', '1500'))
+        if sample_values is None:
+            sample_values = os.getenv('NL_SCHEMA_SAMPLE_VALUES', 'true').lower() in ('1', 'true', 'yes')
+        self.sample_values = sample_values and db is not None
+
+        self._lock = threading.Lock()
+        self._index_key = None
+        self._index = None
+
+    def select(self, question: str, tables: dict) -> dict:
+        """
+        Pick the tables to describe for a question
+
+        Returns:
+            dict with the schema text, table names used and estimated tokens
+        """
+        index = self._get_index(tables)
+
+        full_text = '\n'.join(index['lines'][t] for t in tables)
+        if estimate_tokens(full_text) <= self.token_budget:
+            return {
+                'schema': full_text + self._relationship_lines(index, list(tables)),
+                'tables': list(tables),
+                'pruned': False,
+                'estimated_tokens': estimate_tokens(full_text),
+            }
+
+        scores = self._bm25(index, tokenize(question))
+        ranked = [t for t, score in sorted(scores.items(), key=lambda kv: -kv[1]) if score > 0]
+        if not ranked:
+            # Nothing matched; fall back to the largest tables
+            ranked = sorted(tables, key=lambda t: -(tables[t].get('row_count') or 0))
+
+        candidates = []
+        for position, table_name in enumerate(ranked):
+            candidates.append(table_name)
+            if position < 3:
+                # Join partners of the best matches come right after them
+                candidates.extend(sorted(index['neighbours'][table_name]))
+
+        selected, used = [], 0
+
+        for table_name in candidates:
+            if table_name in selected:
+                continue
+            cost = estimate_tokens(index['lines'][table_name])
+            if selected and used + cost > self.token_budget:
+                continue
+            selected.append(table_name)
+            used += cost
+
+        schema_text = '\n'.join(index['lines'][t] for t in selected)
+        return {
+            'schema': schema_text + self._relationship_lines(index, selected),
+            'tables': selected,
+            'pruned': True,
+            'estimated_tokens': estimate_tokens(schema_text),
+        }
+
+    def _relationship_lines(self, index: dict, selected: list) -> str:
+        chosen = set(selected)
+        pairs = sorted({tuple(sorted((a, b))) for a in selected
+                        for b in index['neighbours'][a] if b in chosen})
+        if not pairs:
+            return ''
+        return '\nJoins: ' + ', '.join(f"{a}<->{b}" for a, b in pairs)
+
+    def _get_index(self, tables: dict) -> dict:
+        key = schema_hash(tables)
+        with self._lock:
+            if self._index_key != key:
+                self._index = self._build_index(tables)
+                self._index_key = key
+            else:
+                # Row counts change without a schema change; keep lines current
+                self._index['lines'] = {
+                    t: format_table(t, tables[t], self._index['samples'].get(t)) for t in tables
+                }
+            return self._index
+
+    def _build_index(self, tables: dict) -> dict:
+        samples = {t: self._sample_values(t, tables[t]) for t in tables} if self.sample_values else {}
+
+        documents = {}
+        for table_name, info in tables.items():
+            terms = tokenize(table_name) * 3
+            for col in info['columns']:
+                terms.extend(tokenize(col['name']))
+            for values in samples.get(table_name, {}).values():
+                for value in values:
+                    terms.extend(tokenize(value))
+            documents[table_name] = Counter(terms)
+
+        doc_freq = Counter()
+        for terms in documents.values():
+            doc_freq.update(set(terms))
+
+        return {
+            'documents': documents,
+            'doc_freq': doc_freq,
+            'avg_length': sum(sum(d.values()) for d in documents.values()) / max(len(documents), 1),
+            'neighbours': infer_relationships(tables),
+            'samples': samples,
+            'lines': {t: format_table(t, tables[t], samples.get(t)) for t in tables},
+        }
+
+    def _sample_values(self, table_name: str, info: dict) -> dict:
+        """A few distinct values from low-cardinality text columns"""
+        text_columns = [c['name'] for c in info['columns']
+                        if any(k in c['type'].upper() for k in ('CHAR', 'TEXT', 'STRING'))]
+        if not text_columns:
+            return {}
+
+        result = self.db.get_sample_data(table_name, limit=50)
+        if not result.get('success'):
+            return {}
+
+        samples = {}
+        for col in text_columns:
+            values = list(dict.fromkeys(str(r[col]) for r in result['sample_data'] if r.get(col) is not None))
+            # Only categorical-looking columns help matching (tier, region, status...)
+            if 0 < len(values) <= 8 and all(len(v) <= 24 for v in values):
+                samples[col] = values[:4]
+        return samples
+
+    def _bm25(self, index: dict, query_terms: list, k1: float = 1.2, b: float = 0.75) -> dict:
+        n_docs = len(index['documents'])
+        scores = {}
+        for table_name, terms in index['documents'].items():
+            length = sum(terms.values())
+            score = 0.0
+            for term in set(query_terms):
+                tf = terms.get(term, 0)
+                if not tf:
+                    continue
+                df = index['doc_freq'][term]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / index['avg_length']))
+            scores[table_name] = score
+        return scores
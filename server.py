@@ -1,21 +1,29 @@
 import asyncio
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 import mcp.server.stdio
 from database import DatabaseManager
-from powerbi_export import PowerBIExporter
+from powerbi_export import EXPORT_FORMATS, PowerBIExporter
 from nl_to_sql import NaturalLanguageQueryEngine
-import pandas as pd
+from response_format import RESPONSE_FORMATS, encode_result
+from csv_analyzer import analyze_csv
+from csv_cache import get_csv_cache
+from file_query import FileQueryEngine
 
 # Initialize the MCP server
 app = Server("business-data-server")
+# One DatabaseManager (and one pooled engine) shared by every tool
 db = DatabaseManager()
-pbi_exporter = PowerBIExporter()
+pbi_exporter = PowerBIExporter(db)
+# DuckDB over the files in data/; connects on first use
+file_engine = FileQueryEngine(db)
 
 # Initialize natural language query engine
 try:
-    nl_engine = NaturalLanguageQueryEngine()
+    nl_engine = NaturalLanguageQueryEngine(db)
     nl_enabled = True
     print("✅ Natural language queries enabled")
 except ValueError as e:
@@ -23,6 +31,26 @@ except ValueError as e:
     nl_enabled = False
     print(f"⚠️  Natural language queries disabled: {e}")
 
+DEFAULT_RESPONSE_FORMAT = os.getenv('MCP_RESPONSE_FORMAT', 'json')
+
+# Shared by every tool that returns rows
+RESPONSE_FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": RESPONSE_FORMATS,
+    "description": (
+        "Result encoding: 'json' (indented rows), 'columnar' (column names once plus value lists), "
+        "'csv' (CSV text) or 'arrow' (base64 Arrow IPC). Compact formats use far fewer tokens."
+    ),
+    "default": DEFAULT_RESPONSE_FORMAT
+}
+
+EXPORT_FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": EXPORT_FORMATS,
+    "description": "Output format: 'xlsx' (default) or 'parquet'",
+    "default": "xlsx"
+}
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     """
@@ -48,22 +76,79 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Maximum number of rows to return (default: 100)",
                         "default": 100
-                    }
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": (
+                            "Stream the result in pages of this many rows. The response "
+                            "includes next_token; pass it to fetch_more_rows for the next page. "
+                            "max_rows then caps the total across all pages."
+                        )
+                    },
+                    "response_format": RESPONSE_FORMAT_PROPERTY
                 },
                 "required": ["sql_query"]
             }
         ),
         
+        Tool(
+            name="fetch_more_rows",
+            description=(
+                "Fetch the next page of a streamed query_database result. "
+                "Use the next_token from the previous page; has_more is false on the last page."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "next_token": {
+                        "type": "string",
+                        "description": "Continuation token from the previous page"
+                    },
+                    "close": {
+                        "type": "boolean",
+                        "description": "Discard the remaining rows instead of fetching them",
+                        "default": False
+                    },
+                    "response_format": RESPONSE_FORMAT_PROPERTY
+                },
+                "required": ["next_token"]
+            }
+        ),
+        
+        Tool(
+            name="get_cache_stats",
+            description=(
+                "Show query result cache hit/miss rates, schema catalog refreshes, "
+                "connection pool usage and the analyze_csv file cache. Optionally clear the caches."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "clear": {
+                        "type": "boolean",
+                        "description": "Clear the query result and CSV file caches after reading the stats",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        
         Tool(
             name="get_database_schema",
             description=(
                 "Retrieve the complete database schema showing all tables, columns, "
                 "data types, and row counts. Use this first to understand what data is available "
-                "before writing queries."
+                "before writing queries. Results are cached; row counts may be estimates."
             ),
             inputSchema={
                 "type": "object",
-                "properties": {}
+                "properties": {
+                    "force_refresh": {
+                        "type": "boolean",
+                        "description": "Re-read the schema instead of using the cache (default: false)",
+                        "default": False
+                    }
+                }
             }
         ),
         
@@ -84,7 +169,8 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Number of sample rows (default: 5)",
                         "default": 5
-                    }
+                    },
+                    "response_format": RESPONSE_FORMAT_PROPERTY
                 },
                 "required": ["table_name"]
             }
@@ -113,17 +199,45 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Number of rows for 'head' operation (default: 10)",
                         "default": 10
-                    }
+                    },
+                    "response_format": RESPONSE_FORMAT_PROPERTY
                 },
                 "required": ["filename", "operation"]
             }
         ),
         
+        Tool(
+            name="query_files",
+            description=(
+                "Run SQL (DuckDB dialect) directly over the CSV and Parquet files in data/, "
+                "without loading them into memory. Each file is a table named after it "
+                "(e.g. sales_export, verizon_usage, or \"sales_export.csv\"), and the business "
+                "database tables are available as db.<table> for joins. Omit sql_query to list "
+                "the files and their columns."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "sql_query": {
+                        "type": "string",
+                        "description": "SELECT query over the file tables and db.<table>"
+                    },
+                    "max_rows": {
+                        "type": "integer",
+                        "description": "Maximum number of rows to return (default: 100)",
+                        "default": 100
+                    },
+                    "response_format": RESPONSE_FORMAT_PROPERTY
+                }
+            }
+        ),
+        
         Tool(
             name="export_to_powerbi",
             description=(
-                "Export SQL query results to Excel format for Power BI. "
-                "Creates formatted Excel file with proper column widths. "
+                "Export SQL query results to Excel or Parquet for Power BI. "
+                "Creates formatted Excel file with proper column widths, or a compressed "
+                "Parquet file (faster to write and refresh, no 1M-row sheet limit). "
                 "Perfect for creating Power BI data sources."
             ),
             inputSchema={
@@ -136,7 +250,8 @@ async def list_tools() -> list[Tool]:
                     "filename": {
                         "type": "string",
                         "description": "Output filename (optional)"
-                    }
+                    },
+                    "format": EXPORT_FORMAT_PROPERTY
                 },
                 "required": ["sql_query"]
             }
@@ -147,11 +262,14 @@ async def list_tools() -> list[Tool]:
             description=(
                 "Export all database tables to a single Excel file with multiple sheets. "
                 "Creates a complete dataset ready to import into Power BI. "
-                "Each table becomes a separate sheet."
+                "Each table becomes a separate sheet (xlsx) or a separate file in a "
+                "dataset folder (parquet)."
             ),
             inputSchema={
                 "type": "object",
-                "properties": {}
+                "properties": {
+                    "format": EXPORT_FORMAT_PROPERTY
+                }
             }
         )
     ]
@@ -178,7 +296,8 @@ async def list_tools() -> list[Tool]:
                             "type": "integer",
                             "description": "Maximum rows to return (default: 50)",
                             "default": 50
-                        }
+                        },
+                        "response_format": RESPONSE_FORMAT_PROPERTY
                     },
                     "required": ["question"]
                 }
@@ -187,135 +306,177 @@ async def list_tools() -> list[Tool]:
     
     return tools_list
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """
-    Handle tool calls from Claude
-    """
+# Handlers are synchronous (SQLAlchemy, pandas, openpyxl), so call_tool runs
+# them on a bounded thread pool to keep the stdio event loop responsive.
+WORKER_THREADS = int(os.getenv('MCP_WORKER_THREADS', '8'))
+
+# Max in-flight calls per tool; heavy exports get fewer slots than queries
+TOOL_CONCURRENCY = {
+    "query_database": 8,
+    "fetch_more_rows": 8,
+    "get_cache_stats": 4,
+    "get_database_schema": 4,
+    "get_table_sample": 8,
+    "analyze_csv": 2,
+    "query_files": 2,
+    "export_to_powerbi": 1,
+    "create_powerbi_dataset": 1,
+    "ask_question": 4,
+}
+
+_executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="mcp-tool")
+_tool_semaphores = {}
+
+
+def _tool_semaphore(name: str) -> asyncio.Semaphore:
+    if name not in _tool_semaphores:
+        limit = int(os.getenv(f"MCP_LIMIT_{name.upper()}", TOOL_CONCURRENCY.get(name, 4)))
+        _tool_semaphores[name] = asyncio.Semaphore(limit)
+    return _tool_semaphores[name]
+
+
+def handle_query_database(arguments: dict) -> dict:
+    sql_query = arguments.get("sql_query", "")
+    max_rows = arguments.get("max_rows", 100)
+    page_size = arguments.get("page_size")
     
-    if name == "query_database":
-        sql_query = arguments.get("sql_query", "")
-        max_rows = arguments.get("max_rows", 100)
-        
-        result = db.execute_query(sql_query, max_rows)
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2, default=str)
-        )]
+    if page_size:
+        return db.execute_query_stream(sql_query, page_size, arguments.get("max_rows"))
     
-    elif name == "get_database_schema":
-        schema = db.get_schema_info()
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(schema, indent=2)
-        )]
+    return db.execute_query(sql_query, max_rows)
+
+
+def handle_fetch_more_rows(arguments: dict) -> dict:
+    token = arguments.get("next_token", "")
     
-    elif name == "get_table_sample":
-        table_name = arguments.get("table_name")
-        limit = arguments.get("limit", 5)
-        
-        result = db.get_sample_data(table_name, limit)
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2, default=str)
-        )]
+    if arguments.get("close"):
+        return db.close_stream(token)
     
-    elif name == "analyze_csv":
-        filename = arguments.get("filename")
-        operation = arguments.get("operation")
-        rows = arguments.get("rows", 10)
-        
-        try:
-            df = pd.read_csv(f"data/{filename}")
-            
-            if operation == "summary":
-                result = {
-                    "filename": filename,
-                    "shape": df.shape,
-                    "columns": list(df.columns),
-                    "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-                    "null_counts": df.isnull().sum().to_dict()
-                }
-            
-            elif operation == "head":
-                result = {
-                    "filename": filename,
-                    "rows": df.head(rows).to_dict('records')
-                }
-            
-            elif operation == "describe":
-                result = {
-                    "filename": filename,
-                    "statistics": df.describe(include='all').to_dict()
-                }
-            
-            elif operation == "columns":
-                result = {
-                    "filename": filename,
-                    "columns": list(df.columns)
-                }
-            
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, indent=2, default=str)
-            )]
-            
-        except Exception as e:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": str(e)
-                })
-            )]
+    return db.fetch_page(token)
+
+
+def handle_get_cache_stats(arguments: dict) -> dict:
+    stats = db.get_cache_stats()
+    csv_cache = get_csv_cache()
+    if csv_cache is not None:
+        stats["csv_cache"] = csv_cache.stats()
     
-    elif name == "export_to_powerbi":
-        sql_query = arguments.get("sql_query")
-        filename = arguments.get("filename")
-        
-        result = pbi_exporter.export_query_to_excel(sql_query, filename)
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2, default=str)
-        )]
+    if arguments.get("clear"):
+        db.invalidate_cache()
+        if csv_cache is not None:
+            csv_cache.clear()
+        stats["cleared"] = True
     
-    elif name == "create_powerbi_dataset":
-        result = pbi_exporter.create_powerbi_dataset()
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2, default=str)
-        )]
+    return stats
+
+
+def handle_get_database_schema(arguments: dict) -> dict:
+    force_refresh = arguments.get("force_refresh", False)
     
-    elif name == "ask_question":
-        if not nl_enabled:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Natural language queries are disabled. Please set ANTHROPIC_API_KEY in .env"
-                })
-            )]
-        
-        question = arguments.get("question")
-        max_rows = arguments.get("max_rows", 50)
-        
-        result = nl_engine.query(question, max_rows)
+    return db.get_schema_info(force_refresh=force_refresh)
+
+
+def handle_get_table_sample(arguments: dict) -> dict:
+    table_name = arguments.get("table_name")
+    limit = arguments.get("limit", 5)
+    
+    return db.get_sample_data(table_name, limit)
+
+
+def handle_analyze_csv(arguments: dict) -> dict:
+    filename = arguments.get("filename")
+    operation = arguments.get("operation")
+    rows = arguments.get("rows", 10)
+    
+    try:
+        # Reads only what the operation needs: the header, N rows, or one streaming pass
+        return {
+            "filename": filename,
+            **analyze_csv(f"data/{filename}", operation, rows)
+        }
         
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2, default=str)
-        )]
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def handle_query_files(arguments: dict) -> dict:
+    sql_query = arguments.get("sql_query")
+    max_rows = arguments.get("max_rows", 100)
+    
+    if not sql_query:
+        return file_engine.list_files()
     
-    else:
+    return file_engine.query(sql_query, max_rows)
+
+
+def handle_export_to_powerbi(arguments: dict) -> dict:
+    sql_query = arguments.get("sql_query")
+    filename = arguments.get("filename")
+    
+    export_format = arguments.get("format", "xlsx")
+    
+    return pbi_exporter.export_query(sql_query, filename, export_format)
+
+
+def handle_create_powerbi_dataset(arguments: dict) -> dict:
+    export_format = arguments.get("format", "xlsx")
+    
+    return pbi_exporter.create_powerbi_dataset(export_format)
+
+
+def handle_ask_question(arguments: dict) -> dict:
+    if not nl_enabled:
+        return {
+            "success": False,
+            "error": "Natural language queries are disabled. Please set ANTHROPIC_API_KEY in .env"
+        }
+    
+    question = arguments.get("question")
+    max_rows = arguments.get("max_rows", 50)
+    
+    return nl_engine.query(question, max_rows)
+
+
+TOOL_HANDLERS = {
+    "query_database": handle_query_database,
+    "fetch_more_rows": handle_fetch_more_rows,
+    "get_cache_stats": handle_get_cache_stats,
+    "get_database_schema": handle_get_database_schema,
+    "get_table_sample": handle_get_table_sample,
+    "analyze_csv": handle_analyze_csv,
+    "query_files": handle_query_files,
+    "export_to_powerbi": handle_export_to_powerbi,
+    "create_powerbi_dataset": handle_create_powerbi_dataset,
+    "ask_question": handle_ask_question,
+}
+
+@app.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """
+    Handle tool calls from Claude
+    """
+    handler = TOOL_HANDLERS.get(name)
+    
+    if handler is None:
         return [TextContent(
             type="text",
             text=json.dumps({"error": f"Unknown tool: {name}"})
         )]
+    
+    # Wait for a slot for this tool, then run the blocking work off the loop
+    async with _tool_semaphore(name):
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_executor, handler, arguments or {})
+    
+    response_format = (arguments or {}).get("response_format", DEFAULT_RESPONSE_FORMAT)
+    
+    return [TextContent(
+        type="text",
+        text=encode_result(result, response_format)
+    )]
 
 async def main():
     """Run the MCP server"""
@@ -0,0 +1,122 @@
+import re
+
+try:
+    import sqlglot
+    from sqlglot import exp
+
+    # Node types that write or change schema (names vary across sqlglot versions)
+    _WRITE_NODES = tuple(
+        getattr(exp, name) for name in
+        ('Insert', 'Update', 'Delete', 'Merge', 'Create', 'Drop', 'Alter', 'AlterTable', 'Command')
+        if hasattr(exp, name)
+    )
+except ImportError:  # sqlglot is optional; fall back to a conservative wrapper
+    sqlglot = None
+
+# SQLAlchemy dialect name -> sqlglot dialect name
+SQLGLOT_DIALECTS = {
+    'sqlite': 'sqlite',
+    'postgresql': 'postgres',
+    'mysql': 'mysql',
+    'snowflake': 'snowflake',
+    'mssql': 'tsql',
+    'oracle': 'oracle',
+}
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|GRANT|REVOKE|ATTACH|DETACH|PRAGMA|VACUUM|COPY)\b",
+    re.IGNORECASE,
+)
+
+
+class QueryRejected(ValueError):
+    """Raised when a query is not a single read-only SELECT"""
+
+
+def prepare_query(query: str, max_rows: int = None, dialect: str = 'sqlite') -> str:
+    """
+    Validate a query as read-only and cap the rows it can return
+
+    The cap is applied to the outermost query in the target dialect
+    (LIMIT, TOP or FETCH FIRST), so the database stops producing rows at
+    max_rows instead of the driver discarding them. CTEs (WITH ...) and
+    set operations are allowed; anything that writes is rejected.
+
+    Args:
+        query: SQL text from the caller
+        max_rows: Row cap, or None to validate without capping
+        dialect: SQLAlchemy dialect name of the target engine
+
+    Returns:
+        SQL to execute
+
+    Raises:
+        QueryRejected: if the query is not a single read-only statement
+    """
+    query = query.strip().rstrip(';').strip()
+    if not query:
+        raise QueryRejected('Query is empty')
+
+    if sqlglot is not None:
+        return _prepare_with_sqlglot(query, max_rows, SQLGLOT_DIALECTS.get(dialect, dialect))
+    return _prepare_fallback(query, max_rows, dialect)
+
+
+def _prepare_with_sqlglot(query: str, max_rows: int, dialect: str) -> str:
+    try:
+        statements = [s for s in sqlglot.parse(query, read=dialect) if s is not None]
+    except sqlglot.errors.ParseError as e:
+        raise QueryRejected(f'Could not parse query: {e}')
+
+    if len(statements) != 1:
+        raise QueryRejected('Only a single SELECT statement is allowed')
+
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        raise QueryRejected('Only SELECT queries are allowed for security')
+
+    # Catches data-modifying CTEs such as WITH x AS (DELETE ... RETURNING *)
+    if tree.find(*_WRITE_NODES):
+        raise QueryRejected('Only read-only queries are allowed for security')
+
+    if max_rows is None:
+        return query
+
+    existing = tree.args.get('limit')
+    if existing is None:
+        tree = tree.limit(max_rows)
+    else:
+        count = existing.args.get('count') if isinstance(existing, exp.Fetch) else existing.expression
+        if isinstance(count, exp.Literal) and count.is_int:
+            if int(count.name) > max_rows:
+                count.replace(exp.Literal.number(max_rows))
+        else:
+            # Parameterised or computed limit: cap it from outside
+            tree = exp.select('*').from_(tree.subquery('_capped')).limit(max_rows)
+
+    return tree.sql(dialect=dialect)
+
+
+def _prepare_fallback(query: str, max_rows: int, dialect: str) -> str:
+    # Without a parser, inspect the text with comments and string literals removed
+    code = _STRINGS.sub("''", _COMMENTS.sub(' ', query)).strip()
+
+    if ';' in code:
+        raise QueryRejected('Only a single SELECT statement is allowed')
+    first_word = code.split(None, 1)[0].upper() if code else ''
+    if first_word not in ('SELECT', 'WITH'):
+        raise QueryRejected('Only SELECT queries are allowed for security')
+    if _WRITE_KEYWORDS.search(code):
+        raise QueryRejected('Only read-only queries are allowed for security')
+
+    if max_rows is None:
+        return query
+
+    # Wrapping caps the outermost result even when a subquery has its own LIMIT
+    if dialect == 'mssql':
+        return f"SELECT TOP {int(max_rows)} * FROM (\n{query}\n) AS _capped"
+    if dialect == 'oracle':
+        return f"SELECT * FROM (\n{query}\n) _capped FETCH FIRST {int(max_rows)} ROWS ONLY"
+    return f"SELECT * FROM (\n{query}\n) AS _capped LIMIT {int(max_rows)}"